@@ -0,0 +1,227 @@
+"""
+Admission control: bounded concurrency and queueing per route class.
+
+Requests are sorted by path into classes (interactive quotes, pages, static
+files and bulk batch jobs), each with its own number of slots and a bounded
+queue of requests waiting for one. A request that would have to wait longer
+than its class's max_wait is turned away at once with 503 and Retry-After,
+instead of joining a queue that only makes every request behind it slower:
+the expected wait is the queue ahead of it spread over the class's slots,
+times a moving average of how long a slot is held. Requests that are let
+into the queue but still wait past max_wait are turned away too.
+
+Bulk classes defer to interactive ones: while any interactive request is
+waiting, a bulk request does not take a slot even when its own class has
+one free. /health reports the interactive classes that are shedding, so a
+load balancer can route away before latency collapses.
+
+Like metrics, all state is per worker process and only touched on the event
+loop, so there are no locks.
+"""
+
+import asyncio
+import collections
+import math
+import time
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+
+import config
+import metrics
+
+# Path prefix -> route class, first match wins
+ROUTE_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("/static/", "static"),
+    ("/assets/", "static"),
+    ("/configure/batch", "batch"),
+    ("/configure/stream", "batch"),
+    ("/configure", "quotes"),
+    ("/api/", "quotes"),
+    ("/quotes/", "quotes"),
+    ("/mesh/", "quotes"),
+    ("/jobs/", "quotes"),
+)
+DEFAULT_CLASS = "pages"
+SERVICE_SMOOTHING = 0.2  # weight of the newest slot hold time in the moving average
+
+
+def route_class(path: str, exempt: Sequence[str] = config.ADMISSION_EXEMPT) -> Optional[str]:
+    """Class a request path is admitted under, or None if it is never queued"""
+    if path.startswith(tuple(exempt)) or path.endswith("/stats"):
+        return None
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return DEFAULT_CLASS
+
+
+class Overloaded(Exception):
+    """A request was turned away; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, route_class: str, retry_after: float):
+        super().__init__(f"{route_class} requests are over capacity")
+        self.route_class = route_class
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Slots and queue of one route class"""
+
+    def __init__(self, name: str, concurrency: int, queue: int, max_wait: float, bulk: bool = False):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.max_wait = max_wait
+        self.bulk = bulk
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = collections.deque()
+        self.service_time = 0.0  # moving average of seconds a slot is held
+
+    def expected_wait(self) -> float:
+        """Seconds a request arriving now would wait for a slot"""
+        ahead = len(self.waiters)
+        if self.active < self.concurrency and not ahead:
+            return 0.0
+        return (ahead + 1) / self.concurrency * self.service_time
+
+    def saturated(self) -> bool:
+        """Whether a request arriving now would be turned away"""
+        return len(self.waiters) >= self.queue or self.expected_wait() > self.max_wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "expected_wait": round(self.expected_wait(), 4),
+            "service_time": round(self.service_time, 4),
+            "saturated": self.saturated()
+        }
+
+
+class Controller:
+    """Admits requests into per-class slots, interactive classes first"""
+
+    def __init__(self, classes: Mapping[str, Mapping[str, Any]] = config.ADMISSION_CLASSES):
+        limiters = [Limiter(name, **settings) for name, settings in classes.items()]
+        # Interactive classes are served before bulk ones when slots free up
+        self.limiters: Dict[str, Limiter] = {
+            limiter.name: limiter for limiter in sorted(limiters, key=lambda limiter: limiter.bulk)
+        }
+
+    def _interactive_waiting(self) -> bool:
+        return any(limiter.waiters for limiter in self.limiters.values() if not limiter.bulk)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting requests"""
+        for limiter in self.limiters.values():
+            if limiter.bulk and self._interactive_waiting():
+                break
+            while limiter.waiters and limiter.active < limiter.concurrency:
+                waiter = limiter.waiters.popleft()
+                metrics.admission_waiting.dec(limiter.name)
+                if not waiter.done():
+                    limiter.active += 1
+                    waiter.set_result(None)
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a slot; returns the time it was granted, raises Overloaded"""
+        limiter = self.limiters[name]
+        deferred = limiter.bulk and self._interactive_waiting()
+        if limiter.active < limiter.concurrency and not limiter.waiters and not deferred:
+            limiter.active += 1
+            metrics.admission.inc(name, "admitted")
+            return time.perf_counter()
+
+        wait = limiter.expected_wait()
+        if len(limiter.waiters) >= limiter.queue or wait > limiter.max_wait:
+            metrics.admission.inc(name, "shed")
+            raise Overloaded(name, max(wait, limiter.max_wait))
+
+        waiter = asyncio.get_running_loop().create_future()
+        limiter.waiters.append(waiter)
+        metrics.admission_waiting.inc(name)
+        try:
+            await asyncio.wait_for(waiter, limiter.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            granted = waiter.done() and not waiter.cancelled()
+            if isinstance(exc, asyncio.TimeoutError) and granted:
+                pass  # the slot came through as the wait ran out
+            elif granted:
+                limiter.active -= 1  # never used, so it says nothing about service time
+                self._dispatch()
+                raise
+            else:
+                self._abandon(limiter, waiter)
+                if isinstance(exc, asyncio.CancelledError):
+                    raise
+                metrics.admission.inc(name, "timeout")
+                raise Overloaded(name, limiter.expected_wait()) from None
+        metrics.admission.inc(name, "admitted")
+        return time.perf_counter()
+
+    def _abandon(self, limiter: Limiter, waiter: asyncio.Future) -> None:
+        if waiter in limiter.waiters:
+            limiter.waiters.remove(waiter)
+            metrics.admission_waiting.dec(limiter.name)
+        # A bulk request may have been held back only by this one
+        self._dispatch()
+
+    def release(self, name: str, granted: float) -> None:
+        """Free a slot taken by acquire()"""
+        limiter = self.limiters[name]
+        limiter.active -= 1
+        held = time.perf_counter() - granted
+        limiter.service_time += SERVICE_SMOOTHING * (held - limiter.service_time)
+        self._dispatch()
+
+    def saturated(self) -> List[str]:
+        """Interactive classes currently turning requests away"""
+        return [
+            limiter.name for limiter in self.limiters.values()
+            if not limiter.bulk and limiter.saturated()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionMiddleware:
+    """ASGI middleware holding each HTTP request in its route class's slot while it is served"""
+
+    def __init__(self, app, controller: Optional[Controller] = None):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        active = self.controller or controller
+        arrived = time.perf_counter()
+        try:
+            granted = await active.acquire(name)
+        except Overloaded as exc:
+            response = JSONResponse(
+                {"detail": str(exc)}, status_code=503, headers={"Retry-After": retry_after(exc.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        metrics.admission_wait.observe(granted - arrived, name)
+        # Handlers time their own phases from here, not from arrival
+        scope["admission.granted"] = granted
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            active.release(name, granted)
+
+
+controller = Controller()
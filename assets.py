@@ -0,0 +1,262 @@
+"""
+Fingerprinted, precompressed static assets and the pre-rendered index page.
+
+The build step copies every CSS/JS file under static/ to a content-hashed
+name (js/app.js -> js/app.3f2a9c1be0d4.js) next to gzip and, when the brotli
+package is installed, brotli variants, and records the mapping in
+manifest.json. Hashed files never change, so they are served with a one-year
+immutable Cache-Control. The index page has no per-request data; it is
+rendered once with the hashed URLs, compressed, and revalidated by ETag.
+
+Everything is held in memory after loading, so serving an asset is a dict
+lookup. The build is redone at load whenever a source file's hash no longer
+matches the manifest.
+
+    python assets.py    # build into ASSET_BUILD_DIR
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+from typing import Dict, List, NamedTuple, Optional
+
+import jinja2
+from starlette.requests import Request
+from starlette.responses import Response
+
+import config
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_PREFIX = "/assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODINGS = ("br", "gzip")  # server preference
+PAGES = ("index.html",)
+THREE_BUNDLE = "vendor/three.bundle.min.js"  # built from vendor/three by start.sh
+
+
+class Asset(NamedTuple):
+    content_type: str
+    digest: str
+    variants: Dict[str, bytes]  # content-coding ("identity", "gzip", "br") -> body
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def fingerprint(path: str, data: bytes) -> str:
+    """Insert the content hash before the extension"""
+    name, extension = os.path.splitext(path)
+    return f"{name}.{digest(data)}{extension}"
+
+
+def compress(data: bytes) -> Dict[str, bytes]:
+    """Precompressed variants, keeping only those smaller than the original"""
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def sources(static_dir: str) -> List[str]:
+    """Static files that go through the pipeline, relative to static_dir"""
+    found = []
+    for root, _, names in os.walk(static_dir):
+        for name in names:
+            if os.path.splitext(name)[1] in config.ASSET_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/"))
+    return sorted(found)
+
+
+def _write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            stream.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def build(static_dir: str = "static", out_dir: str = config.ASSET_BUILD_DIR) -> Dict[str, str]:
+    """Write fingerprinted and precompressed copies of every source, returning the manifest"""
+    manifest = {}
+    for source in sources(static_dir):
+        with open(os.path.join(static_dir, source), "rb") as stream:
+            data = stream.read()
+        target = fingerprint(source, data)
+        _write(os.path.join(out_dir, target), data)
+        for encoding, body in compress(data).items():
+            _write(os.path.join(out_dir, f"{target}.{'br' if encoding == 'br' else 'gz'}"), body)
+        manifest[source] = target
+    _write(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """Content-codings the client accepts, ignoring those refused with q=0"""
+    accepted = []
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if coding:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists etag.
+
+    If-None-Match uses the weak comparison (RFC 9110, 13.1.2): W/ prefixes are
+    ignored on both sides, so a proxy that weakens our ETags while compressing
+    still gets 304s. The header may hold a comma-separated list or "*".
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def serve(request: Request, asset: Asset, cache_control: str) -> Response:
+    """Serve the best precompressed variant the client accepts, with ETag/304"""
+    accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+    encoding = next(
+        (encoding for encoding in ENCODINGS if encoding in asset.variants and encoding in accepted),
+        "identity"
+    )
+    # Each coding is its own representation and needs its own strong ETag
+    etag = f'"{asset.digest}"' if encoding == "identity" else f'"{asset.digest}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=asset.variants[encoding], media_type=asset.content_type, headers=headers)
+
+
+class AssetBundle:
+    """Built assets and pre-rendered pages, loaded into memory on first use"""
+
+    def __init__(
+        self,
+        static_dir: str = "static",
+        template_dir: str = "templates",
+        out_dir: str = config.ASSET_BUILD_DIR
+    ):
+        self.static_dir = static_dir
+        self.template_dir = template_dir
+        self.out_dir = out_dir
+        self.manifest: Dict[str, str] = {}
+        self.assets: Dict[str, Asset] = {}
+        self.pages: Dict[str, Asset] = {}
+        self.loaded = False
+
+    def _current(self, manifest: Dict[str, str]) -> bool:
+        if sorted(manifest) != sources(self.static_dir):
+            return False
+        for source, target in manifest.items():
+            with open(os.path.join(self.static_dir, source), "rb") as stream:
+                if fingerprint(source, stream.read()) != target:
+                    return False
+            if not os.path.exists(os.path.join(self.out_dir, target)):
+                return False
+        return True
+
+    def _read_manifest(self) -> Optional[Dict[str, str]]:
+        try:
+            with open(os.path.join(self.out_dir, "manifest.json")) as stream:
+                return json.load(stream)
+        except (OSError, ValueError):
+            return None
+
+    def _load_asset(self, target: str) -> Asset:
+        path = os.path.join(self.out_dir, target)
+        with open(path, "rb") as stream:
+            data = stream.read()
+        variants = {"identity": data}
+        for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+            if os.path.exists(path + suffix):
+                with open(path + suffix, "rb") as stream:
+                    variants[encoding] = stream.read()
+        content_type = mimetypes.guess_type(target)[0] or "application/octet-stream"
+        return Asset(content_type, digest(data), variants)
+
+    def load(self) -> None:
+        """Build if needed, read every asset into memory and render the pages"""
+        manifest = self._read_manifest()
+        if manifest is None or not self._current(manifest):
+            manifest = build(self.static_dir, self.out_dir)
+            logger.info("Built %d assets into %s", len(manifest), self.out_dir)
+        self.manifest = manifest
+        self.assets = {target: self._load_asset(target) for target in manifest.values()}
+        if not self.has(THREE_BUNDLE):
+            logger.warning(
+                "%s/%s is missing, so the page loads Three.js from the CDN; "
+                "build it with ./start.sh or 'cd vendor/three && npm install && npm run build'",
+                self.static_dir, THREE_BUNDLE
+            )
+
+        environment = jinja2.Environment(loader=jinja2.FileSystemLoader(self.template_dir), autoescape=True)
+        context = {
+            "asset": self.url,
+            "has_asset": self.has,
+            "render_mode": config.VIEWER_RENDER_MODE,
+            "shadow_quality": config.VIEWER_SHADOW_QUALITY,
+            "lod_segments": config.MESH_LOD_SEGMENTS
+        }
+        self.pages = {}
+        for name in PAGES:
+            html = environment.get_template(name).render(context).encode()
+            variants = dict(compress(html), identity=html)
+            self.pages[name] = Asset("text/html; charset=utf-8", digest(html), variants)
+        self.loaded = True
+
+    def ensure_loaded(self) -> "AssetBundle":
+        if not self.loaded:
+            self.load()
+        return self
+
+    def url(self, source: str) -> str:
+        """Fingerprinted URL for a static file, or its plain /static URL if not built"""
+        target = self.manifest.get(source)
+        return ASSET_PREFIX + target if target else f"/static/{source}"
+
+    def has(self, source: str) -> bool:
+        return source in self.manifest
+
+    def page(self, name: str) -> Asset:
+        return self.ensure_loaded().pages[name]
+
+    def asset(self, path: str) -> Optional[Asset]:
+        return self.ensure_loaded().assets.get(path)
+
+
+bundle = AssetBundle()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for source, target in build().items():
+        print(f"{source} -> {target}")
@@ -0,0 +1,212 @@
+"""
+Async load generator for the 3DNavi server.
+
+Drives /configure, /api/v1/quotes, / and a static asset at a fixed
+concurrency and reports requests per second and latency percentiles per
+scenario. Without --url an uvicorn server is started in-process on a free port.
+
+    python -m benchmarks.loadtest --concurrency 50 --duration 10
+    python -m benchmarks.loadtest --url http://localhost:8000 --save-baseline baseline.json
+    python -m benchmarks.loadtest --baseline baseline.json --tolerance 0.2
+
+With --baseline the run exits with status 1 if any scenario's RPS dropped or
+p95 latency grew by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import httpx
+
+PART = {
+    "material": "aluminum",
+    "surface_treatment": "anodizing",
+    "length": 100,
+    "width": 50,
+    "thickness": 5,
+    "hole_diameter": 10,
+    "quantity": 1
+}
+
+SCENARIOS: Dict[str, Callable[[httpx.AsyncClient], Any]] = {
+    "configure": lambda client: client.post("/configure", data=PART),
+    "api": lambda client: client.post("/api/v1/quotes", json=PART),
+    "index": lambda client: client.get("/"),
+    "static": lambda client: client.get("/static/js/app.js")
+}
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+async def run_scenario(
+    base_url: str,
+    scenario: str,
+    concurrency: int,
+    duration: Optional[float],
+    requests: Optional[int]
+) -> Dict[str, float]:
+    """Run one scenario with `concurrency` workers until the duration or request budget is spent"""
+    send = SCENARIOS[scenario]
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+
+        async def worker() -> None:
+            nonlocal errors, issued
+            while True:
+                if requests is not None:
+                    if issued >= requests:
+                        return
+                    issued += 1
+                elif time.perf_counter() >= deadline:
+                    return
+                sent = time.perf_counter()
+                try:
+                    response = await send(client)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - sent)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors, elapsed)
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float
+) -> List[str]:
+    """Describe every scenario that regressed against the baseline"""
+    regressions = []
+    for scenario, result in results.items():
+        reference = baseline.get(scenario)
+        if not reference:
+            continue
+        if result["rps"] < reference["rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: rps {result['rps']} < baseline {reference['rps']}")
+        if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']}ms > baseline {reference['p95_ms']}ms")
+    return regressions
+
+
+class InProcessServer:
+    """uvicorn serving main.app from a background thread on a free port"""
+
+    def __init__(self):
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(
+            "main:app", host="127.0.0.1", port=self.port, log_level="warning"
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "InProcessServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("in-process server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load-test the 3DNavi quote path")
+    parser.add_argument("--url", help="server to test (default: start one in-process)")
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS),
+        help="scenario to run, may be repeated (default: all)"
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("-d", "--duration", type=float, default=5.0, help="seconds per scenario")
+    budget.add_argument("-n", "--requests", type=int, help="requests per scenario instead of a duration")
+    parser.add_argument("--save-baseline", metavar="FILE", help="write results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare results against a JSON baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1,
+        help="allowed relative regression against the baseline (default: 0.1)"
+    )
+    return parser
+
+
+async def run(base_url: str, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for scenario in args.scenario or list(SCENARIOS):
+        results[scenario] = await run_scenario(
+            base_url, scenario, args.concurrency,
+            None if args.requests else args.duration, args.requests
+        )
+        print(f"{scenario:>10}: " + "  ".join(f"{k}={v}" for k, v in results[scenario].items()))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.url:
+        results = asyncio.run(run(args.url, args))
+    else:
+        with InProcessServer() as server:
+            results = asyncio.run(run(server.url, args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as source:
+            regressions = compare(results, json.load(source), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Micro-benchmarks for the quote path.
+
+    python -m pytest benchmarks/ --benchmark-autosave
+    python -m pytest benchmarks/ --benchmark-compare
+
+Requires pytest-benchmark; the module is skipped without it.
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fastapi.testclient import TestClient
+
+import geometry
+import pricing
+import quote_api
+import quote_cache
+import quote_store
+import scheduler
+from main import app
+
+PART = {
+    "material": "aluminum",
+    "surface_treatment": "anodizing",
+    "length": 100.0,
+    "width": 50.0,
+    "thickness": 5.0,
+    "hole_diameter": 10.0,
+    "quantity": 1
+}
+RAW_ROW = {name: str(value) for name, value in PART.items()}
+BATCH_SIZE = 100_000
+
+
+@pytest.fixture(scope="module")
+def batch():
+    materials = ["aluminum", "steel", "titanium", "plastic"]
+    treatments = ["none", "anodizing", "powder_coating", "machining"]
+    return [
+        dict(
+            PART,
+            material=materials[i % 4],
+            surface_treatment=treatments[(i // 4) % 4],
+            length=10.0 + i % 990,
+            quantity=1 + i % 100
+        )
+        for i in range(BATCH_SIZE)
+    ]
+
+
+def test_calculate_price(benchmark):
+    benchmark(
+        pricing.calculate_price,
+        PART["material"], PART["surface_treatment"], PART["length"], PART["width"],
+        PART["thickness"], PART["hole_diameter"], PART["quantity"]
+    )
+
+
+def test_quote_cache_price(benchmark):
+    benchmark(quote_cache.price, PART)
+
+
+def test_quote_cache_production(benchmark):
+    quote_cache.production(PART)
+    benchmark(quote_cache.production, PART)
+
+
+def test_part_geometry(benchmark):
+    benchmark(
+        geometry.part_geometry,
+        PART["material"], PART["length"], PART["width"], PART["thickness"], PART["hole_diameter"]
+    )
+
+
+def test_parse_part(benchmark):
+    benchmark(pricing.parse_part, RAW_ROW)
+
+
+def test_price_parts_100k(benchmark, batch):
+    prices = benchmark(pricing.price_parts, batch)
+    assert len(prices) == BATCH_SIZE
+
+
+@pytest.fixture
+def isolated_databases(tmp_path, monkeypatch):
+    """Keep quotes and bookings out of the working directory"""
+    monkeypatch.setattr(quote_store, "store", quote_store.QuoteStore(str(tmp_path / "quotes.db")))
+    monkeypatch.setattr(scheduler, "schedule", scheduler.Schedule(path=str(tmp_path / "schedule.db")))
+
+
+def test_configure_request(benchmark, isolated_databases):
+    """Full /configure round trip: form parsing, validation, pricing, serialization"""
+    client = TestClient(app)
+
+    response = benchmark(client.post, "/configure", data=PART)
+    assert response.status_code == 200
+
+
+def test_api_quote_request(benchmark, isolated_databases):
+    """Same quote through the JSON API"""
+    client = TestClient(app)
+
+    response = benchmark(client.post, "/api/v1/quotes", json=PART)
+    assert response.status_code == 200
+
+
+def test_api_decode(benchmark):
+    body = json.dumps(PART).encode()
+    benchmark(quote_api.decode, body, quote_api.JSON)
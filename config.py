@@ -2,11 +2,18 @@
 Configuration settings for 3DNavi Manufacturing Platform
 """
 
+import os
+
 # Server Configuration
 SERVER_HOST = "0.0.0.0"
 SERVER_PORT = 12000
 DEBUG_MODE = True
 
+# Production launcher (serve.py)
+SERVER_WORKERS = int(os.environ.get("THREEDNAVI_WORKERS", "0"))  # 0 = one per CPU
+STARTUP_BUDGET = float(os.environ.get("THREEDNAVI_STARTUP_BUDGET", "2.0"))  # seconds per worker boot
+SHUTDOWN_TIMEOUT = 30  # seconds for in-flight requests to finish on stop/restart
+
 # Application Settings
 APP_TITLE = "3DNavi - On-Demand Manufacturing Platform"
 APP_DESCRIPTION = "Modern on-demand manufacturing with real-time 3D visualization"
@@ -14,6 +21,11 @@ APP_DESCRIPTION = "Modern on-demand manufacturing with real-time 3D visualizatio
 # Pricing Configuration
 BASE_PRICE = 0.001  # Base price per cubic mm (more realistic pricing)
 
+# Pricing tables file; when present it overrides the defaults below and is
+# hot-reloaded on change (see pricing_tables.py)
+PRICING_TABLES_PATH = os.environ.get("THREEDNAVI_PRICING_TABLES", "pricing_tables.json")
+PRICING_TABLES_POLL_INTERVAL = 2.0  # seconds
+
 # Material pricing multipliers
 MATERIAL_MULTIPLIERS = {
     "aluminum": 1.0,
@@ -30,11 +42,124 @@ SURFACE_TREATMENT_MULTIPLIERS = {
     "machining": 1.5
 }
 
+# Volume discount tiers: minimum order quantity -> fraction off the whole order.
+# Empty means strictly linear pricing; e.g. {10: 0.05, 50: 0.10, 100: 0.15}
+VOLUME_DISCOUNTS = {}
+# Share of the material price charged for stock consumed by nesting but not
+# ending up in parts (offcuts, kerf, hole slugs); 0 prices net volume only
+SCRAP_CHARGE = 0.0
+PRICE_CURVE_MAX_POINTS = 1000  # quantities per price-curve request
+PRICE_MATRIX_MAX_CELLS = 100000  # prices per comparison-matrix request
+STREAM_CHUNK_SIZE = 5000  # rows priced at a time by /configure/stream and quote_cli
+STREAM_THREADPOOL_ROWS = 100  # /configure/stream prices chunks this large in a worker thread
+
+# Quote persistence (SQLite in WAL mode, written in batches)
+QUOTE_DB_PATH = os.environ.get("THREEDNAVI_QUOTE_DB", "quotes.db")
+QUOTE_STORE_BATCH_SIZE = 500  # max quotes per transaction
+QUOTE_STORE_QUEUE_SIZE = 10000  # max quotes waiting to be written
+QUOTE_STORE_RETRY_DELAY = 0.5  # seconds before retrying a failed batch, doubling each time
+QUOTE_STORE_MAX_RETRY_DELAY = 30.0
+
+# Live quotes over WebSocket (see live_quotes.py)
+LIVE_QUOTE_INTERVAL = 0.1  # seconds; at most one price per connection per interval
+LIVE_QUOTE_MAX_MESSAGE_BYTES = 4096  # larger frames close the connection
+LIVE_QUOTE_MAX_QUEUE = 16  # frames buffered per connection before reads stop
+LIVE_QUOTE_IDLE_TIMEOUT = 300  # seconds without a message before closing
+
+# Admission control (see admission.py), per worker process. For each route
+# class: requests served at once, requests waiting for a slot, and the
+# longest queue wait in seconds before a request is turned away with 503.
+# Bulk classes only take a free slot while no interactive request is waiting.
+ADMISSION_CLASSES = {
+    "quotes": {"concurrency": 32, "queue": 256, "max_wait": 0.25, "bulk": False},
+    "pages": {"concurrency": 16, "queue": 64, "max_wait": 0.5, "bulk": False},
+    "static": {"concurrency": 64, "queue": 256, "max_wait": 0.5, "bulk": False},
+    "batch": {"concurrency": 2, "queue": 16, "max_wait": 5.0, "bulk": True}
+}
+ADMISSION_EXEMPT = ("/health", "/metrics", "/admin/")  # never queued, nor are */stats endpoints
+
+# Request metrics (served at /metrics)
+METRICS_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)  # seconds
+
+# Sampling profiler (see profiler.py). With THREEDNAVI_PROFILE=1 a capture runs
+# for the life of the worker; otherwise captures are started from /admin/profile
+PROFILING_ENABLED = os.environ.get("THREEDNAVI_PROFILE", "0") not in ("", "0")
+PROFILE_SAMPLE_RATE = float(os.environ.get("THREEDNAVI_PROFILE_SAMPLE_RATE", "0.1"))  # fraction of requests
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_OUTPUT_DIR = os.environ.get("THREEDNAVI_PROFILE_DIR", "profiles")
+PROFILE_MAX_DURATION = 600  # seconds, upper bound for an admin capture
+PROFILE_FLUSH_INTERVAL = 60  # seconds per file when capturing for the life of the worker
+
+# Admin endpoints (/admin/...) are disabled unless a token is configured;
+# requests must send it in the X-Admin-Token header
+ADMIN_TOKEN = os.environ.get("THREEDNAVI_ADMIN_TOKEN")
+
 # Manufacturing Settings
-DEFAULT_DELIVERY_TIME = "5-7 business days"
+DEFAULT_DELIVERY_TIME = "5-7 business days"  # bulk quotes; single quotes are scheduled
 MAX_QUANTITY = 10000
 MIN_DIMENSION = 0.1  # mm
 MAX_DIMENSION = 1000  # mm
+DIMENSION_STEP = 0.1  # mm, matches the form inputs' step
+
+# Quote cache
+QUOTE_CACHE_SIZE = 4096  # entries
+QUOTE_CACHE_TTL = 300  # seconds
+
+# Lead-time scheduling (see scheduler.py): parallel cutting machines per material
+# and finishing lines per surface treatment; treatments not listed need no finishing
+CUTTING_MACHINES = {
+    "aluminum": 2,
+    "steel": 2,
+    "titanium": 1,
+    "plastic": 1
+}
+FINISHING_LINES = {
+    "anodizing": 1,
+    "powder_coating": 1,
+    "machining": 2
+}
+FINISHING_MINUTES_PER_PART = {
+    "anodizing": 1.5,
+    "powder_coating": 2.0,
+    "machining": 4.0
+}
+JOB_SETUP_MINUTES = 30.0  # per job on every machine it visits
+SHOP_DAY_START = 6  # hour the first shift starts, Monday to Friday
+SHOP_HOURS_PER_DAY = 16
+SHIPPING_DAYS = 2  # business days from completion to delivery
+SCHEDULE_DB_PATH = os.environ.get("THREEDNAVI_SCHEDULE_DB", "schedule.db")  # machines and open jobs, shared by workers
+SCHEDULE_LOCK_TIMEOUT = 5.0  # seconds to wait for another worker's booking to commit
+
+# Sheet nesting (see nesting.py): stock sheet sizes (length, width) in mm
+STOCK_SHEETS = (
+    (1000.0, 2000.0),
+    (1250.0, 2500.0),
+    (1500.0, 3000.0)
+)
+NESTING_KERF = 2.0  # mm between neighbouring blanks
+NESTING_EDGE_MARGIN = 10.0  # mm trimmed from each sheet edge
+NESTING_HOLE_CLEARANCE = 2.0  # mm of material kept between the hole and the blank edge
+NESTING_CACHE_SIZE = 4096  # memoized (blank, sheet) layouts
+
+# Material densities (g/cm³)
+MATERIAL_DENSITIES = {
+    "aluminum": 2.70,
+    "steel": 7.85,
+    "titanium": 4.43,
+    "plastic": 1.20
+}
+
+# Machining feed rates per material (mm of cut per minute, per pass)
+MATERIAL_FEED_RATES = {
+    "aluminum": 1000.0,
+    "steel": 400.0,
+    "titanium": 150.0,
+    "plastic": 1500.0
+}
+MACHINING_PASS_DEPTH = 5.0  # mm of thickness cut per pass
+DEFAULT_GEOMETRY_MATERIAL = "aluminum"  # used for unknown materials
 
 # 3D Renderer Settings
 DEFAULT_DIMENSIONS = {
@@ -44,6 +169,29 @@ DEFAULT_DIMENSIONS = {
     "hole_diameter": 10.0
 }
 
+# Viewer rendering: "on-demand" draws only when something changes,
+# "continuous" redraws every animation frame
+VIEWER_RENDER_MODE = "on-demand"
+VIEWER_SHADOW_QUALITY = "high"  # off, low, medium or high
+
+# Server-side mesh export
+MESH_SEGMENTS = 64  # hole tessellation
+MESH_MIN_SEGMENTS = 8
+MESH_MAX_SEGMENTS = 512
+MESH_CACHE_DIR = os.environ.get("THREEDNAVI_MESH_CACHE", ".mesh_cache")
+MESH_CACHE_MAX_BYTES = int(os.environ.get("THREEDNAVI_MESH_CACHE_BYTES", str(256 * 1024 * 1024)))  # least recently used files go first
+
+# Level-of-detail hole tessellation for the 3D viewer
+MESH_LOD_SEGMENTS = {
+    "coarse": 16,
+    "medium": 48,
+    "fine": 128
+}
+
+# Static asset pipeline (see assets.py)
+ASSET_BUILD_DIR = os.environ.get("THREEDNAVI_ASSET_DIR", ".assets")
+ASSET_EXTENSIONS = (".css", ".js")  # files under static/ that are fingerprinted
+
 # Material colors for 3D visualization (hex values)
 MATERIAL_COLORS = {
     "aluminum": 0xc0c0c0,
@@ -64,15 +64,15 @@ def demo_premium_materials():
     
     materials = ["aluminum", "steel", "titanium"]
     
-    for material in materials:
-        config = base_config.copy()
-        config["material"] = material
-        
-        response = requests.post(f"{BASE_URL}/configure", data=config)
-        result = response.json()
-        
+    # One matrix request covers every material
+    config = {key: value for key, value in base_config.items() if key != "surface_treatment"}
+    config["materials"] = materials
+    config["surface_treatments"] = [base_config["surface_treatment"]]
+    matrix = requests.post(f"{BASE_URL}/api/v1/quotes/matrix", json=config).json()
+    
+    for material, prices in zip(matrix["materials"], matrix["prices"]):
         print(f"\n🔹 {material.title()}:")
-        print(f"   Price: ${result['estimated_price']}")
+        print(f"   Price: ${prices[0]}")
 
 def demo_surface_treatments():
     """Demo different surface treatments"""
@@ -94,15 +94,14 @@ def demo_surface_treatments():
         ("machining", "Precision Machined")
     ]
     
-    for treatment_code, treatment_name in treatments:
-        config = base_config.copy()
-        config["surface_treatment"] = treatment_code
-        
-        response = requests.post(f"{BASE_URL}/configure", data=config)
-        result = response.json()
-        
+    config = {key: value for key, value in base_config.items() if key != "material"}
+    config["materials"] = [base_config["material"]]
+    config["surface_treatments"] = [code for code, _ in treatments]
+    matrix = requests.post(f"{BASE_URL}/api/v1/quotes/matrix", json=config).json()
+    
+    for (treatment_code, treatment_name), price in zip(treatments, matrix["prices"][0]):
         print(f"\n🔹 {treatment_name}:")
-        print(f"   Price: ${result['estimated_price']}")
+        print(f"   Price: ${price}")
 
 def demo_bulk_pricing():
     """Demo bulk quantity pricing"""
@@ -115,22 +114,21 @@ def demo_bulk_pricing():
         "width": 40.0,
         "thickness": 4.0,
         "hole_diameter": 6.0,
-        "quantity": 1
+        "quantities": [1, 10, 50, 100]
     }
     
-    quantities = [1, 10, 50, 100]
+    # One request prices every quantity
+    response = requests.post(f"{BASE_URL}/api/v1/quotes/curve", json=config)
+    curve = response.json()
     
-    for qty in quantities:
-        config["quantity"] = qty
-        
-        response = requests.post(f"{BASE_URL}/configure", data=config)
-        result = response.json()
-        
-        unit_price = result['estimated_price'] / qty
-        
+    for qty, total, unit, discount in zip(
+        curve["quantities"], curve["total_prices"], curve["unit_prices"], curve["discounts"]
+    ):
         print(f"\n🔹 Quantity {qty}:")
-        print(f"   Total Price: ${result['estimated_price']}")
-        print(f"   Unit Price: ${unit_price:.2f}")
+        print(f"   Total Price: ${total}")
+        print(f"   Unit Price: ${unit:.2f}")
+        if discount:
+            print(f"   Volume Discount: {discount:.0%}")
 
 def demo_custom_dimensions():
     """Demo custom dimension configurations"""
@@ -0,0 +1,140 @@
+"""
+Plate-with-hole geometry and costing: net volume, mass, cut length and
+machining time, in scalar and vectorized (NumPy) forms.
+
+Per-material constants are folded into a coefficient table once at import,
+so each quote is a handful of multiplications regardless of material.
+"""
+
+import math
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+import config
+
+
+class Coefficients(NamedTuple):
+    mass_per_mm3: float  # g/mm³
+    minutes_per_mm: float  # machining minutes per mm of cut, per pass
+
+
+def _coefficients(material: str) -> Coefficients:
+    return Coefficients(
+        mass_per_mm3=config.MATERIAL_DENSITIES[material] / 1000.0,
+        minutes_per_mm=1.0 / config.MATERIAL_FEED_RATES[material]
+    )
+
+
+COEFFICIENTS: Dict[str, Coefficients] = {
+    material: _coefficients(material) for material in config.MATERIAL_DENSITIES
+}
+DEFAULT_COEFFICIENTS = COEFFICIENTS[config.DEFAULT_GEOMETRY_MATERIAL]
+
+
+def coefficients(material: str) -> Coefficients:
+    """Look up a material's precomputed coefficients"""
+    return COEFFICIENTS.get(material.lower(), DEFAULT_COEFFICIENTS)
+
+
+def effective_hole_diameter(length: float, width: float, hole_diameter: float) -> float:
+    """Clamp the hole so it never exceeds the plate it is cut from"""
+    return max(0.0, min(hole_diameter, length, width))
+
+
+def net_volume(length: float, width: float, thickness: float, hole_diameter: float) -> float:
+    """Plate volume minus the through hole, in mm³"""
+    radius = effective_hole_diameter(length, width, hole_diameter) / 2
+    return (length * width - math.pi * radius * radius) * thickness
+
+
+def cut_length(length: float, width: float, hole_diameter: float) -> float:
+    """Outline plus hole circumference, in mm"""
+    return 2 * (length + width) + math.pi * effective_hole_diameter(length, width, hole_diameter)
+
+
+def passes(thickness: float) -> int:
+    """Number of cutting passes needed through the plate thickness"""
+    return max(1, math.ceil(thickness / config.MACHINING_PASS_DEPTH))
+
+
+def part_geometry(
+    material: str,
+    length: float,
+    width: float,
+    thickness: float,
+    hole_diameter: float
+) -> Dict[str, float]:
+    """Per-part geometry and costing figures for a quote"""
+    coefficient = coefficients(material)
+    volume = net_volume(length, width, thickness, hole_diameter)
+    cut = cut_length(length, width, hole_diameter)
+
+    return {
+        "net_volume": round(volume, 3),
+        "mass": round(volume * coefficient.mass_per_mm3, 3),
+        "cut_length": round(cut, 3),
+        "machining_time": round(cut * passes(thickness) * coefficient.minutes_per_mm, 3)
+    }
+
+
+def _columns(*columns: Iterable[float]) -> Tuple[np.ndarray, ...]:
+    return tuple(np.asarray(column, dtype=float) for column in columns)
+
+
+def net_volumes(
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    thicknesses: Iterable[float],
+    hole_diameters: Iterable[float]
+) -> np.ndarray:
+    """Vectorized net_volume"""
+    length, width, thickness, hole = _columns(lengths, widths, thicknesses, hole_diameters)
+    radius = np.clip(np.minimum(hole, np.minimum(length, width)), 0.0, None) / 2
+    return (length * width - math.pi * radius * radius) * thickness
+
+
+def cut_lengths(
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    hole_diameters: Iterable[float]
+) -> np.ndarray:
+    """Vectorized cut_length"""
+    length, width, hole = _columns(lengths, widths, hole_diameters)
+    hole = np.clip(np.minimum(hole, np.minimum(length, width)), 0.0, None)
+    return 2 * (length + width) + math.pi * hole
+
+
+def _coefficient_columns(materials: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    resolved: Dict[str, Coefficients] = {}
+
+    def lookup(material: str) -> Coefficients:
+        value = resolved.get(material)
+        if value is None:
+            value = resolved[material] = coefficients(material)
+        return value
+
+    table = np.array([lookup(material) for material in materials], dtype=float).reshape(-1, 2)
+    return table[:, 0], table[:, 1]
+
+
+def batch_geometry(
+    materials: Iterable[str],
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    thicknesses: Iterable[float],
+    hole_diameters: Iterable[float]
+) -> Dict[str, np.ndarray]:
+    """Vectorized part_geometry over whole columns"""
+    length, width, thickness, hole = _columns(lengths, widths, thicknesses, hole_diameters)
+    mass_per_mm3, minutes_per_mm = _coefficient_columns(materials)
+    volume = net_volumes(length, width, thickness, hole)
+    cut = cut_lengths(length, width, hole)
+    pass_count = np.maximum(1, np.ceil(thickness / config.MACHINING_PASS_DEPTH))
+
+    return {
+        "net_volume": volume,
+        "mass": volume * mass_per_mm3,
+        "cut_length": cut,
+        "machining_time": cut * pass_count * minutes_per_mm
+    }
@@ -0,0 +1,160 @@
+"""
+Live quotes: prices pushed over a WebSocket while a configuration is edited.
+
+The page opens /ws/quotes and sends {"seq": n, "set": {field: value, ...}}
+whenever form fields change: the whole configuration first, then only the
+fields that changed (null unsets a field). Every connection holds a single
+merged configuration, so a burst of keystrokes costs one dict update each,
+and prices are computed from whatever the configuration is when the
+connection is next due: at most one price per LIVE_QUOTE_INTERVAL, tagged
+with the seq of the last change it includes. Replies are
+
+    {"seq": n, "price": ..., "delivery": ..., "delivery_date": ..., "pricing_version": ...}
+    {"seq": n, "detail": [validation errors]}
+
+A connection's memory is bounded: frames over LIVE_QUOTE_MAX_MESSAGE_BYTES
+close it (1009), only the quote fields are kept, and uvicorn buffers at most
+LIVE_QUOTE_MAX_QUEUE unread frames before it stops reading the socket.
+Malformed messages close it with 1007 and idle ones with 1001.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Mapping, Optional
+
+from pydantic import ValidationError
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+import config
+import metrics
+import pricing
+import pricing_tables
+import quote_api
+import quote_cache
+import scheduler
+
+FIELDS = frozenset(quote_api.QuoteRequest.model_fields)
+
+# Close codes (RFC 6455)
+GOING_AWAY = 1001
+INVALID_PAYLOAD = 1007
+MESSAGE_TOO_BIG = 1009
+
+
+class MalformedMessage(ValueError):
+    pass
+
+
+class Session:
+    """One connection's configuration and the seq of the last change to it"""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.seq: Optional[int] = None
+        self.changed = asyncio.Event()
+
+    def apply(self, message: Any) -> None:
+        """Merge a change message; raises MalformedMessage"""
+        if not isinstance(message, dict) or not isinstance(message.get("set", {}), dict):
+            raise MalformedMessage('expected {"seq": n, "set": {...}}')
+        seq = message.get("seq")
+        if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+            raise MalformedMessage("seq must be an integer")
+        changes = message.get("set", {})
+        unknown = sorted(set(changes) - FIELDS)
+        if unknown:
+            raise MalformedMessage(f"unknown fields: {', '.join(unknown)}")
+
+        for name, value in changes.items():
+            if value is None:
+                self.fields.pop(name, None)
+            else:
+                self.fields[name] = value
+        self.seq = seq
+        self.changed.set()
+
+    def quote(self) -> Dict[str, Any]:
+        """Price the current configuration"""
+        try:
+            request = quote_api.QuoteRequest.model_validate(self.fields)
+        except ValidationError as exc:
+            return {"seq": self.seq, "detail": quote_api.errors(exc)}
+        part = quote_api.part(request)
+        tables = pricing_tables.current()
+        lead_time = scheduler.schedule.estimate(pricing.configuration(part))
+        return {
+            "seq": self.seq,
+            "price": round(quote_cache.price(part, tables), 2),
+            "delivery": lead_time.describe(),
+            "delivery_date": lead_time.delivery_date.isoformat(),
+            "pricing_version": tables.version
+        }
+
+
+def decode(message: Mapping[str, Any]) -> Any:
+    """JSON payload of a text or binary frame; raises MalformedMessage"""
+    data = message.get("text")
+    if data is None:
+        data = message.get("bytes") or b""
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        raise MalformedMessage(f"invalid JSON: {exc}") from exc
+
+
+def frame_size(message: Mapping[str, Any]) -> int:
+    text = message.get("text")
+    return len(text.encode()) if text is not None else len(message.get("bytes") or b"")
+
+
+async def receive_changes(websocket: WebSocket, session: Session) -> Optional[int]:
+    """Merge incoming changes until the client leaves; returns the code to close with, if any"""
+    while True:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), config.LIVE_QUOTE_IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return GOING_AWAY
+        if message["type"] == "websocket.disconnect":
+            return None
+        if frame_size(message) > config.LIVE_QUOTE_MAX_MESSAGE_BYTES:
+            return MESSAGE_TOO_BIG
+        try:
+            session.apply(decode(message))
+        except MalformedMessage:
+            return INVALID_PAYLOAD
+        metrics.live_quote_messages.inc("received")
+
+
+async def send_prices(websocket: WebSocket, session: Session) -> None:
+    """Price the latest configuration after each change, at most once per interval"""
+    while True:
+        await session.changed.wait()
+        session.changed.clear()
+        await websocket.send_text(quote_api.dumps(session.quote()).decode())
+        metrics.live_quote_messages.inc("sent")
+        await asyncio.sleep(config.LIVE_QUOTE_INTERVAL)
+
+
+async def serve(websocket: WebSocket) -> None:
+    """Run one live-quote connection until either side closes it"""
+    await websocket.accept()
+    metrics.live_quote_connections.inc()
+    session = Session()
+    receiver = asyncio.ensure_future(receive_changes(websocket, session))
+    sender = asyncio.ensure_future(send_prices(websocket, session))
+    try:
+        done, _ = await asyncio.wait((receiver, sender), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (receiver, sender):
+            task.cancel()
+        await asyncio.gather(receiver, sender, return_exceptions=True)
+        metrics.live_quote_connections.dec()
+
+    if receiver not in done:
+        try:
+            sender.result()  # only ever finishes by raising
+        except WebSocketDisconnect:
+            return
+    code = receiver.result()
+    if code is not None:
+        await websocket.close(code)
@@ -1,29 +1,88 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, WebSocket, Form, HTTPException, Query, Header, Depends
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
-import uvicorn
+import asyncio
+import hmac
+import importlib
+import time
+import admission
+import assets
 import config
+import metrics
+import pricing_tables
+import profiler
+import quote_api
+import quote_store
+import single_flight
+
+# Modules that pull in numpy (geometry, pricing, nesting, mesh, scheduler and
+# everything built on them) are imported by the routes that use them, so a
+# worker starts serving pages before they are loaded; warm_caches() loads
+# them in the background right after startup
+
+# Pricing tables file watcher
+table_watcher = pricing_tables.TableWatcher(config.PRICING_TABLES_PATH)
+# Identical /configure requests in flight at the same time share one computation
+configure_flights = single_flight.SingleFlight()
+
+def warm_caches() -> None:
+    """Import the pricing stack and precompute the default part's meshes and nesting"""
+    import mesh
+    import nesting
+
+    for name in ("live_quotes", "quote_stream"):
+        importlib.import_module(name)
+    mesh.warm_lods(config.DEFAULT_DIMENSIONS)
+    nesting.warm(config.DEFAULT_DIMENSIONS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    table_watcher.start()
+    quote_store.store.start()
+    assets.bundle.load()
+    warming = asyncio.ensure_future(run_in_threadpool(warm_caches))
+    if config.PROFILING_ENABLED:
+        profiler.profiler.start()
+    yield
+    await warming
+    await quote_store.store.close()
+    import scheduler
+    scheduler.schedule.close()
+    table_watcher.stop()
+    if profiler.profiler.running:
+        await run_in_threadpool(profiler.profiler.stop)
 
 app = FastAPI(
     title=config.APP_TITLE,
-    description=config.APP_DESCRIPTION
+    description=config.APP_DESCRIPTION,
+    lifespan=lifespan
 )
+app.add_middleware(profiler.ProfilingMiddleware)
+app.add_middleware(admission.AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Templates
-templates = Jinja2Templates(directory="templates")
-
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    """Main page with 3D renderer and configuration form"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    """Main page with 3D renderer and configuration form, rendered once at startup"""
+    return assets.serve(request, assets.bundle.page("index.html"), assets.REVALIDATE)
+
+@app.get("/assets/{path:path}")
+async def fingerprinted_asset(request: Request, path: str):
+    """Content-hashed static file, precompressed and cacheable forever"""
+    asset = assets.bundle.asset(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return assets.serve(request, asset, assets.IMMUTABLE)
 
 @app.post("/configure")
 async def configure_part(
+    request: Request,
     material: str = Form(...),
     surface_treatment: str = Form(...),
     length: float = Form(...),
@@ -33,43 +92,390 @@ async def configure_part(
     quantity: int = Form(...)
 ):
     """Handle part configuration submission"""
-    configuration = {
+    import pricing
+    import quote_cache
+
+    # Routing, form parsing and validation all happen before the handler runs,
+    # but after the request has waited for an admission slot
+    phase_start = time.perf_counter()
+    request_start = request.scope.get("metrics.start")
+    granted = request.scope.get("admission.granted")
+    if request_start is not None and granted is not None:
+        metrics.configure_phase.observe(granted - request_start, "queue")
+    parse_start = granted if granted is not None else request_start
+    if parse_start is not None:
+        metrics.configure_phase.observe(phase_start - parse_start, "parse")
+
+    part = {
         "material": material,
         "surface_treatment": surface_treatment,
-        "dimensions": {
-            "length": length,
-            "width": width,
-            "thickness": thickness,
-            "hole_diameter": hole_diameter
-        },
+        "length": length,
+        "width": width,
+        "thickness": thickness,
+        "hole_diameter": hole_diameter,
         "quantity": quantity
     }
-    
-    # Calculate estimated price using configuration
-    base_price = config.BASE_PRICE
-    material_multiplier = config.MATERIAL_MULTIPLIERS.get(material.lower(), 1.0)
-    surface_multiplier = config.SURFACE_TREATMENT_MULTIPLIERS.get(surface_treatment.lower(), 1.0)
-    
-    volume = length * width * thickness
-    estimated_price = base_price * material_multiplier * surface_multiplier * volume * quantity
-    
+    tables = pricing_tables.current()
+    # "Steel" and "steel", or 50 and 50.0, are the same configuration
+    key = (tables.version, *quote_cache.part_key(part))
+    priced, shared = await configure_flights.do(key, lambda: price_configuration(part, tables))
+    metrics.configure_requests.inc("coalesced" if shared else "computed")
+    metrics.count_quote(material, surface_treatment)
+
+    # Only the pricing is shared; every request is its own quote
+    started = time.perf_counter()
+    quote_id = quote_store.store.new_id()
+    quote = {
+        "status": "success",
+        "quote_id": quote_id,
+        "configuration": pricing.configuration(part),
+        **priced
+    }
+    body = JSONResponse(quote).body
+    serialized = time.perf_counter()
+    metrics.configure_phase.observe(serialized - started, "serialization")
+
+    await quote_store.store.save(quote_id, quote)
+    metrics.configure_phase.observe(time.perf_counter() - serialized, "persist")
+    return Response(content=body, media_type="application/json")
+
+async def price_configuration(part: dict, tables: pricing_tables.PricingTables) -> dict:
+    """Price, lead time, geometry and nesting of one /configure part"""
+    import pricing
+    import quote_cache
+    import scheduler
+
+    started = time.perf_counter()
+    lead_time = scheduler.schedule.estimate(pricing.configuration(part))
+    produced = quote_cache.production(part)
+    priced = {
+        "estimated_price": round(quote_cache.price(part, tables), 2),
+        "estimated_delivery": lead_time.describe(),
+        "delivery_date": lead_time.delivery_date.isoformat(),
+        "pricing_version": tables.version,
+        "geometry": produced["geometry"],
+        "nesting": produced["nesting"]
+    }
+    metrics.configure_phase.observe(time.perf_counter() - started, "pricing")
+    return priced
+
+@app.post(
+    "/api/v1/quotes",
+    response_model=quote_api.QuoteResponse,
+    openapi_extra=quote_api.request_schema()
+)
+async def create_quote(request: Request):
+    """Quote one part from a JSON or MessagePack body"""
+    import pricing
+    import quote_cache
+    import scheduler
+
+    accept = request.headers.get("accept", "")
+    parsed, error = await quote_api.parse(request, quote_api.QuoteRequest)
+    if error is not None:
+        return error
+
+    part = quote_api.part(parsed)
+    configuration = pricing.configuration(part)
+    tables = pricing_tables.current()
+    quote_id = quote_store.store.new_id()
+    quote = quote_api.response(
+        quote_id, quote_cache.price(part, tables), tables.version,
+        scheduler.schedule.estimate(configuration)
+    )
+    metrics.count_quote(parsed.material, parsed.surface_treatment)
+
+    await quote_store.store.save(quote_id, dict(quote, configuration=configuration))
+    return quote_api.encode(quote, accept)
+
+@app.post(
+    "/api/v1/quotes/curve",
+    response_model=quote_api.CurveResponse,
+    openapi_extra=quote_api.request_schema(quote_api.CurveRequest)
+)
+async def price_curve(request: Request):
+    """Total and unit price of one part across a list or range of quantities"""
+    import pricing
+
+    accept = request.headers.get("accept", "")
+    parsed, error = await quote_api.parse(request, quote_api.CurveRequest)
+    if error is not None:
+        return error
+
+    tables = pricing_tables.current()
+    quantities = parsed.points()
+    curve = pricing.price_curve(quote_api.part(parsed), quantities, tables)
+    return quote_api.encode(quote_api.curve_response(quantities, curve, tables.version), accept)
+
+@app.post(
+    "/api/v1/quotes/matrix",
+    response_model=quote_api.MatrixResponse,
+    openapi_extra=quote_api.request_schema(quote_api.MatrixRequest)
+)
+async def price_matrix(request: Request):
+    """Material x treatment (x dimension sweep) price matrix for one base part"""
+    import pricing
+
+    accept = request.headers.get("accept", "")
+    parsed, error = await quote_api.parse(request, quote_api.MatrixRequest)
+    if error is not None:
+        return error
+
+    tables = pricing_tables.current()
+    matrix = pricing.price_matrix(
+        quote_api.dimensions(parsed),
+        parsed.quantity,
+        parsed.materials,
+        parsed.surface_treatments,
+        parsed.sweep.dimension if parsed.sweep else None,
+        parsed.sweep.points() if parsed.sweep else None,
+        tables
+    )
+    return quote_api.encode(quote_api.matrix_response(matrix, tables.version), accept)
+
+@app.get("/quotes/{quote_id}")
+async def get_quote(quote_id: str):
+    """Fetch a previously issued quote"""
+    quote = await quote_store.store.get(quote_id)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    return quote
+
+@app.post("/quotes/{quote_id}/book", status_code=201)
+async def book_quote(quote_id: str):
+    """Reserve shop capacity for a previously issued quote"""
+    import scheduler
+
+    quote = await quote_store.store.get(quote_id)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    try:
+        job, lead_time = await run_in_threadpool(scheduler.schedule.book, quote["configuration"], quote_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return {
+        "job_id": job.job_id,
+        "quote_id": quote_id,
+        "completion_date": lead_time.completion_date.isoformat(),
+        "delivery_date": lead_time.delivery_date.isoformat(),
+        "estimated_delivery": lead_time.describe()
+    }
+
+@app.delete("/jobs/{job_id}", status_code=204)
+async def release_job(job_id: str):
+    """Cancel a booked job, moving the work queued behind it forward"""
+    import scheduler
+
+    if not await run_in_threadpool(scheduler.schedule.release, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Response(status_code=204)
+
+@app.get("/schedule/stats")
+async def schedule_stats():
+    """Open jobs and backlog per machine pool"""
+    import scheduler
+
+    return await run_in_threadpool(scheduler.schedule.stats)
+
+@app.websocket("/ws/quotes")
+async def live_quote(websocket: WebSocket):
+    """Price a configuration as it is edited; see live_quotes.py for the protocol"""
+    import live_quotes
+
+    await live_quotes.serve(websocket)
+
+@app.post("/configure/batch")
+async def configure_batch(request: Request):
+    """Price many part configurations at once (JSON array or NDJSON body)"""
+    import pricing
+
+    body = await request.body()
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+
+    try:
+        rows = pricing.load_rows(body, ndjson=ndjson)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    parts = []
+    for index, row in enumerate(rows):
+        try:
+            parts.append(pricing.parse_part(row))
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=f"row {index}: {exc}")
+
+    tables = pricing_tables.current()
+    prices = pricing.price_parts(parts, tables)
+
     return {
         "status": "success",
-        "configuration": configuration,
-        "estimated_price": round(estimated_price, 2),
-        "estimated_delivery": config.DEFAULT_DELIVERY_TIME
+        "count": len(parts),
+        "estimated_prices": [round(price, 2) for price in prices.tolist()],
+        "estimated_delivery": config.DEFAULT_DELIVERY_TIME,
+        "pricing_version": tables.version
     }
 
+@app.post("/configure/stream")
+async def configure_stream(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    chunk_size: int = config.STREAM_CHUNK_SIZE
+):
+    """Stream quotes for a CSV/NDJSON upload of any size back as NDJSON"""
+    import quote_stream
+
+    fmt = fmt or quote_stream.detect_format(request.headers.get("content-type"))
+    if fmt not in quote_stream.FORMATS:
+        raise HTTPException(status_code=422, detail=f"unsupported format: {fmt}")
+    if chunk_size < 1:
+        raise HTTPException(status_code=422, detail="chunk_size must be positive")
+
+    return quote_stream.DuplexStreamingResponse(
+        quote_stream.aiter_quotes(request.stream(), fmt, chunk_size),
+        media_type="application/x-ndjson"
+    )
+
+def validate_mesh_dimensions(length: float, width: float, thickness: float, hole_diameter: float) -> dict:
+    """Check mesh query dimensions against the manufacturing limits"""
+    for name, value in (("length", length), ("width", width), ("thickness", thickness)):
+        if not config.MIN_DIMENSION <= value <= config.MAX_DIMENSION:
+            raise HTTPException(status_code=422, detail=f"{name} must be between {config.MIN_DIMENSION} and {config.MAX_DIMENSION} mm")
+    if not 0 <= hole_diameter <= config.MAX_DIMENSION:
+        raise HTTPException(status_code=422, detail=f"hole_diameter must be between 0 and {config.MAX_DIMENSION} mm")
+    return {
+        "length": length,
+        "width": width,
+        "thickness": thickness,
+        "hole_diameter": hole_diameter
+    }
+
+async def mesh_response(request: Request, params: dict, fmt: str, headers: dict) -> Response:
+    """Serve a cached mesh export with ETag revalidation"""
+    import mesh
+
+    key, path = await run_in_threadpool(mesh.cache.get, params, fmt)
+
+    etag = f'"{key}"'
+    headers = dict(headers, ETag=etag)
+    headers.setdefault("Cache-Control", "public, max-age=86400")
+    if assets.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=mesh.MEDIA_TYPES[fmt], headers=headers)
+
+@app.get("/mesh/plate.{fmt}")
+async def download_plate_mesh(
+    request: Request,
+    fmt: str,
+    length: float = config.DEFAULT_DIMENSIONS["length"],
+    width: float = config.DEFAULT_DIMENSIONS["width"],
+    thickness: float = config.DEFAULT_DIMENSIONS["thickness"],
+    hole_diameter: float = config.DEFAULT_DIMENSIONS["hole_diameter"],
+    segments: int = config.MESH_SEGMENTS
+):
+    """Download the plate-with-hole mesh as binary STL or glTF"""
+    import mesh
+
+    if fmt not in mesh.FORMATS:
+        raise HTTPException(status_code=404, detail=f"unsupported mesh format: {fmt}")
+    params = validate_mesh_dimensions(length, width, thickness, hole_diameter)
+    if not config.MESH_MIN_SEGMENTS <= segments <= config.MESH_MAX_SEGMENTS:
+        raise HTTPException(status_code=422, detail=f"segments must be between {config.MESH_MIN_SEGMENTS} and {config.MESH_MAX_SEGMENTS}")
+    params["segments"] = segments
+
+    filename = f"plate-{length:g}x{width:g}x{thickness:g}-h{hole_diameter:g}.{fmt}"
+    return await mesh_response(request, params, fmt, {"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/mesh/plate/lod")
+async def plate_mesh_lod(
+    request: Request,
+    level: str = "medium",
+    length: float = config.DEFAULT_DIMENSIONS["length"],
+    width: float = config.DEFAULT_DIMENSIONS["width"],
+    thickness: float = config.DEFAULT_DIMENSIONS["thickness"],
+    hole_diameter: float = config.DEFAULT_DIMENSIONS["hole_diameter"]
+):
+    """Plate mesh at one level of detail as compact typed-array buffers"""
+    import mesh
+
+    if level not in config.MESH_LOD_SEGMENTS:
+        raise HTTPException(status_code=422, detail=f"level must be one of {', '.join(config.MESH_LOD_SEGMENTS)}")
+    params = mesh.lod_params(validate_mesh_dimensions(length, width, thickness, hole_diameter), level)
+    return await mesh_response(request, params, "bin", {"X-Mesh-Level": level})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Geometry and nesting cache counters"""
+    import quote_cache
+
+    return quote_cache.cache.stats()
+
+@app.get("/configure/stats")
+async def configure_stats():
+    """Single-flight counters for /configure: computed, coalesced and their ratio"""
+    return configure_flights.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Request, phase and quote metrics in the Prometheus text format"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints only exist when ADMIN_TOKEN is configured"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_status():
+    """State of the sampling profiler"""
+    return profiler.profiler.status()
+
+@app.post("/admin/profile/start", dependencies=[Depends(require_admin)])
+async def profile_start(duration: float = 30.0, sample_rate: Optional[float] = None):
+    """Start a time-boxed profiling capture"""
+    if not 0 < duration <= config.PROFILE_MAX_DURATION:
+        raise HTTPException(status_code=422, detail=f"duration must be between 0 and {config.PROFILE_MAX_DURATION} seconds")
+    if sample_rate is not None and not 0 < sample_rate <= 1:
+        raise HTTPException(status_code=422, detail="sample_rate must be between 0 and 1")
+    try:
+        profiler.profiler.start(duration, sample_rate)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return profiler.profiler.status()
+
+@app.post("/admin/profile/stop", dependencies=[Depends(require_admin)])
+async def profile_stop():
+    """Stop the running capture early and write its profile"""
+    await run_in_threadpool(profiler.profiler.stop)
+    return profiler.profiler.status()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Slots, queues and expected waits per route class"""
+    return admission.controller.stats()
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; 503 while interactive requests are being shed"""
+    saturated = admission.controller.saturated()
+    if saturated:
+        return JSONResponse({"status": "saturated", "saturated": saturated}, status_code=503)
     return {"status": "healthy"}
 
 if __name__ == "__main__":
+    # Development server; production runs through serve.py
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host=config.SERVER_HOST,
         port=config.SERVER_PORT,
         reload=config.DEBUG_MODE,
-        access_log=True
+        # Assets are rebuilt at startup, so restart when they change too
+        reload_includes=["*.py", "*.js", "*.css", "*.html"],
+        access_log=True,
+        ws_max_size=config.LIVE_QUOTE_MAX_MESSAGE_BYTES,
+        ws_max_queue=config.LIVE_QUOTE_MAX_QUEUE,
+        ws_per_message_deflate=False
     )
\ No newline at end of file
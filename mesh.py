@@ -0,0 +1,381 @@
+"""
+Server-side plate-with-hole mesh builder with binary STL and glTF (GLB) export,
+plus a size-capped, content-addressed on-disk cache of the exported files.
+
+The plate lies in the XY plane centered on the origin with its thickness along
+Z, matching ThreeRenderer.createPlate. Units are millimetres.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import config
+import geometry
+
+FORMATS = ("stl", "glb")
+MEDIA_TYPES = {
+    "stl": "model/stl",
+    "glb": "model/gltf-binary",
+    "bin": "application/octet-stream"
+}
+
+# Bump when the mesh layout changes so stale cache entries are never served
+MESH_VERSION = 1
+
+
+class Mesh(NamedTuple):
+    positions: np.ndarray  # (V, 3) float32
+    normals: np.ndarray  # (V, 3) float32
+    indices: np.ndarray  # (T, 3) uint32
+
+
+def _rectangle_ring(half_length: float, half_width: float, angles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Points where rays from the center at the given angles leave the rectangle,
+    merged with the four corners; returns (angles, points) sorted by angle"""
+    corners = np.arctan2([-half_width, -half_width, half_width, half_width],
+                         [half_length, -half_length, -half_length, half_length]) % (2 * np.pi)
+    ring_angles = np.unique(np.round(np.concatenate([angles, corners]), 12))
+
+    cos, sin = np.cos(ring_angles), np.sin(ring_angles)
+    with np.errstate(divide="ignore"):
+        scale = np.minimum(half_length / np.abs(cos), half_width / np.abs(sin))
+    return ring_angles, np.column_stack([cos * scale, sin * scale])
+
+
+def _zipper(inner_angles: np.ndarray, outer_angles: np.ndarray, skip_inner: bool) -> np.ndarray:
+    """Triangulate the annulus between two angle-sorted rings that both start at 0.
+
+    Walking both rings together, each triangle advances either the inner or the
+    outer ring by one vertex, whichever comes next by angle. Indices are into
+    the concatenation [inner ring, outer ring]; winding is counter-clockwise
+    seen from +Z.
+    """
+    n, m = len(inner_angles), len(outer_angles)
+    full_turn = 2 * np.pi
+    events = np.concatenate([np.append(inner_angles[1:], full_turn), np.append(outer_angles[1:], full_turn)])
+    is_inner = np.concatenate([np.ones(n, dtype=bool), np.zeros(m, dtype=bool)])
+    order = np.lexsort((is_inner, events))
+    is_inner = is_inner[order]
+
+    i = np.cumsum(is_inner) - is_inner
+    j = (np.cumsum(~is_inner) - ~is_inner) % m
+    third = np.where(is_inner, (i + 1) % n, n + (j + 1) % m)
+    triangles = np.column_stack([i, n + j, third])
+    if skip_inner:
+        triangles = triangles[~is_inner]
+    return triangles
+
+
+def build_plate(
+    length: float,
+    width: float,
+    thickness: float,
+    hole_diameter: float,
+    segments: int = config.MESH_SEGMENTS
+) -> Mesh:
+    """Extrude a rectangle with a centered circular hole into a closed mesh"""
+    half_length, half_width, half_thickness = length / 2, width / 2, thickness / 2
+    radius = geometry.effective_hole_diameter(length, width, hole_diameter) / 2
+    has_hole = radius > 0
+
+    inner_angles = np.arange(segments) * (2 * np.pi / segments)
+    inner = np.column_stack([np.cos(inner_angles), np.sin(inner_angles)]) * radius
+    outer_angles, outer = _rectangle_ring(half_length, half_width, inner_angles)
+    n, m = len(inner), len(outer)
+
+    ring = np.concatenate([inner, outer])
+    cap = _zipper(inner_angles, outer_angles, skip_inner=not has_hole)
+
+    positions = []
+    normals = []
+    indices = []
+    offset = 0
+
+    def add(points_2d, z, normal, triangles):
+        nonlocal offset
+        count = len(points_2d)
+        positions.append(np.column_stack([points_2d, np.full(count, z)]))
+        normals.append(np.broadcast_to(normal, (count, 3)))
+        indices.append(triangles + offset)
+        offset += count
+
+    # Top and bottom caps
+    add(ring, half_thickness, (0.0, 0.0, 1.0), cap)
+    add(ring, -half_thickness, (0.0, 0.0, -1.0), cap[:, ::-1])
+
+    # Outer walls, one flat-shaded quad per outline edge
+    start = outer
+    end = np.roll(outer, -1, axis=0)
+    edge = end - start
+    wall_normals = np.column_stack([edge[:, 1], -edge[:, 0], np.zeros(m)])
+    wall_normals /= np.linalg.norm(wall_normals, axis=1, keepdims=True)
+    quads = np.stack([
+        np.column_stack([start, np.full(m, -half_thickness)]),
+        np.column_stack([end, np.full(m, -half_thickness)]),
+        np.column_stack([end, np.full(m, half_thickness)]),
+        np.column_stack([start, np.full(m, half_thickness)])
+    ], axis=1).reshape(-1, 3)
+    base = offset + np.arange(m)[:, None] * 4
+    positions.append(quads)
+    normals.append(np.repeat(wall_normals, 4, axis=0))
+    indices.append(np.concatenate([base + [0, 1, 2], base + [0, 2, 3]]))
+    offset += 4 * m
+
+    # Hole wall, smooth-shaded and facing the hole axis
+    if has_hole:
+        following = (np.arange(n) + 1) % n
+        bottom = offset + np.arange(n)
+        top = offset + n + np.arange(n)
+        positions.append(np.concatenate([
+            np.column_stack([inner, np.full(n, -half_thickness)]),
+            np.column_stack([inner, np.full(n, half_thickness)])
+        ]))
+        inward = -np.column_stack([np.cos(inner_angles), np.sin(inner_angles), np.zeros(n)])
+        normals.append(np.concatenate([inward, inward]))
+        indices.append(np.concatenate([
+            np.column_stack([bottom, top[following], bottom[following]]),
+            np.column_stack([bottom, top, top[following]])
+        ]))
+
+    return Mesh(
+        positions=np.ascontiguousarray(np.concatenate(positions), dtype=np.float32),
+        normals=np.ascontiguousarray(np.concatenate(normals), dtype=np.float32),
+        indices=np.ascontiguousarray(np.concatenate(indices), dtype=np.uint32)
+    )
+
+
+STL_TRIANGLE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attributes", "<u2")
+])
+
+
+def to_stl(mesh: Mesh) -> bytes:
+    """Binary STL with per-face normals"""
+    triangles = mesh.positions[mesh.indices]
+    face_normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(face_normals, axis=1, keepdims=True)
+    face_normals = np.divide(face_normals, lengths, out=np.zeros_like(face_normals), where=lengths > 0)
+
+    records = np.zeros(len(triangles), dtype=STL_TRIANGLE)
+    records["normal"] = face_normals
+    records["vertices"] = triangles
+
+    header = b"3DNavi plate".ljust(80, b" ")
+    return header + struct.pack("<I", len(records)) + records.tobytes()
+
+
+def _pad(data: bytes, fill: bytes) -> bytes:
+    return data + fill * (-len(data) % 4)
+
+
+def to_glb(mesh: Mesh) -> bytes:
+    """Binary glTF 2.0 with positions, normals and indices in a single buffer"""
+    positions = mesh.positions.astype("<f4").tobytes()
+    normals = mesh.normals.astype("<f4").tobytes()
+    indices = mesh.indices.astype("<u4").tobytes()
+    binary = positions + normals + indices
+
+    document = {
+        "asset": {"version": "2.0", "generator": "3DNavi"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        # Vertices are in millimetres; glTF units are metres
+        "nodes": [{"mesh": 0, "scale": [0.001, 0.001, 0.001]}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions), "target": 34962},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": len(normals), "target": 34962},
+            {"buffer": 0, "byteOffset": len(positions) + len(normals), "byteLength": len(indices), "target": 34963}
+        ],
+        "accessors": [
+            {
+                "bufferView": 0,
+                "componentType": 5126,
+                "count": len(mesh.positions),
+                "type": "VEC3",
+                "min": mesh.positions.min(axis=0).tolist(),
+                "max": mesh.positions.max(axis=0).tolist()
+            },
+            {"bufferView": 1, "componentType": 5126, "count": len(mesh.normals), "type": "VEC3"},
+            {"bufferView": 2, "componentType": 5125, "count": mesh.indices.size, "type": "SCALAR"}
+        ]
+    }
+
+    json_chunk = _pad(json.dumps(document, separators=(",", ":")).encode(), b" ")
+    bin_chunk = _pad(binary, b"\0")
+    total = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+
+    return b"".join([
+        struct.pack("<4sII", b"glTF", 2, total),
+        struct.pack("<I4s", len(json_chunk), b"JSON"), json_chunk,
+        struct.pack("<I4s", len(bin_chunk), b"BIN\0"), bin_chunk
+    ])
+
+
+def to_buffers(mesh: Mesh) -> bytes:
+    """Compact typed-array layout for the browser viewer.
+
+    A 16-byte header of uint32 [vertex count, index count, index byte size, 0],
+    then float32 positions, int8 normalized normals padded to 4 bytes, and
+    uint16 indices (uint32 past 65535 vertices). Every section can be viewed
+    directly as a typed array over the response's ArrayBuffer.
+    """
+    vertex_count = len(mesh.positions)
+    index_type = "<u2" if vertex_count <= 0xFFFF else "<u4"
+    index_size = np.dtype(index_type).itemsize
+
+    normals = np.round(mesh.normals * 127).astype(np.int8).tobytes()
+    return b"".join([
+        struct.pack("<4I", vertex_count, mesh.indices.size, index_size, 0),
+        mesh.positions.astype("<f4").tobytes(),
+        _pad(normals, b"\0"),
+        mesh.indices.astype(index_type).tobytes()
+    ])
+
+
+EXPORTERS = {
+    "stl": to_stl,
+    "glb": to_glb,
+    "bin": to_buffers
+}
+
+
+def quantize(params: Dict[str, float], step: float = config.DIMENSION_STEP) -> Dict[str, float]:
+    """Snap dimensions to the form's input step so nearby requests share one mesh"""
+    return {
+        name: int(value) if name == "segments" else round(round(value / step) * step, 10)
+        for name, value in params.items()
+    }
+
+
+def cache_key(params: Dict[str, float], fmt: str) -> str:
+    """Content address of an exported mesh"""
+    canonical = {name: round(float(value), 6) for name, value in sorted(params.items())}
+    canonical.update(format=fmt, version=MESH_VERSION)
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class MeshCache:
+    """On-disk cache of exported meshes addressed by their parameters' hash.
+
+    Files are written once (atomically) and served straight from disk, so
+    repeated downloads are read out of the page cache. Every use refreshes a
+    file's mtime; once the directory grows past max_bytes the least recently
+    used files are deleted until it is back under low_water of the limit.
+    Builds block, so callers on the event loop run get() in a thread; the
+    size is tracked per process and rescanned whenever it goes over the limit.
+    """
+
+    def __init__(
+        self,
+        directory: str = config.MESH_CACHE_DIR,
+        max_bytes: int = config.MESH_CACHE_MAX_BYTES,
+        low_water: float = 0.8
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None  # estimated directory size, None until scanned
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def _write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as stream:
+                stream.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every cached file; other workers may delete them meanwhile"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, entry.path))
+        return entries
+
+    def _prune(self, keep: str) -> None:
+        """Delete least recently used files, except keep, until the directory is under the low-water mark"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.low_water
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # another worker got there first
+            total -= size
+        self._bytes = total
+
+    def get(self, params: Dict[str, float], fmt: str) -> Tuple[str, str]:
+        """Return (content key, file path) for a mesh, building it on first use"""
+        params = quantize(params)
+        key = cache_key(params, fmt)
+        path = self.path(key, fmt)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+            return key, path
+
+        # Two threads may build the same mesh; the second replace is harmless
+        data = EXPORTERS[fmt](build_plate(**params))
+        self._write(path, data)
+        with self._lock:
+            self.misses += 1
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._prune(keep=path)
+        return key, path
+
+
+cache = MeshCache()
+
+
+def lod_params(dimensions: Dict[str, float], level: str) -> Dict[str, float]:
+    """Mesh parameters for one level of detail"""
+    return dict(dimensions, segments=config.MESH_LOD_SEGMENTS[level])
+
+
+def warm_lods(dimensions: Dict[str, float]) -> None:
+    """Precompute every level of detail for a set of dimensions"""
+    for level in config.MESH_LOD_SEGMENTS:
+        cache.get(lod_params(dimensions, level), "bin")
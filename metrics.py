@@ -0,0 +1,228 @@
+"""
+Request instrumentation exported in the Prometheus text format.
+
+Every update happens on the event loop thread (in the ASGI middleware or in
+async handlers), so counters are plain ints and dicts with no locks; an
+observation is a dict lookup, a bisect and two additions. Metrics are per
+process: with several workers, scrape each one or sum across them.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import config
+import pricing_tables
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Labels) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = config.METRICS_LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket], sum
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterator[str]:
+        names = self.labels + ("le",)
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {repr(total[0])}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    """Collection of metrics rendered together for a scrape"""
+
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), **kwargs) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+request_duration = registry.histogram(
+    "threednavi_request_duration_seconds", "Request latency by route", ("method", "route", "status")
+)
+requests_in_flight = registry.gauge(
+    "threednavi_requests_in_flight", "Requests currently being served", ("method",)
+)
+quotes = registry.counter(
+    "threednavi_quotes_total", "Quotes issued by material and surface treatment",
+    ("material", "surface_treatment")
+)
+configure_phase = registry.histogram(
+    "threednavi_configure_phase_seconds", "Time spent in each phase of /configure", ("phase",)
+)
+live_quote_connections = registry.gauge(
+    "threednavi_live_quote_connections", "Open live-quote WebSocket connections"
+)
+live_quote_messages = registry.counter(
+    "threednavi_live_quote_messages_total",
+    "Live-quote messages received from clients and prices sent back", ("direction",)
+)
+admission = registry.counter(
+    "threednavi_admission_total",
+    "Requests admitted, shed on arrival or timed out in the queue, by route class", ("class", "result")
+)
+admission_waiting = registry.gauge(
+    "threednavi_admission_waiting", "Requests queued for a slot, by route class", ("class",)
+)
+admission_wait = registry.histogram(
+    "threednavi_admission_wait_seconds", "Time admitted requests spent queued for a slot, by route class",
+    ("class",)
+)
+# computed / (computed + coalesced) is the share of /configure requests that did the work
+configure_requests = registry.counter(
+    "threednavi_configure_requests_total",
+    "/configure requests by whether they computed the quote or shared an identical in-flight one",
+    ("result",)
+)
+
+
+def _known(value: str, allowed) -> str:
+    """Keep label cardinality bounded when clients send arbitrary names"""
+    value = value.lower()
+    return value if value in allowed else "other"
+
+
+def count_quote(material: str, surface_treatment: str) -> None:
+    """Count a quote under names the live pricing tables know, "other" otherwise"""
+    tables = pricing_tables.current()
+    quotes.inc(
+        _known(material, tables.material_multipliers),
+        _known(surface_treatment, tables.surface_treatment_multipliers)
+    )
+
+
+def route_label(scope, root_path: str = "") -> str:
+    """Route template rather than raw path, so path parameters don't split series"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps (static files) extend root_path with their mount point
+    mount = scope.get("root_path", "")[len(root_path):]
+    return mount or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight requests per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope["metrics.start"] = start
+        status = 500
+        # The route is only known once the router has run, so in-flight
+        # requests are tracked per method
+        method = scope["method"]
+        root_path = scope.get("root_path", "")
+        requests_in_flight.inc(method)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec(method)
+            request_duration.observe(
+                time.perf_counter() - start, method, route_label(scope, root_path), str(status)
+            )
@@ -0,0 +1,202 @@
+"""
+Sheet nesting: how many plate blanks fit on each stock sheet, and which
+sheets an order of identical parts consumes.
+
+Each part is cut from a rectangular blank, grown where needed so the hole
+keeps NESTING_HOLE_CLEARANCE of material to the blank edge. Blanks are laid
+out NESTING_KERF apart inside a NESTING_EDGE_MARGIN border in a two-block
+guillotine pattern: a grid of blanks in one orientation, then a grid of
+rotated blanks in the strip that is left, with every split position along
+both sheet axes tried at once. The count per sheet depends only on the blank
+and sheet sizes, so it is memoized, and planning any quantity is a few
+integer divisions on top of it.
+
+An order fills whole sheets of one size and puts the remainder on whichever
+size holds it with the least stock; of all those combinations the one
+consuming the least sheet area wins.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+import geometry
+
+Sheet = Tuple[float, float]  # (length, width) in mm
+
+
+class SheetUse(NamedTuple):
+    length: float
+    width: float
+    count: int
+    parts_per_sheet: int
+
+
+class NestingPlan(NamedTuple):
+    sheets: Tuple[SheetUse, ...]
+    sheets_used: int
+    stock_area: float  # mm²
+    utilization: float  # part outline area / stock area
+
+
+def blank_size(
+    length: float,
+    width: float,
+    hole_diameter: float,
+    clearance: float = config.NESTING_HOLE_CLEARANCE
+) -> Tuple[float, float]:
+    """Rectangle a part is cut from, grown so the hole keeps its clearance to the edge"""
+    hole = geometry.effective_hole_diameter(length, width, hole_diameter)
+    if hole <= 0:
+        return length, width
+    minimum = hole + 2 * clearance
+    return max(length, minimum), max(width, minimum)
+
+
+def _fit(span, size: float, kerf: float):
+    """Blanks of `size` fitting in `span` with kerf between neighbours"""
+    return np.maximum(np.floor((np.asarray(span) + kerf) / (size + kerf) + 1e-9), 0).astype(np.int64)
+
+
+@lru_cache(maxsize=config.NESTING_CACHE_SIZE)
+def sheet_capacity(
+    blank_length: float,
+    blank_width: float,
+    sheet_length: float,
+    sheet_width: float,
+    kerf: float = config.NESTING_KERF,
+    margin: float = config.NESTING_EDGE_MARGIN
+) -> int:
+    """Blanks per sheet for the best two-block layout"""
+    usable = (sheet_length - 2 * margin, sheet_width - 2 * margin)
+    best = 0
+    for along, across in (usable, usable[::-1]):
+        for first, second in ((blank_length, blank_width), (blank_width, blank_length)):
+            # `columns` blanks side by side along one axis, rotated blanks in the leftover strip
+            columns = np.arange(_fit(along, first, kerf) + 1)
+            leftover = along - columns * (first + kerf)
+            counts = columns * _fit(across, second, kerf) + _fit(leftover, second, kerf) * _fit(across, first, kerf)
+            best = max(best, int(counts.max()))
+    return best
+
+
+def capacities(
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    hole_diameters: Iterable[float],
+    sheets: Sequence[Sheet] = config.STOCK_SHEETS
+) -> np.ndarray:
+    """Blanks per sheet, shaped [sheet, part]; computed once per distinct part"""
+    parts = np.stack(np.broadcast_arrays(
+        np.atleast_1d(np.asarray(lengths, dtype=float)),
+        np.atleast_1d(np.asarray(widths, dtype=float)),
+        np.atleast_1d(np.asarray(hole_diameters, dtype=float))
+    ), axis=1)
+    distinct, inverse = np.unique(parts, axis=0, return_inverse=True)
+    table = np.array([
+        [sheet_capacity(*blank_size(*part), *sheet) for part in distinct.tolist()]
+        for sheet in sheets
+    ], dtype=np.int64).reshape(len(sheets), len(distinct))
+    return table[:, inverse.reshape(-1)]
+
+
+def _layout(
+    capacity: np.ndarray,
+    areas: np.ndarray,
+    quantities: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cheapest full-sheet size and remainder size per order: (stock area, full, remainder)"""
+    fits = capacity > 0
+    per_sheet = np.where(fits, capacity, 1)
+    full = quantities // per_sheet  # [sheet, part]
+    remainder = quantities - full * per_sheet
+    full_area = np.where(fits, full * areas[:, None], np.inf)
+
+    # extra[i, j, n]: stock for order n's remainder after full sheets of size i, put on size j
+    extra = np.where(
+        fits[None, :, :],
+        np.ceil(remainder[:, None, :] / per_sheet[None, :, :]) * areas[None, :, None],
+        np.inf
+    )
+    extra = np.where(remainder[:, None, :] == 0, 0.0, extra)
+    remainder_sheet = extra.argmin(axis=1)
+    totals = full_area + np.take_along_axis(extra, remainder_sheet[:, None, :], axis=1)[:, 0, :]
+
+    full_sheet = totals.argmin(axis=0)
+    orders = np.arange(totals.shape[1])
+    return totals[full_sheet, orders], full_sheet, remainder_sheet[full_sheet, orders]
+
+
+def stock_areas(
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    hole_diameters: Iterable[float],
+    quantities: Iterable[int],
+    sheets: Sequence[Sheet] = config.STOCK_SHEETS
+) -> np.ndarray:
+    """Vectorized sheet area (mm²) consumed per order, NaN where no sheet holds a blank"""
+    lengths, widths, hole_diameters, quantities = np.broadcast_arrays(
+        np.asarray(lengths, dtype=float), np.asarray(widths, dtype=float),
+        np.asarray(hole_diameters, dtype=float), np.asarray(quantities, dtype=np.int64)
+    )
+    areas = np.array([length * width for length, width in sheets], dtype=float)
+    capacity = capacities(lengths.reshape(-1), widths.reshape(-1), hole_diameters.reshape(-1), sheets)
+    totals, _, _ = _layout(capacity, areas, np.maximum(quantities.reshape(-1), 0))
+    return np.where(np.isfinite(totals), totals, np.nan).reshape(quantities.shape)
+
+
+def plan(
+    length: float,
+    width: float,
+    hole_diameter: float,
+    quantity: int,
+    sheets: Sequence[Sheet] = config.STOCK_SHEETS
+) -> Optional[NestingPlan]:
+    """Sheets used for one order, or None if there is nothing to nest or the blank fits no stock sheet"""
+    if quantity < 1:
+        return None
+    areas = np.array([sheet_length * sheet_width for sheet_length, sheet_width in sheets], dtype=float)
+    blank = blank_size(length, width, hole_diameter)
+    capacity = np.array([[sheet_capacity(*blank, *sheet)] for sheet in sheets], dtype=np.int64)
+    totals, full_sheet, remainder_sheet = _layout(capacity, areas, np.array([quantity], dtype=np.int64))
+    if not np.isfinite(totals[0]):
+        return None
+
+    counts: Dict[int, int] = {}
+    primary, secondary = int(full_sheet[0]), int(remainder_sheet[0])
+    per_sheet = int(capacity[primary, 0])
+    full, remainder = divmod(quantity, per_sheet)
+    if full:
+        counts[primary] = full
+    if remainder:
+        counts[secondary] = counts.get(secondary, 0) + -(-remainder // int(capacity[secondary, 0]))
+
+    uses = tuple(
+        SheetUse(sheets[index][0], sheets[index][1], count, int(capacity[index, 0]))
+        for index, count in sorted(counts.items())
+    )
+    stock_area = float(totals[0])
+    return NestingPlan(
+        sheets=uses,
+        sheets_used=sum(use.count for use in uses),
+        stock_area=stock_area,
+        utilization=quantity * length * width / stock_area
+    )
+
+
+def describe(nesting: Optional[NestingPlan]) -> Optional[Dict[str, Any]]:
+    """A plan as it appears in quote responses"""
+    if nesting is None:
+        return None
+    return {
+        "sheets_used": nesting.sheets_used,
+        "utilization": round(nesting.utilization, 4),
+        "sheets": [use._asdict() for use in nesting.sheets]
+    }
+
+
+def warm(dimensions: Dict[str, float]) -> None:
+    """Precompute the layouts of a part on every stock sheet"""
+    capacities(dimensions["length"], dimensions["width"], dimensions["hole_diameter"])
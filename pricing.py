@@ -0,0 +1,283 @@
+"""
+Pricing engine for 3DNavi quotes
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+import geometry
+import nesting
+import pricing_tables
+from pricing_tables import PricingTables
+
+PART_FIELDS = (
+    "material",
+    "surface_treatment",
+    "length",
+    "width",
+    "thickness",
+    "hole_diameter",
+    "quantity"
+)
+
+
+def parse_part(row: Mapping[str, Any]) -> Dict[str, Any]:
+    """Coerce a raw part row into the same types /configure accepts"""
+    missing = [field for field in PART_FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+
+    try:
+        return {
+            "material": str(row["material"]),
+            "surface_treatment": str(row["surface_treatment"]),
+            "length": float(row["length"]),
+            "width": float(row["width"]),
+            "thickness": float(row["thickness"]),
+            "hole_diameter": float(row["hole_diameter"]),
+            "quantity": int(row["quantity"])
+        }
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"invalid value: {exc}") from exc
+
+
+def configuration(part: Mapping[str, Any]) -> Dict[str, Any]:
+    """Shape a parsed part the way quote responses echo it back"""
+    return {
+        "material": part["material"],
+        "surface_treatment": part["surface_treatment"],
+        "dimensions": {
+            "length": part["length"],
+            "width": part["width"],
+            "thickness": part["thickness"],
+            "hole_diameter": part["hole_diameter"]
+        },
+        "quantity": part["quantity"]
+    }
+
+
+def load_rows(body: bytes, ndjson: bool = False) -> List[Mapping[str, Any]]:
+    """Decode a batch body given either as a JSON array or as NDJSON"""
+    try:
+        if ndjson:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+    except ValueError as exc:
+        raise ValueError(f"malformed JSON: {exc}") from exc
+
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("expected a list of part objects")
+    return rows
+
+
+def calculate_price(
+    material: str,
+    surface_treatment: str,
+    length: float,
+    width: float,
+    thickness: float,
+    hole_diameter: float,
+    quantity: int,
+    tables: Optional[PricingTables] = None,
+    scrap_volume: Optional[float] = None
+) -> float:
+    """Price a single part configuration; scrap_volume skips the nesting when already known"""
+    tables = tables or pricing_tables.current()
+    unit_price = list_unit_price(material, surface_treatment, length, width, thickness, hole_diameter, tables)
+    order = unit_price * quantity
+    if tables.scrap_charge:
+        material_multiplier = tables.material_multipliers.get(material.lower(), 1.0)
+        if scrap_volume is None:
+            scrap_volume = float(scrap_volumes(length, width, thickness, hole_diameter, quantity))
+        order += tables.base_price * tables.scrap_charge * material_multiplier * scrap_volume
+    return order * (1.0 - discount(quantity, tables))
+
+
+def list_unit_price(
+    material: str,
+    surface_treatment: str,
+    length: float,
+    width: float,
+    thickness: float,
+    hole_diameter: float,
+    tables: Optional[PricingTables] = None
+) -> float:
+    """Undiscounted price of one part"""
+    tables = tables or pricing_tables.current()
+    material_multiplier = tables.material_multipliers.get(material.lower(), 1.0)
+    surface_multiplier = tables.surface_treatment_multipliers.get(surface_treatment.lower(), 1.0)
+    volume = geometry.net_volume(length, width, thickness, hole_diameter)
+    return tables.base_price * material_multiplier * surface_multiplier * volume
+
+
+def scrap_volumes(
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    thicknesses: Iterable[float],
+    hole_diameters: Iterable[float],
+    quantities: Iterable[int]
+) -> np.ndarray:
+    """Stock volume nesting consumes beyond the parts themselves (offcuts, kerf, hole slugs), in mm³.
+
+    Zero for blanks that fit no stock sheet; those are priced on net volume alone.
+    """
+    quantities = np.asarray(quantities, dtype=np.int64)
+    stock = nesting.stock_areas(lengths, widths, hole_diameters, quantities) * np.asarray(thicknesses, dtype=float)
+    parts = geometry.net_volumes(lengths, widths, thicknesses, hole_diameters) * quantities
+    return np.nan_to_num(np.maximum(stock - parts, 0.0))
+
+
+def discount(quantity: int, tables: Optional[PricingTables] = None) -> float:
+    """Volume discount fraction for an order quantity"""
+    tables = tables or pricing_tables.current()
+    applied = 0.0
+    for minimum, fraction in tables.volume_discounts:
+        if quantity < minimum:
+            break
+        applied = fraction
+    return applied
+
+
+def discounts(quantities: Iterable[int], tables: Optional[PricingTables] = None) -> np.ndarray:
+    """Vectorized discount: one searchsorted over the tier thresholds"""
+    tables = tables or pricing_tables.current()
+    quantities = np.asarray(quantities, dtype=float)
+    if not tables.volume_discounts:
+        return np.zeros(quantities.shape)
+    minimums, fractions = zip(*tables.volume_discounts)
+    tier = np.searchsorted(np.asarray(minimums, dtype=float), quantities, side="right")
+    return np.concatenate(([0.0], fractions))[tier]
+
+
+def _lookup(names: Iterable[str], table: Mapping[str, float]) -> np.ndarray:
+    """Map a column of names onto their multipliers, defaulting to 1.0"""
+    resolved: Dict[str, float] = {}
+
+    def multiplier(name: str) -> float:
+        value = resolved.get(name)
+        if value is None:
+            value = resolved[name] = table.get(name.lower(), 1.0)
+        return value
+
+    return np.fromiter(map(multiplier, names), dtype=float)
+
+
+def calculate_prices(
+    materials: Iterable[str],
+    surface_treatments: Iterable[str],
+    lengths: Iterable[float],
+    widths: Iterable[float],
+    thicknesses: Iterable[float],
+    hole_diameters: Iterable[float],
+    quantities: Iterable[int],
+    tables: Optional[PricingTables] = None
+) -> np.ndarray:
+    """Vectorized calculate_price over whole columns in one pass"""
+    tables = tables or pricing_tables.current()
+    material_multiplier = _lookup(materials, tables.material_multipliers)
+    surface_multiplier = _lookup(surface_treatments, tables.surface_treatment_multipliers)
+
+    volume = geometry.net_volumes(lengths, widths, thicknesses, hole_diameters)
+    quantities = np.asarray(quantities, dtype=float)
+    order = tables.base_price * material_multiplier * surface_multiplier * volume * quantities
+    if tables.scrap_charge:
+        scrap = scrap_volumes(lengths, widths, thicknesses, hole_diameters, quantities)
+        order += tables.base_price * tables.scrap_charge * material_multiplier * scrap
+    return order * (1.0 - discounts(quantities, tables))
+
+
+def price_parts(parts: List[Dict[str, Any]], tables: Optional[PricingTables] = None) -> np.ndarray:
+    """Price a list of parsed parts with a single vectorized call"""
+    if not parts:
+        return np.zeros(0)
+
+    return calculate_prices(
+        [part["material"] for part in parts],
+        [part["surface_treatment"] for part in parts],
+        [part["length"] for part in parts],
+        [part["width"] for part in parts],
+        [part["thickness"] for part in parts],
+        [part["hole_diameter"] for part in parts],
+        [part["quantity"] for part in parts],
+        tables
+    )
+
+
+def price_curve(
+    part: Mapping[str, Any],
+    quantities: Iterable[int],
+    tables: Optional[PricingTables] = None
+) -> Dict[str, np.ndarray]:
+    """Total and unit price of one part across many order quantities at once"""
+    tables = tables or pricing_tables.current()
+    quantities = np.asarray(quantities, dtype=float)
+    list_price = list_unit_price(
+        part["material"], part["surface_treatment"], part["length"], part["width"],
+        part["thickness"], part["hole_diameter"], tables
+    )
+    fractions = discounts(quantities, tables)
+    unit_prices = list_price * (1.0 - fractions)
+    if tables.scrap_charge:
+        # Scrap depends on how the order nests, so it is spread over each quantity separately
+        material_multiplier = tables.material_multipliers.get(part["material"].lower(), 1.0)
+        scrap = scrap_volumes(part["length"], part["width"], part["thickness"], part["hole_diameter"], quantities)
+        unit_prices = unit_prices + (
+            tables.base_price * tables.scrap_charge * material_multiplier * scrap / quantities * (1.0 - fractions)
+        )
+    return {
+        "discounts": fractions,
+        "unit_prices": unit_prices,
+        "total_prices": unit_prices * quantities
+    }
+
+
+def price_matrix(
+    dimensions: Mapping[str, float],
+    quantity: int,
+    materials: Optional[List[str]] = None,
+    surface_treatments: Optional[List[str]] = None,
+    sweep_dimension: Optional[str] = None,
+    sweep_values: Optional[Iterable[float]] = None,
+    tables: Optional[PricingTables] = None
+) -> Dict[str, Any]:
+    """Prices for every material x treatment (x swept dimension value) by broadcasting.
+
+    Material multipliers vary along axis 0, treatments along axis 1 and the
+    swept dimension along axis 2 (dropped when there is no sweep), so the
+    whole matrix is one outer product of three small vectors.
+    """
+    tables = tables or pricing_tables.current()
+    materials = list(materials or tables.material_multipliers)
+    surface_treatments = list(surface_treatments or tables.surface_treatment_multipliers)
+
+    columns = {name: np.asarray([value], dtype=float) for name, value in dimensions.items()}
+    if sweep_dimension is not None:
+        columns[sweep_dimension] = np.asarray(list(sweep_values), dtype=float)
+    volumes = geometry.net_volumes(
+        columns["length"], columns["width"], columns["thickness"], columns["hole_diameter"]
+    )
+
+    material_multiplier = _lookup(materials, tables.material_multipliers)
+    surface_multiplier = _lookup(surface_treatments, tables.surface_treatment_multipliers)
+    order = tables.base_price * quantity * (1.0 - discount(quantity, tables))
+    prices = order * material_multiplier[:, None, None] * surface_multiplier[None, :, None] * volumes[None, None, :]
+    if tables.scrap_charge:
+        # Nesting depends on the dimensions only, so scrap varies along the sweep axis
+        scrap = scrap_volumes(
+            columns["length"], columns["width"], columns["thickness"], columns["hole_diameter"], quantity
+        )
+        prices = prices + (
+            tables.base_price * (1.0 - discount(quantity, tables)) * tables.scrap_charge
+            * material_multiplier[:, None, None] * scrap[None, None, :]
+        )
+
+    return {
+        "materials": materials,
+        "surface_treatments": surface_treatments,
+        "sweep_dimension": sweep_dimension,
+        "sweep_values": columns[sweep_dimension] if sweep_dimension else None,
+        "prices": prices if sweep_dimension else prices[:, :, 0]
+    }
@@ -0,0 +1,202 @@
+"""
+Hot-reloadable pricing tables published as immutable, versioned snapshots.
+A snapshot's version is a hash of its validated contents, so every worker
+process agrees on it and reloading an unchanged file keeps the same version.
+
+Readers call current() and get a PricingTables snapshot without taking any
+lock: publishing a new snapshot is a single reference assignment, which is
+atomic in CPython. Only writers (reloads) serialize on a lock, and they do
+all file I/O and validation before the swap, so a reload never blocks a
+request that is pricing against the previous snapshot.
+
+The tables file is JSON with any of these keys; missing keys keep the
+defaults from config.py:
+
+    {
+        "base_price": 0.001,
+        "material_multipliers": {"aluminum": 1.0, "steel": 1.2},
+        "surface_treatment_multipliers": {"none": 1.0, "anodizing": 1.3},
+        "volume_discounts": {"10": 0.05, "100": 0.12},
+        "scrap_charge": 0.5
+    }
+
+volume_discounts maps a minimum order quantity to the fraction taken off
+the whole order once that quantity is reached. scrap_charge is the share of
+the material price charged for sheet stock that nesting leaves unused.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+VERSION_LENGTH = 12  # hex digits of the content hash
+
+
+@dataclass(frozen=True)
+class PricingTables:
+    """One immutable version of the pricing tables"""
+    version: str
+    base_price: float
+    material_multipliers: Mapping[str, float]
+    surface_treatment_multipliers: Mapping[str, float]
+    volume_discounts: Tuple[Tuple[int, float], ...] = ()  # (min quantity, discount), ascending
+    scrap_charge: float = 0.0
+    source: Optional[str] = None
+
+
+def _multipliers(table: Any, name: str) -> Mapping[str, float]:
+    if not isinstance(table, dict):
+        raise ValueError(f"{name} must be an object")
+    values = {}
+    for key, value in table.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f"{name}.{key} must be a positive number")
+        values[str(key).lower()] = float(value)
+    return MappingProxyType(values)
+
+
+def _discounts(table: Any) -> Tuple[Tuple[int, float], ...]:
+    if not isinstance(table, dict):
+        raise ValueError("volume_discounts must be an object")
+    tiers = []
+    for key, value in table.items():
+        try:
+            quantity = int(key)
+        except (TypeError, ValueError):
+            raise ValueError(f"volume_discounts key {key!r} must be a quantity") from None
+        if quantity < 1:
+            raise ValueError(f"volume_discounts key {key!r} must be at least 1")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value < 1:
+            raise ValueError(f"volume_discounts.{key} must be a fraction in [0, 1)")
+        tiers.append((quantity, float(value)))
+    return tuple(sorted(tiers))
+
+
+def fingerprint(
+    base_price: float,
+    material_multipliers: Mapping[str, float],
+    surface_treatment_multipliers: Mapping[str, float],
+    volume_discounts: Tuple[Tuple[int, float], ...],
+    scrap_charge: float
+) -> str:
+    """Version of a set of validated tables: a short hash of their canonical JSON"""
+    canonical = json.dumps([
+        base_price,
+        sorted(material_multipliers.items()),
+        sorted(surface_treatment_multipliers.items()),
+        volume_discounts,
+        scrap_charge
+    ], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:VERSION_LENGTH]
+
+
+def _build(data: Dict[str, Any], source: Optional[str]) -> PricingTables:
+    base_price = data.get("base_price", config.BASE_PRICE)
+    if isinstance(base_price, bool) or not isinstance(base_price, (int, float)) or base_price <= 0:
+        raise ValueError("base_price must be a positive number")
+
+    scrap_charge = data.get("scrap_charge", config.SCRAP_CHARGE)
+    if isinstance(scrap_charge, bool) or not isinstance(scrap_charge, (int, float)) or scrap_charge < 0:
+        raise ValueError("scrap_charge must be a non-negative number")
+
+    tables = {
+        "base_price": float(base_price),
+        "material_multipliers": _multipliers(
+            data.get("material_multipliers", config.MATERIAL_MULTIPLIERS),
+            "material_multipliers"
+        ),
+        "surface_treatment_multipliers": _multipliers(
+            data.get("surface_treatment_multipliers", config.SURFACE_TREATMENT_MULTIPLIERS),
+            "surface_treatment_multipliers"
+        ),
+        "volume_discounts": _discounts(data.get("volume_discounts", config.VOLUME_DISCOUNTS)),
+        "scrap_charge": float(scrap_charge)
+    }
+    return PricingTables(version=fingerprint(**tables), source=source, **tables)
+
+
+_current = _build({}, source=None)
+_reload_lock = threading.Lock()
+
+
+def current() -> PricingTables:
+    """The snapshot to price against; never blocks"""
+    return _current
+
+
+def publish(data: Dict[str, Any], source: Optional[str] = None) -> PricingTables:
+    """Validate a table definition and make it the current snapshot"""
+    global _current
+    with _reload_lock:
+        tables = _build(data, source=source)
+        _current = tables
+    logger.info("Published pricing tables %s from %s", tables.version, source or "config.py")
+    return tables
+
+
+def reload(path: Optional[str] = None) -> PricingTables:
+    """Re-read the tables from path, or from config.py when no path is given"""
+    if path is None:
+        return publish({})
+
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    if not isinstance(data, dict):
+        raise ValueError("pricing tables file must contain an object")
+    return publish(data, source=path)
+
+
+class TableWatcher:
+    """Poll the tables file and publish a new snapshot whenever it changes"""
+
+    def __init__(self, path: str, interval: float = config.PRICING_TABLES_POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def check(self) -> bool:
+        """Reload if the file changed since the last check; returns True on reload"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            reload(self.path)
+        except (OSError, ValueError) as exc:
+            logger.warning("Keeping pricing tables %s, failed to load %s: %s", current().version, self.path, exc)
+            return False
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> None:
+        self.check()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pricing-table-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
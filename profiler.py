@@ -0,0 +1,192 @@
+"""
+Opt-in sampling profiler for diagnosing slow requests in production.
+
+A background thread wakes every `interval` seconds and, while at least one
+sampled request is in flight, records the event loop thread's current stack.
+Stacks are aggregated in memory and written in the collapsed ("folded")
+format understood by flamegraph.pl, speedscope and similar tools:
+
+    main.py:price_configuration;quote_cache.py:price;pricing.py:calculate_price 42
+
+Nothing is sampled unless a capture is running, and then only a fraction of
+requests are selected, so the cost outside a capture is a single attribute
+check per request. Samples are taken while a selected request is in flight,
+so on a busy worker they can include other requests sharing the event loop.
+
+A capture without a duration (THREEDNAVI_PROFILE=1) runs for the life of the
+worker, so it is written every `flush_interval` seconds to a new numbered
+file covering just that window; a crash or kill loses at most one window.
+"""
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def fold_stack(frame) -> str:
+    """Collapse a frame chain into a root-first, semicolon separated stack"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Time-boxed stack sampler for one worker's event loop thread"""
+
+    def __init__(
+        self,
+        interval: float = config.PROFILE_INTERVAL,
+        sample_rate: float = config.PROFILE_SAMPLE_RATE,
+        output_dir: str = config.PROFILE_OUTPUT_DIR,
+        flush_interval: float = config.PROFILE_FLUSH_INTERVAL
+    ):
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.flush_interval = flush_interval
+        self.stacks: Counter = Counter()
+        self.running = False
+        self.deadline: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.requests_sampled = 0
+        self.last_output: Optional[str] = None
+        self.window: Optional[int] = None  # number of the current file of an open-ended capture
+        self._active = 0
+        self._target: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, duration: Optional[float] = None, sample_rate: Optional[float] = None) -> None:
+        """Start a capture, stopping on its own after `duration` seconds if given"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("a capture is already running")
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            self.stacks = Counter()
+            self.requests_sampled = 0
+            self.started_at = time.time()
+            self.deadline = time.monotonic() + duration if duration else None
+            self.window = None if duration else 0
+            self._stop.clear()
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> Optional[str]:
+        """Stop the current capture and return the path of the written profile"""
+        thread = self._thread
+        if thread is None:
+            return self.last_output
+        self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        return self.last_output
+
+    def _rotate(self) -> None:
+        """Write the current window of an open-ended capture and start the next one"""
+        output = self.write()
+        with self._lock:
+            if output is not None:
+                self.last_output = output
+            self.stacks = Counter()
+            self.started_at = time.time()
+            self.window += 1
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.flush_interval
+        try:
+            while not self._stop.wait(self.interval):
+                now = time.monotonic()
+                if self.deadline is not None and now >= self.deadline:
+                    break
+                if self.window is not None and now >= next_flush:
+                    self._rotate()
+                    next_flush = now + self.flush_interval
+                if self._active and self._target is not None:
+                    frame = sys._current_frames().get(self._target)
+                    if frame is not None:
+                        self.stacks[fold_stack(frame)] += 1
+        finally:
+            with self._lock:
+                self.running = False
+                self._thread = None
+                output = self.write()
+                if output is not None or self.window is None:
+                    self.last_output = output
+
+    def write(self) -> Optional[str]:
+        """Write the aggregated stacks to a new folded-stack file"""
+        if not self.stacks:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        name = f"profile-{stamp}-{os.getpid()}"
+        if self.window is not None:
+            name += f"-{self.window:04d}"
+        path = os.path.join(self.output_dir, f"{name}.folded")
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+        logger.info("Wrote %d stacks to %s", len(self.stacks), path)
+        return path
+
+    def enter(self) -> bool:
+        """Called at the start of a request; decides whether it is sampled"""
+        if not self.running or random.random() >= self.sample_rate:
+            return False
+        self._target = threading.get_ident()
+        self._active += 1
+        self.requests_sampled += 1
+        return True
+
+    def exit(self) -> None:
+        self._active -= 1
+
+    def status(self) -> Dict[str, Any]:
+        remaining = None
+        if self.running and self.deadline is not None:
+            remaining = round(max(0.0, self.deadline - time.monotonic()), 1)
+        return {
+            "running": self.running,
+            "sample_rate": self.sample_rate,
+            "interval": self.interval,
+            "remaining_seconds": remaining,
+            "requests_sampled": self.requests_sampled,
+            "samples": sum(self.stacks.values()),
+            "last_output": self.last_output
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that marks sampled requests for the profiler"""
+
+    def __init__(self, app, profiler: Optional[SamplingProfiler] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        active = self.profiler or profiler
+        if scope["type"] != "http" or not active.enter():
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            active.exit()
+
+
+profiler = SamplingProfiler()
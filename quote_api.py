@@ -0,0 +1,365 @@
+"""
+Typed JSON (and MessagePack) quote API for machine clients.
+
+Bodies are validated straight from bytes by pydantic's core instead of going
+through multipart parsing, FastAPI's body handling and jsonable_encoder, and
+responses are encoded with orjson when it is installed. Dimension and
+quantity limits from config.py are enforced here, unlike on the form path.
+"""
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, ValidationError, field_validator, model_validator
+from starlette.requests import Request
+from starlette.responses import Response
+
+import config
+import pricing_tables
+
+if TYPE_CHECKING:  # scheduler pulls in numpy, which the app imports lazily
+    import scheduler
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # JSON only
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+
+DIMENSIONS = ("length", "width", "thickness", "hole_diameter")
+
+
+def known_material(value: str) -> str:
+    value = value.lower()
+    if value not in pricing_tables.current().material_multipliers:
+        raise ValueError(f"unknown material: {value}")
+    return value
+
+
+def known_surface_treatment(value: str) -> str:
+    value = value.lower()
+    if value not in pricing_tables.current().surface_treatment_multipliers:
+        raise ValueError(f"unknown surface treatment: {value}")
+    return value
+
+
+def dimension_bounds(name: str) -> tuple:
+    return (0.0 if name == "hole_diameter" else config.MIN_DIMENSION, config.MAX_DIMENSION)
+
+
+class Dimensions(BaseModel):
+    """A plate's dimensions in mm"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    length: float = Field(ge=config.MIN_DIMENSION, le=config.MAX_DIMENSION)
+    width: float = Field(ge=config.MIN_DIMENSION, le=config.MAX_DIMENSION)
+    thickness: float = Field(ge=config.MIN_DIMENSION, le=config.MAX_DIMENSION)
+    hole_diameter: float = Field(0.0, ge=0, le=config.MAX_DIMENSION)
+
+
+class PartSpec(Dimensions):
+    """A part's material, finish and dimensions"""
+
+    material: str
+    surface_treatment: str
+
+    _known_material = field_validator("material")(known_material)
+    _known_surface_treatment = field_validator("surface_treatment")(known_surface_treatment)
+
+
+class QuoteRequest(PartSpec):
+    """One part to quote"""
+
+    quantity: int = Field(1, ge=1, le=config.MAX_QUANTITY)
+
+
+class QuantityRange(BaseModel):
+    """Evenly spaced quantities from start to stop inclusive"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    start: int = Field(ge=1, le=config.MAX_QUANTITY)
+    stop: int = Field(ge=1, le=config.MAX_QUANTITY)
+    step: int = Field(1, ge=1)
+
+
+class CurveRequest(PartSpec):
+    """One part priced at a list or a range of quantities"""
+
+    quantities: Optional[List[int]] = None
+    quantity_range: Optional[QuantityRange] = None
+
+    @model_validator(mode="after")
+    def one_quantity_source(self) -> "CurveRequest":
+        if (self.quantities is None) == (self.quantity_range is None):
+            raise ValueError("give exactly one of quantities or quantity_range")
+        points = self.points()
+        if not points:
+            raise ValueError("no quantities to price")
+        if len(points) > config.PRICE_CURVE_MAX_POINTS:
+            raise ValueError(f"at most {config.PRICE_CURVE_MAX_POINTS} quantities per curve")
+        if not all(1 <= quantity <= config.MAX_QUANTITY for quantity in points):
+            raise ValueError(f"quantities must be between 1 and {config.MAX_QUANTITY}")
+        return self
+
+    def points(self) -> List[int]:
+        if self.quantities is not None:
+            return self.quantities
+        bounds = self.quantity_range
+        return list(range(bounds.start, bounds.stop + 1, bounds.step))
+
+
+class QuoteResponse(BaseModel):
+    """Compact quote returned by /api/v1/quotes"""
+
+    quote_id: str
+    price: float
+    delivery: str
+    delivery_date: str
+    pricing_version: str
+
+
+class Sweep(BaseModel):
+    """Values of one dimension to sweep: a list, or num points from start to stop"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    dimension: Literal["length", "width", "thickness", "hole_diameter"]
+    values: Optional[List[float]] = Field(None, max_length=config.PRICE_MATRIX_MAX_CELLS)
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    num: Optional[int] = Field(None, ge=1, le=config.PRICE_MATRIX_MAX_CELLS)
+    _points: Optional[List[float]] = PrivateAttr(None)
+
+    @model_validator(mode="after")
+    def one_value_source(self) -> "Sweep":
+        ranged = (self.start, self.stop, self.num)
+        if self.values is None and None in ranged:
+            raise ValueError("give values, or start, stop and num")
+        if self.values is not None and ranged != (None, None, None):
+            raise ValueError("give values or a range, not both")
+        if not self.count():
+            raise ValueError("no sweep values")
+        # A range is evenly spaced, so its ends bound every point in it
+        ends = self.values if self.values is not None else (self.start, self.stop)
+        low, high = dimension_bounds(self.dimension)
+        if not all(low <= value <= high for value in ends):
+            raise ValueError(f"{self.dimension} values must be between {low} and {high} mm")
+        return self
+
+    def count(self) -> int:
+        """Number of sweep values, without building them"""
+        return len(self.values) if self.values is not None else self.num
+
+    def points(self) -> List[float]:
+        """The sweep values, built on first use"""
+        if self._points is None:
+            if self.values is not None:
+                self._points = self.values
+            elif self.num == 1:
+                self._points = [self.start]
+            else:
+                step = (self.stop - self.start) / (self.num - 1)
+                self._points = [self.start + step * index for index in range(self.num)]
+        return self._points
+
+
+class MatrixRequest(Dimensions):
+    """Base part priced for every material x treatment (x sweep value)"""
+
+    quantity: int = Field(1, ge=1, le=config.MAX_QUANTITY)
+    materials: Optional[List[str]] = None
+    surface_treatments: Optional[List[str]] = None
+    sweep: Optional[Sweep] = None
+
+    @field_validator("materials")
+    @classmethod
+    def known_materials(cls, values: Optional[List[str]]) -> Optional[List[str]]:
+        return values if values is None else [known_material(value) for value in values]
+
+    @field_validator("surface_treatments")
+    @classmethod
+    def known_surface_treatments(cls, values: Optional[List[str]]) -> Optional[List[str]]:
+        return values if values is None else [known_surface_treatment(value) for value in values]
+
+    @model_validator(mode="after")
+    def bounded(self) -> "MatrixRequest":
+        tables = pricing_tables.current()
+        cells = (
+            len(self.materials or tables.material_multipliers)
+            * len(self.surface_treatments or tables.surface_treatment_multipliers)
+            * (self.sweep.count() if self.sweep else 1)
+        )
+        if cells > config.PRICE_MATRIX_MAX_CELLS:
+            raise ValueError(f"at most {config.PRICE_MATRIX_MAX_CELLS} prices per matrix")
+        return self
+
+
+class MatrixResponse(BaseModel):
+    """Dense price array indexed [material][treatment] or [material][treatment][sweep]"""
+
+    materials: List[str]
+    surface_treatments: List[str]
+    sweep: Optional[Dict[str, Any]]
+    shape: List[int]
+    prices: List[Any]
+    pricing_version: str
+
+
+class CurveResponse(BaseModel):
+    """Price curve as parallel arrays, one entry per quantity"""
+
+    quantities: List[int]
+    total_prices: List[float]
+    unit_prices: List[float]
+    discounts: List[float]
+    delivery: str
+    pricing_version: str
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+def errors(exc: ValidationError) -> List[Dict[str, Any]]:
+    """Validation errors in FastAPI's 422 detail shape"""
+    return [
+        {"loc": ["body", *error["loc"]], "msg": error["msg"], "type": error["type"]}
+        for error in exc.errors(include_url=False, include_context=False, include_input=False)
+    ]
+
+
+def media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+def decode(body: bytes, content_type: str, model: Type[Model] = QuoteRequest) -> Model:
+    """Validate a request body.
+
+    Raises UnsupportedMediaType for unknown content types, ValidationError for
+    invalid parts and ValueError for undecodable MessagePack.
+    """
+    kind = media_type(content_type) or JSON
+    if kind == JSON:
+        return model.model_validate_json(body)
+    if kind in MSGPACK_TYPES and msgpack is not None:
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ValueError(f"malformed MessagePack: {exc}") from exc
+        return model.model_validate(data)
+    raise UnsupportedMediaType(f"unsupported content type: {kind}")
+
+
+async def parse(request: Request, model: Type[Model] = QuoteRequest) -> Tuple[Optional[Model], Optional[Response]]:
+    """Read and validate a request body, returning (parsed, None) or (None, error response)"""
+    accept = request.headers.get("accept", "")
+    try:
+        return decode(await request.body(), request.headers.get("content-type", ""), model), None
+    except UnsupportedMediaType as exc:
+        return None, encode({"detail": str(exc)}, accept, status_code=415)
+    except ValidationError as exc:
+        return None, encode({"detail": errors(exc)}, accept, status_code=422)
+    except ValueError as exc:
+        return None, encode({"detail": str(exc)}, accept, status_code=422)
+
+
+def negotiate(accept: str) -> str:
+    """MessagePack only when the client asks for it (and it is available)"""
+    if msgpack is not None and any(media_type(item) in MSGPACK_TYPES for item in accept.split(",")):
+        return MSGPACK
+    return JSON
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode(payload: Any, accept: str = "", status_code: int = 200) -> Response:
+    """Serialize a response body in the negotiated format"""
+    kind = negotiate(accept)
+    body = msgpack.packb(payload, use_bin_type=True) if kind == MSGPACK else dumps(payload)
+    return Response(content=body, status_code=status_code, media_type=kind, headers={"Vary": "Accept"})
+
+
+def part(request: PartSpec) -> Dict[str, Any]:
+    """The part dict the pricing and cache modules work with"""
+    return request.model_dump(include=set(PartSpec.model_fields) | {"quantity"})
+
+
+def dimensions(request: Dimensions) -> Dict[str, float]:
+    return request.model_dump(include=set(DIMENSIONS))
+
+
+def response(quote_id: str, price: float, pricing_version: str, lead_time: "scheduler.Estimate") -> Dict[str, Any]:
+    return {
+        "quote_id": quote_id,
+        "price": round(price, 2),
+        "delivery": lead_time.describe(),
+        "delivery_date": lead_time.delivery_date.isoformat(),
+        "pricing_version": pricing_version
+    }
+
+
+def curve_response(quantities: List[int], curve: Dict[str, Any], pricing_version: str) -> Dict[str, Any]:
+    return {
+        "quantities": quantities,
+        "total_prices": curve["total_prices"].round(2).tolist(),
+        "unit_prices": curve["unit_prices"].round(4).tolist(),
+        "discounts": curve["discounts"].tolist(),
+        "delivery": config.DEFAULT_DELIVERY_TIME,
+        "pricing_version": pricing_version
+    }
+
+
+def matrix_response(matrix: Dict[str, Any], pricing_version: str) -> Dict[str, Any]:
+    sweep = None
+    if matrix["sweep_dimension"] is not None:
+        sweep = {"dimension": matrix["sweep_dimension"], "values": matrix["sweep_values"].tolist()}
+    return {
+        "materials": matrix["materials"],
+        "surface_treatments": matrix["surface_treatments"],
+        "sweep": sweep,
+        "shape": list(matrix["prices"].shape),
+        "prices": matrix["prices"].round(2).tolist(),
+        "pricing_version": pricing_version
+    }
+
+
+def _inline(schema: Any, definitions: Dict[str, Any]) -> Any:
+    if isinstance(schema, dict):
+        reference = schema.get("$ref", "")
+        if reference.startswith("#/$defs/"):
+            return _inline(definitions[reference[len("#/$defs/"):]], definitions)
+        return {key: _inline(value, definitions) for key, value in schema.items()}
+    if isinstance(schema, list):
+        return [_inline(item, definitions) for item in schema]
+    return schema
+
+
+def request_schema(model: Type[BaseModel] = QuoteRequest) -> Dict[str, Any]:
+    """OpenAPI request body for a raw-body endpoint"""
+    schema = model.model_json_schema()
+    # Nested models are inlined; their local $refs would not resolve inside the OpenAPI document
+    schema = _inline(schema, schema.pop("$defs", {}))
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {JSON: {"schema": schema}, MSGPACK: {"schema": schema}}
+        }
+    }
@@ -0,0 +1,174 @@
+"""
+Memoized geometry and nesting keyed on a canonical part configuration.
+
+Prices themselves are not cached: calculate_price costs about 2 us, less
+than a cache lookup, while nesting a part takes about 50 us. So the cache
+holds what a part's production looks like (geometry, sheet nesting and the
+scrap stock it leaves), none of which depends on the pricing tables, and
+prices are computed fresh from those against the current tables.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+import config
+import geometry
+import nesting
+import pricing
+import pricing_tables
+from pricing_tables import PricingTables
+
+DIMENSIONS = ("length", "width", "thickness", "hole_diameter")
+
+
+def canonical_key(part: Mapping[str, Any], step: float = config.DIMENSION_STEP) -> Tuple:
+    """Normalize a part so equivalent configurations share one cache entry.
+
+    Names are lower-cased and every dimension is snapped to the form's input
+    step, stored as an integer number of steps so float noise cannot split keys.
+    """
+    return (
+        part["material"].lower(),
+        part["surface_treatment"].lower(),
+        round(part["length"] / step),
+        round(part["width"] / step),
+        round(part["thickness"] / step),
+        round(part["hole_diameter"] / step),
+        part["quantity"]
+    )
+
+
+def _from_steps(steps: int, step: float) -> float:
+    return round(steps * step, 10)
+
+
+def canonical_part(key: Tuple, step: float = config.DIMENSION_STEP) -> Dict[str, Any]:
+    """Rebuild the snapped part a canonical key stands for"""
+    material, surface_treatment, length, width, thickness, hole_diameter, quantity = key
+    return {
+        "material": material,
+        "surface_treatment": surface_treatment,
+        "length": _from_steps(length, step),
+        "width": _from_steps(width, step),
+        "thickness": _from_steps(thickness, step),
+        "hole_diameter": _from_steps(hole_diameter, step),
+        "quantity": quantity
+    }
+
+
+def part_key(part: Mapping[str, Any], step: float = config.DIMENSION_STEP) -> Tuple:
+    """canonical_key for parts on the input step grid.
+
+    Finer dimensions keep their exact values, so such a part is never taken
+    for a neighbour on the grid.
+    """
+    key = canonical_key(part, step)
+    steps = key[2:6]
+    if all(part[dimension] == _from_steps(count, step) for dimension, count in zip(DIMENSIONS, steps)):
+        return key
+    return (*key[:2], *(float(part[dimension]) for dimension in DIMENSIONS), key[6], "exact")
+
+
+def production_key(part: Mapping[str, Any], step: float = config.DIMENSION_STEP) -> Tuple:
+    """part_key without the surface treatment, which geometry and nesting don't depend on"""
+    key = part_key(part, step)
+    return (key[0], *key[2:])
+
+
+class QuoteCache:
+    """LRU cache with a per-entry time-to-live and hit/miss counters"""
+
+    def __init__(
+        self,
+        maxsize: int = config.QUOTE_CACHE_SIZE,
+        ttl: float = config.QUOTE_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = compute()
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bypasses": self.bypasses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+cache = QuoteCache()
+
+
+def production(part: Mapping[str, Any]) -> Dict[str, Any]:
+    """Geometry, nesting plan and scrap stock volume of a part, through the shared cache.
+
+    Only configurations that already sit on the input step grid are cached;
+    anything finer is computed exactly and counted as a bypass, so the cache
+    never changes a quote.
+    """
+    dimensions = (part["length"], part["width"], part["thickness"], part["hole_diameter"])
+
+    def compute() -> Dict[str, Any]:
+        length, width, thickness, hole_diameter = dimensions
+        return {
+            "geometry": geometry.part_geometry(part["material"], *dimensions),
+            "nesting": nesting.describe(nesting.plan(length, width, hole_diameter, part["quantity"])),
+            "scrap_volume": float(pricing.scrap_volumes(length, width, thickness, hole_diameter, part["quantity"]))
+        }
+
+    key = production_key(part)
+    if key[-1] == "exact":
+        cache.bypasses += 1
+        return compute()
+    return cache.get_or_compute(key, compute)
+
+
+def price(part: Mapping[str, Any], tables: Optional[PricingTables] = None) -> float:
+    """Price a part against the tables; only a scrap charge needs the cached nesting"""
+    tables = tables or pricing_tables.current()
+    scrap_volume = production(part)["scrap_volume"] if tables.scrap_charge else None
+    return pricing.calculate_price(
+        part["material"],
+        part["surface_treatment"],
+        part["length"],
+        part["width"],
+        part["thickness"],
+        part["hole_diameter"],
+        part["quantity"],
+        tables,
+        scrap_volume=scrap_volume
+    )
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Quote a CSV/NDJSON RFQ file of any size, writing NDJSON quotes.
+
+Rows are read and priced in chunks, so memory use stays flat however large
+the input is. Use "-" to read from stdin or write to stdout.
+
+    python quote_cli.py rfq.csv -o quotes.ndjson
+"""
+
+import argparse
+import sys
+
+import quote_stream
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Stream quotes for a CSV/NDJSON RFQ file")
+    parser.add_argument("input", help="input file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=quote_stream.FORMATS, help="input format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, default=quote_stream.DEFAULT_CHUNK_SIZE, help="rows priced per chunk")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or quote_stream.detect_format(args.input)
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8-sig")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    try:
+        for chunk in quote_stream.iter_quotes(quote_stream.iter_rows(source, fmt), args.chunk_size):
+            sink.write(chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
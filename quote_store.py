@@ -0,0 +1,174 @@
+"""
+Quote persistence in SQLite (WAL mode) behind an asyncio write-behind queue.
+
+Handlers enqueue a quote and return immediately; a single writer task drains
+the queue and commits everything that accumulated while the previous commit
+was running in one transaction, so the fsync cost is shared by the whole batch
+and never sits on a request's critical path. Quotes still waiting in the queue
+are served from memory, so a quote can be fetched as soon as it is issued.
+
+A batch that fails to commit (locked database, full disk) is logged and
+retried with backoff; its quotes stay queued and readable meanwhile, and the
+writer keeps running, so requests never fall back to writing inline.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    quote TEXT NOT NULL
+)
+"""
+
+
+class QuoteStore:
+    """Write-behind quote store"""
+
+    def __init__(
+        self,
+        path: str = config.QUOTE_DB_PATH,
+        batch_size: int = config.QUOTE_STORE_BATCH_SIZE,
+        queue_size: int = config.QUOTE_STORE_QUEUE_SIZE
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers = threading.local()
+        self.batches = 0
+        self.written = 0
+        self.failures = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(SCHEMA)
+        return connection
+
+    def _commit(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if self._writer is None:
+            self._writer = self._connect()
+        with self._writer:
+            self._writer.executemany(
+                "INSERT OR REPLACE INTO quotes (id, created_at, quote) VALUES (?, ?, ?)",
+                [(quote_id, time.time(), json.dumps(quote)) for quote_id, quote in batch]
+            )
+        self.batches += 1
+        self.written += len(batch)
+
+    def _read(self, quote_id: str) -> Optional[Dict[str, Any]]:
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            connection = self._readers.connection = self._connect()
+        row = connection.execute("SELECT quote FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _running(self) -> bool:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return self._task is not None and not self._task.done() and loop is self._loop
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            delay = config.QUOTE_STORE_RETRY_DELAY
+            while True:
+                try:
+                    await run_in_threadpool(self._commit, batch)
+                    break
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Failed to write %d quotes to %s, retrying in %.1fs", len(batch), self.path, delay)
+                    self._reset_writer()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, config.QUOTE_STORE_MAX_RETRY_DELAY)
+            for quote_id, _ in batch:
+                self._pending.pop(quote_id, None)
+                self._queue.task_done()
+
+    def _reset_writer(self) -> None:
+        """Drop the writer connection so the next commit reconnects"""
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except sqlite3.Error:
+                pass
+            self._writer = None
+
+    def start(self) -> None:
+        """Start the writer task on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = self._loop.create_task(self._run())
+
+    async def close(self) -> None:
+        """Flush everything queued, then stop the writer"""
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), config.SHUTDOWN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error("Gave up on %d unwritten quotes at shutdown", len(self._pending))
+            self._task.cancel()
+            self._task = None
+        self._reset_writer()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    async def save(self, quote_id: str, quote: Dict[str, Any]) -> None:
+        """Queue a quote for persistence.
+
+        Without a running writer (e.g. the app was served without its lifespan)
+        the quote is committed inline instead.
+        """
+        if not self._running():
+            self._commit([(quote_id, quote)])
+            return
+        self._pending[quote_id] = quote
+        await self._queue.put((quote_id, quote))
+
+    async def get(self, quote_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a quote, whether still queued or already committed"""
+        quote = self._pending.get(quote_id)
+        if quote is not None:
+            return quote
+        return await run_in_threadpool(self._read, quote_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "written": self.written,
+            "failures": self.failures
+        }
+
+
+store = QuoteStore()
@@ -0,0 +1,222 @@
+"""
+Chunked CSV/NDJSON quote pipeline for large RFQ files
+"""
+
+import codecs
+import collections
+import csv
+import json
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+import config
+import pricing
+import pricing_tables
+
+DEFAULT_CHUNK_SIZE = config.STREAM_CHUNK_SIZE
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(name: Optional[str]) -> str:
+    """Guess the row format from a filename or content type, defaulting to NDJSON"""
+    return "csv" if name and "csv" in name.lower() else "ndjson"
+
+
+def _decode(row: Any) -> Any:
+    """NDJSON rows arrive as raw lines, CSV rows are already dicts"""
+    if isinstance(row, str):
+        try:
+            return json.loads(row)
+        except ValueError as exc:
+            raise ValueError(f"malformed JSON: {exc}") from exc
+    return row
+
+
+def quote_chunk(rows: List[Any], first_row: int = 0) -> str:
+    """Validate and price one chunk of rows, returning NDJSON output lines"""
+    records: List[Any] = []
+    parts = []
+    for offset, row in enumerate(rows):
+        index = first_row + offset
+        try:
+            decoded = _decode(row)
+            if not isinstance(decoded, dict):
+                raise ValueError("expected a part object")
+            part = pricing.parse_part(decoded)
+        except ValueError as exc:
+            records.append({"row": index, "status": "error", "detail": str(exc)})
+            continue
+        records.append(part)
+        parts.append(part)
+
+    tables = pricing_tables.current()
+    prices = iter(pricing.price_parts(parts, tables).tolist())
+    lines = []
+    for index, record in enumerate(records, start=first_row):
+        if "row" not in record:
+            record = {
+                "row": index,
+                "status": "success",
+                "configuration": pricing.configuration(record),
+                "estimated_price": round(next(prices), 2),
+                "estimated_delivery": config.DEFAULT_DELIVERY_TIME,
+                "pricing_version": tables.version
+            }
+        lines.append(json.dumps(record) + "\n")
+    return "".join(lines)
+
+
+def iter_rows(lines: Iterable[str], fmt: str) -> Iterator[Any]:
+    """Yield raw rows from an iterable of text lines"""
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    else:
+        yield from (line for line in lines if line.strip())
+
+
+def iter_quotes(rows: Iterable[Any], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """Quote rows chunk by chunk so memory stays bounded by chunk_size"""
+    chunk: List[Any] = []
+    first_row = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield quote_chunk(chunk, first_row)
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        yield quote_chunk(chunk, first_row)
+
+
+async def aiter_lines(byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split an async byte stream into text lines without buffering it whole"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for data in byte_chunks:
+        pending += decoder.decode(data)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+class LineFeed:
+    """Lines for one csv.reader, released only once they end a complete record.
+
+    The reader pulls lines from this iterator, so a quoted field may span
+    lines; the caller only advances the reader after push() reports that no
+    quoted field is left open, so it never runs dry mid-record. Quotes follow
+    the csv module's default dialect: one opens a quoted field only at the
+    start of a field, a doubled quote inside it is a literal quote, and any
+    other quote (as in 5" bar) is plain text.
+    """
+
+    def __init__(self):
+        self.lines: Deque[str] = collections.deque()
+        self.in_quotes = False
+
+    def push(self, line: str) -> bool:
+        """Queue a line; returns True when the queued lines end a record"""
+        self.lines.append(line + "\n")
+        if '"' in line or self.in_quotes:
+            self.in_quotes = self._scan(line)
+        return not self.in_quotes
+
+    def _scan(self, line: str) -> bool:
+        """Whether a quoted field is still open at the end of line"""
+        quoted = self.in_quotes
+        field_start = not quoted
+        closed = False  # the previous character closed a quoted field
+        for char in line:
+            if quoted:
+                quoted = char != '"'
+                closed = not quoted
+            else:
+                quoted = char == '"' and (field_start or closed)
+                closed = False
+            field_start = not quoted and char == ","
+        return quoted
+
+    def __iter__(self) -> "LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def aiter_rows(byte_chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Any]:
+    """Async counterpart of iter_rows reading straight from a request body"""
+    if fmt != "csv":
+        async for line in aiter_lines(byte_chunks):
+            if line.strip():
+                yield line
+        return
+
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    header: Optional[List[str]] = None
+
+    def records() -> List[Dict[str, str]]:
+        nonlocal header
+        rows = []
+        for values in reader:
+            if not values:
+                continue  # blank line
+            if header is None:
+                header = values
+            else:
+                rows.append(dict(zip(header, values)))
+        return rows
+
+    async for line in aiter_lines(byte_chunks):
+        if feed.push(line):
+            for row in records():
+                yield row
+    # An unterminated quoted field runs to the end of the body
+    for row in records():
+        yield row
+
+
+async def aquote_chunk(rows: List[Any], first_row: int = 0) -> str:
+    """quote_chunk, in a worker thread when the chunk is big enough to stall the event loop"""
+    if len(rows) >= config.STREAM_THREADPOOL_ROWS:
+        return await run_in_threadpool(quote_chunk, rows, first_row)
+    return quote_chunk(rows, first_row)
+
+
+async def aiter_quotes(
+    byte_chunks: AsyncIterator[bytes],
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """Async counterpart of iter_quotes reading straight from a request body"""
+    chunk: List[Any] = []
+    first_row = 0
+    async for row in aiter_rows(byte_chunks, fmt):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield await aquote_chunk(chunk, first_row)
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        yield await aquote_chunk(chunk, first_row)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that leaves the request body to the body iterator.
+
+    The stock response listens for disconnects by calling receive(), which
+    would steal request body messages from a handler that is still reading
+    its upload. Disconnects surface through request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,402 @@
+"""
+Capacity-aware lead times for quotes.
+
+The shop is a set of machine pools: CUTTING_MACHINES per material and
+FINISHING_LINES per surface treatment. A job is cut on one machine of its
+material's pool, then finished on one line of its treatment's pool. Each
+machine works through its queue in booking order, so a pool is a min-heap
+of the moment each machine runs dry: estimating a new job only reads the
+tops of at most two heaps, whatever the number of open jobs, and booking it
+is a heap replace. Booked jobs are also kept in a heap ordered by
+completion so finished ones drop out as time passes; cancelling a job takes
+its unfinished work off the queues of the machines it was on.
+
+Time is counted in working minutes (SHOP_HOURS_PER_DAY per weekday from
+SHOP_DAY_START) and turned into business days and dates for responses.
+
+With a database path, the machines and open jobs are kept in their own
+SQLite file, so every worker process books against the same shop. Each
+process keeps a copy in memory and reloads it only when another process has
+committed a change, which it sees as a new value of the revision counter
+every schedule commit bumps; an estimate costs one single-row read on top of
+the heap reads. Bookings and cancellations run in an IMMEDIATE transaction
+on freshly loaded state; a quote can only be booked once. They may wait for
+another process's booking, so they are meant to be called from a worker
+thread: the in-memory state is guarded by a lock that is only held once the
+database lock has been taken, so estimates on the event loop never wait on
+another process.
+"""
+
+import contextlib
+import datetime
+import heapq
+import json
+import math
+import sqlite3
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+import config
+import geometry
+
+EPOCH = datetime.date(1970, 1, 5)  # a Monday
+MINUTES_PER_DAY = config.SHOP_HOURS_PER_DAY * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS machines (
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    machine INTEGER NOT NULL,
+    free_at REAL NOT NULL,
+    queued INTEGER NOT NULL,
+    PRIMARY KEY (stage, name, machine)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    quote_id TEXT UNIQUE,
+    end_minute REAL NOT NULL,
+    stages TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revision (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO revision (id, value) VALUES (0, 0);
+"""
+
+
+def business_day(day: datetime.date) -> int:
+    """Business days since EPOCH; weekends count as the following Monday"""
+    weeks, weekday = divmod((day - EPOCH).days, 7)
+    return weeks * 5 + min(weekday, 5)
+
+
+def calendar_day(index: int) -> datetime.date:
+    weeks, weekday = divmod(index, 5)
+    return EPOCH + datetime.timedelta(days=weeks * 7 + weekday)
+
+
+def working_minute(moment: datetime.datetime) -> float:
+    """Working minutes since EPOCH, clamped to the shop's hours"""
+    start = business_day(moment.date()) * MINUTES_PER_DAY
+    if moment.weekday() >= 5:
+        return start
+    into_day = (moment.hour - config.SHOP_DAY_START) * 60 + moment.minute + moment.second / 60
+    return start + min(max(into_day, 0.0), MINUTES_PER_DAY)
+
+
+def day_of(minute: float) -> int:
+    """Business day in which a working minute falls (a day's last minute belongs to it)"""
+    return max(math.ceil(minute / MINUTES_PER_DAY) - 1, 0)
+
+
+class Estimate(NamedTuple):
+    completion_date: datetime.date
+    delivery_date: datetime.date
+    business_days: int
+
+    def describe(self) -> str:
+        return f"{self.business_days} business day{'' if self.business_days == 1 else 's'}"
+
+
+class Stage(NamedTuple):
+    pool: Tuple[str, str]
+    machine: int
+    start: float
+    end: float
+
+
+class Job(NamedTuple):
+    job_id: str
+    quote_id: Optional[str]
+    stages: Tuple[Stage, ...]
+
+    @property
+    def end(self) -> float:
+        return self.stages[-1].end
+
+
+class Pool:
+    """Parallel machines as a min-heap of (free at, machine)"""
+
+    def __init__(self, machines: int):
+        self.heap: List[Tuple[float, int]] = [(0.0, machine) for machine in range(machines)]
+        self.queued = [0] * machines  # open jobs per machine
+
+    def earliest(self) -> Tuple[float, int]:
+        return self.heap[0]
+
+    def assign(self, end: float) -> None:
+        """Give the earliest free machine work until `end`"""
+        machine = self.heap[0][1]
+        heapq.heapreplace(self.heap, (end, machine))
+        self.queued[machine] += 1
+
+    def finish(self, machine: int) -> None:
+        self.queued[machine] -= 1
+
+    def release(self, machine: int, minutes: float, now: float) -> None:
+        """Drop unfinished work from one machine's queue; later jobs move up"""
+        self.queued[machine] -= 1
+        for index, (free_at, candidate) in enumerate(self.heap):
+            if candidate == machine:
+                # Waiting on upstream stages can leave idle gaps; an emptied queue has none
+                free_at = max(max(free_at, now) - minutes, now) if self.queued[machine] else now
+                self.heap[index] = (free_at, machine)
+                heapq.heapify(self.heap)
+                return
+
+    def backlog(self, now: float) -> float:
+        """Minutes until every machine is free"""
+        return max(max(free_at for free_at, _ in self.heap) - now, 0.0)
+
+
+class Schedule:
+    """Booked work and lead-time estimates against it"""
+
+    def __init__(
+        self,
+        clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+        path: Optional[str] = None
+    ):
+        self._clock = clock
+        self.path = path
+        self._reader: Optional[sqlite3.Connection] = None  # estimates, under _lock
+        self._writer: Optional[sqlite3.Connection] = None  # transactions, under _write_lock
+        self._revision: Optional[int] = None  # stored revision the in-memory state matches
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._added: List[Job] = []
+        self._removed: List[str] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self.pools: Dict[Tuple[str, str], Pool] = {}
+        for material, machines in config.CUTTING_MACHINES.items():
+            self.pools[("cutting", material)] = Pool(machines)
+        for treatment, lines in config.FINISHING_LINES.items():
+            self.pools[("finishing", treatment)] = Pool(lines)
+        self.jobs: Dict[str, Job] = {}
+        self.booked: Dict[str, str] = {}  # quote_id -> job_id
+        self._by_end: List[Tuple[float, str]] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; transactions are opened explicitly. Each connection is
+        # used by one thread at a time, but not always the one that opened it
+        db = sqlite3.connect(
+            self.path, timeout=config.SCHEDULE_LOCK_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        db.executemany(
+            "INSERT OR IGNORE INTO machines (stage, name, machine, free_at, queued) VALUES (?, ?, ?, 0, 0)",
+            [(stage, name, machine) for (stage, name), pool in self.pools.items() for machine in range(len(pool.queued))]
+        )
+        return db
+
+    def _databases(self) -> Tuple[sqlite3.Connection, sqlite3.Connection]:
+        """(reader, writer) connections, opened on first use"""
+        with self._open_lock:
+            if self._reader is None:
+                self._reader = self._connect()
+                self._writer = self._connect()
+        return self._reader, self._writer
+
+    def _load(self, db: sqlite3.Connection) -> None:
+        """Replace the in-memory state with what is stored"""
+        self._reset()
+        for stage, name, machine, free_at, queued in db.execute(
+            "SELECT stage, name, machine, free_at, queued FROM machines"
+        ):
+            pool = self.pools.get((stage, name))
+            if pool is None or machine >= len(pool.queued):
+                continue  # no longer configured
+            pool.heap[machine] = (free_at, machine)  # fresh pools list machines in order
+            pool.queued[machine] = queued
+        for pool in self.pools.values():
+            heapq.heapify(pool.heap)
+        for job_id, quote_id, end, stages in db.execute("SELECT id, quote_id, end_minute, stages FROM jobs"):
+            job = Job(job_id, quote_id, tuple(Stage((stage, name), machine, start, stop)
+                                              for stage, name, machine, start, stop in json.loads(stages)))
+            self.jobs[job_id] = job
+            if quote_id is not None:
+                self.booked[quote_id] = job_id
+            self._by_end.append((end, job_id))
+        heapq.heapify(self._by_end)
+
+    def _sync(self, db: sqlite3.Connection) -> None:
+        """Pick up changes committed by other processes; call with _lock held"""
+        revision = db.execute("SELECT value FROM revision").fetchone()[0]
+        if revision != self._revision:
+            self._load(db)
+            self._revision = revision
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Change the schedule on current state and store the result atomically"""
+        if self.path is None:
+            with self._lock:
+                yield
+            return
+        with self._write_lock:
+            _, db = self._databases()
+            db.execute("BEGIN IMMEDIATE")  # waits up to SCHEDULE_LOCK_TIMEOUT for other processes
+            try:
+                with self._lock:
+                    self._sync(db)
+                    try:
+                        yield
+                        self._store(db)
+                        db.execute("UPDATE revision SET value = value + 1")
+                        db.execute("COMMIT")
+                    except BaseException:
+                        self._revision = None  # discard the in-memory changes on next use
+                        raise
+                    self._revision += 1
+            finally:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                self._added, self._removed = [], []
+
+    def _store(self, db: sqlite3.Connection) -> None:
+        db.executemany(
+            "UPDATE machines SET free_at = ?, queued = ? WHERE stage = ? AND name = ? AND machine = ?",
+            [
+                (free_at, pool.queued[machine], stage, name, machine)
+                for (stage, name), pool in self.pools.items() for free_at, machine in pool.heap
+            ]
+        )
+        db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in self._removed])
+        db.executemany(
+            "INSERT INTO jobs (id, quote_id, end_minute, stages) VALUES (?, ?, ?, ?)",
+            [
+                (job.job_id, job.quote_id, job.end,
+                 json.dumps([[*stage.pool, stage.machine, stage.start, stage.end] for stage in job.stages]))
+                for job in self._added
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def close(self) -> None:
+        with self._open_lock, self._write_lock, self._lock:
+            for db in (self._reader, self._writer):
+                if db is not None:
+                    db.close()
+            self._reader = self._writer = None
+            self._revision = None
+
+    def stages(self, configuration: Mapping[str, Any]) -> List[Tuple[Tuple[str, str], float]]:
+        """(pool, minutes) for each machine a configuration visits, in order"""
+        material = configuration["material"].lower()
+        if material not in config.CUTTING_MACHINES:
+            material = config.DEFAULT_GEOMETRY_MATERIAL
+        dimensions = configuration["dimensions"]
+        quantity = max(int(configuration["quantity"]), 0)
+        per_part = geometry.passes(dimensions["thickness"]) * geometry.cut_length(
+            dimensions["length"], dimensions["width"], dimensions["hole_diameter"]
+        ) * geometry.coefficients(material).minutes_per_mm
+        stages = [(("cutting", material), config.JOB_SETUP_MINUTES + per_part * quantity)]
+
+        treatment = configuration["surface_treatment"].lower()
+        if ("finishing", treatment) in self.pools:
+            minutes = config.JOB_SETUP_MINUTES + config.FINISHING_MINUTES_PER_PART[treatment] * quantity
+            stages.append((("finishing", treatment), minutes))
+        return stages
+
+    def _plan(self, configuration: Mapping[str, Any], now: float) -> Tuple[Stage, ...]:
+        planned = []
+        ready = now
+        for pool, minutes in self.stages(configuration):
+            free_at, machine = self.pools[pool].earliest()
+            start = max(ready, free_at)
+            ready = start + minutes
+            planned.append(Stage(pool, machine, start, ready))
+        return tuple(planned)
+
+    def _estimate(self, end: float, today: datetime.date) -> Estimate:
+        completion = day_of(end)
+        delivery = completion + config.SHIPPING_DAYS
+        return Estimate(calendar_day(completion), calendar_day(delivery), delivery - business_day(today))
+
+    def _expire(self, now: float) -> None:
+        while self._by_end and self._by_end[0][0] <= now:
+            _, job_id = heapq.heappop(self._by_end)
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                continue
+            self._removed.append(job_id)
+            if job.quote_id is not None:
+                self.booked.pop(job.quote_id, None)
+            for stage in job.stages:
+                self.pools[stage.pool].finish(stage.machine)
+
+    def estimate(self, configuration: Mapping[str, Any]) -> Estimate:
+        """Earliest delivery for a configuration given the work already booked"""
+        moment = self._clock()
+        with self._lock:
+            if self.path is not None:
+                self._sync(self._databases()[0])
+            stages = self._plan(configuration, working_minute(moment))
+        return self._estimate(stages[-1].end, moment.date())
+
+    def book(self, configuration: Mapping[str, Any], quote_id: Optional[str] = None) -> Tuple[Job, Estimate]:
+        """Reserve capacity for a configuration at its earliest slot"""
+        moment = self._clock()
+        now = working_minute(moment)
+        with self._transaction():
+            self._expire(now)
+            if quote_id is not None and quote_id in self.booked:
+                raise ValueError(f"quote {quote_id} is already booked")
+
+            job = Job(uuid.uuid4().hex, quote_id, self._plan(configuration, now))
+            for stage in job.stages:
+                self.pools[stage.pool].assign(stage.end)
+            self.jobs[job.job_id] = job
+            self._added.append(job)
+            if quote_id is not None:
+                self.booked[quote_id] = job.job_id
+            heapq.heappush(self._by_end, (job.end, job.job_id))
+        return job, self._estimate(job.end, moment.date())
+
+    def release(self, job_id: str) -> bool:
+        """Cancel an open job; returns False if it is unknown or already finished"""
+        now = working_minute(self._clock())
+        with self._transaction():
+            self._expire(now)
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self._removed.append(job_id)
+            if job.quote_id is not None:
+                self.booked.pop(job.quote_id, None)
+            for stage in job.stages:
+                remaining = max(min(stage.end - stage.start, stage.end - now), 0.0)
+                self.pools[stage.pool].release(stage.machine, remaining, now)
+            # Its entry in _by_end is skipped when it comes up
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        now = working_minute(self._clock())
+        with self._lock:
+            if self.path is not None:
+                self._sync(self._databases()[0])
+            expired = bool(self._by_end) and self._by_end[0][0] <= now
+        if expired:
+            with self._transaction():
+                self._expire(now)
+        with self._lock:
+            return {
+                "open_jobs": len(self.jobs),
+                "backlog_days": {
+                    f"{stage}/{name}": round(pool.backlog(now) / MINUTES_PER_DAY, 2)
+                    for (stage, name), pool in self.pools.items()
+                }
+            }
+
+
+schedule = Schedule(path=config.SCHEDULE_DB_PATH)
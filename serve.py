@@ -0,0 +1,249 @@
+"""
+Production launcher: a pre-fork master supervising N uvicorn workers.
+
+The master binds the listening socket once, then forks workers that all
+accept on it. The master itself only imports the standard library and
+config.py, so it is up immediately; each worker imports the application after
+the fork and logs how long the import and the lifespan startup took, warning
+when boot exceeds STARTUP_BUDGET. With --preload the application is imported
+once in the master and inherited by every worker, which makes spawning a
+worker nearly free but means a restart keeps serving the already-loaded code.
+
+Signals to the master:
+    TERM, INT   graceful shutdown (workers finish in-flight requests)
+    HUP         graceful restart: start a new set of workers, drain the old one
+    TTIN, TTOU  add or remove one worker
+
+    python serve.py --workers 4
+    python serve.py --check        # report import/startup time and exit
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger("serve")
+
+RESPAWN_DELAY = 1.0  # seconds between respawns of crashing workers
+
+
+def default_workers() -> int:
+    return config.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app() -> Tuple[Any, float]:
+    """Import the application, returning it with the import time in seconds"""
+    started = time.perf_counter()
+    import main
+    return main.app, time.perf_counter() - started
+
+
+def run_worker(sock: socket.socket, app: Any, import_seconds: float, budget: float) -> None:
+    """Serve on the inherited socket until told to stop"""
+    booted = time.perf_counter()
+    if app is None:
+        app, import_seconds = load_app()
+
+    import uvicorn
+
+    class Server(uvicorn.Server):
+        async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+            started = time.perf_counter()
+            await super().startup(sockets=sockets)
+            now = time.perf_counter()
+            boot = now - booted
+            log = logger.warning if boot > budget else logger.info
+            log(
+                "worker %d ready in %.3fs (import %.3fs, startup %.3fs)%s",
+                os.getpid(), boot, import_seconds, now - started,
+                f", over the {budget}s budget" if boot > budget else ""
+            )
+
+    server = Server(uvicorn.Config(
+        app,
+        lifespan="on",
+        access_log=False,
+        timeout_graceful_shutdown=config.SHUTDOWN_TIMEOUT,
+        # Live-quote sockets: small frames, a short read buffer and no per-connection zlib state
+        ws_max_size=config.LIVE_QUOTE_MAX_MESSAGE_BYTES,
+        ws_max_queue=config.LIVE_QUOTE_MAX_QUEUE,
+        ws_per_message_deflate=False
+    ))
+    server.run(sockets=[sock])
+
+
+class Master:
+    """Forks, supervises and replaces workers"""
+
+    def __init__(self, sock: socket.socket, workers: int, preload: bool, budget: float):
+        self.sock = sock
+        self.size = workers
+        self.budget = budget
+        self.app: Any = None
+        self.import_seconds = 0.0
+        if preload:
+            self.app, self.import_seconds = load_app()
+            logger.info("preloaded application in %.3fs", self.import_seconds)
+        self.workers: Dict[int, int] = {}  # pid -> generation
+        self.generation = 0
+        self.signals: List[int] = []
+        self.stopping = False
+        self.last_spawn = 0.0
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # uvicorn installs its own TERM/INT handlers once it is serving
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            for signum in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+                signal.signal(signum, signal.SIG_IGN)
+            code = 0
+            try:
+                run_worker(self.sock, self.app, self.import_seconds, self.budget)
+            except BaseException:
+                logger.exception("worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = self.generation
+        self.last_spawn = time.monotonic()
+
+    def current(self) -> List[int]:
+        return [pid for pid, generation in self.workers.items() if generation == self.generation]
+
+    def kill(self, pids: List[int], signum: int = signal.SIGTERM) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            generation = self.workers.pop(pid, None)
+            if generation == self.generation and not self.stopping:
+                logger.warning("worker %d exited unexpectedly (status %d)", pid, status)
+
+    def handle(self, signum: int) -> None:
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            logger.info("shutting down %d workers", len(self.workers))
+            self.stopping = True
+            self.kill(list(self.workers))
+        elif signum == signal.SIGHUP:
+            old = self.current()
+            self.generation += 1
+            logger.info("restarting: replacing %d workers", len(old))
+            for _ in range(self.size):
+                self.spawn()
+            self.kill(old)
+        elif signum == signal.SIGTTIN:
+            self.size += 1
+        elif signum == signal.SIGTTOU and self.size > 1:
+            self.size -= 1
+            retired = self.current()[:1]
+            for pid in retired:
+                self.workers[pid] = -1
+            self.kill(retired)
+
+    def run(self) -> None:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, lambda signum, frame: self.signals.append(signum))
+
+        logger.info(
+            "listening on %s with %d workers (pid %d)",
+            self.sock.getsockname(), self.size, os.getpid()
+        )
+        for _ in range(self.size):
+            self.spawn()
+
+        deadline = None
+        while self.workers:
+            while self.signals:
+                self.handle(self.signals.pop(0))
+            self.reap()
+            if self.stopping:
+                deadline = deadline or time.monotonic() + config.SHUTDOWN_TIMEOUT + 5
+                if time.monotonic() > deadline:
+                    self.kill(list(self.workers), signal.SIGKILL)
+            elif len(self.current()) < self.size and time.monotonic() - self.last_spawn >= RESPAWN_DELAY:
+                self.spawn()
+            time.sleep(0.1)
+        self.sock.close()
+
+
+def check_startup(budget: float) -> int:
+    """Import the app and run its lifespan once, printing the timings as JSON"""
+    app, import_seconds = load_app()
+
+    async def startup() -> float:
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            return time.perf_counter() - started
+
+    startup_seconds = asyncio.run(startup())
+    total = import_seconds + startup_seconds
+    print(json.dumps({
+        "import_seconds": round(import_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "total_seconds": round(total, 3),
+        "budget_seconds": budget
+    }))
+    return 0 if total <= budget else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run 3DNavi with pre-forked workers")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=default_workers(),
+                        help="worker processes (default: SERVER_WORKERS or the CPU count)")
+    parser.add_argument("--preload", action="store_true",
+                        help="import the app once in the master before forking")
+    parser.add_argument("--startup-budget", type=float, default=config.STARTUP_BUDGET,
+                        help="warn when a worker takes longer than this to boot (seconds)")
+    parser.add_argument("--check", action="store_true",
+                        help="measure import and startup time, exit 1 if over budget")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+
+    if args.check:
+        return check_startup(args.startup_budget)
+
+    master = Master(bind(args.host, args.port), max(1, args.workers), args.preload, args.startup_budget)
+    master.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
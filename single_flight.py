@@ -0,0 +1,72 @@
+"""
+Single-flight execution: concurrent calls with the same key share one result.
+
+The first caller for a key (the leader) runs the computation; callers that
+arrive while it is in progress (followers) await the leader's future instead
+of computing again. Handlers run synchronously between awaits, so the leader
+yields to the event loop once before computing: requests that were parsed in
+the same loop iteration, as happens when a burst of identical submissions
+lands together, get the chance to join. Nothing is kept once the leader
+finishes, so this never serves a stale result.
+
+A leader that is cancelled (its client went away) does not take its
+followers down with it: they are woken to try again, and the first one
+becomes the new leader for the rest.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+_ABANDONED = object()  # result handed to followers when the leader is cancelled
+
+
+class SingleFlight:
+    """Per-event-loop registry of in-progress computations"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared); shared is True when another call computed it"""
+        loop = asyncio.get_running_loop()
+        while True:
+            call = self._calls.get(key)
+            if call is None or call.get_loop() is not loop:
+                break
+            result = await asyncio.shield(call)
+            if result is not _ABANDONED:
+                self.followers += 1
+                return result, True
+
+        call = self._calls[key] = loop.create_future()
+        self.leaders += 1
+        try:
+            await asyncio.sleep(0)
+            result = await compute()
+        except asyncio.CancelledError:
+            call.set_result(_ABANDONED)
+            raise
+        except BaseException as exc:
+            call.set_exception(exc)
+            call.exception()  # followers re-raise it; don't log it as unretrieved
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._calls),
+            "computed": self.leaders,
+            "coalesced": self.followers,
+            "coalescing_ratio": round(self.followers / total, 4) if total else 0.0
+        }
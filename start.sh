@@ -1,6 +1,34 @@
 #!/bin/bash
 
 # 3DNavi Startup Script
+#
+#   ./start.sh                  install, test, then run the development server
+#   ./start.sh --production     run pre-forked workers (serve.py); extra
+#                               arguments are passed through, e.g. --workers 4
+
+# Self-hosted, tree-shaken Three.js for the viewer (see vendor/three). Without
+# it the page falls back to the CDN scripts, so a failed build only warns.
+build_three_bundle() {
+    if [ -f "static/vendor/three.bundle.min.js" ]; then
+        return
+    fi
+    if ! command -v npm &> /dev/null; then
+        echo "⚠️  npm not found; the viewer will load Three.js from the CDN."
+        return
+    fi
+    echo "📦 Building the Three.js bundle..."
+    if ! (cd vendor/three && npm install --no-audit --no-fund && npm run build); then
+        echo "⚠️  Three.js bundle build failed; the viewer will load Three.js from the CDN."
+    fi
+}
+
+if [ "$1" = "--production" ]; then
+    shift
+    echo "🚀 Starting 3DNavi in production mode..."
+    build_three_bundle
+    exec python3 serve.py "$@"
+fi
+
 echo "🚀 Starting 3DNavi Manufacturing Platform..."
 
 # Check if Python is available
@@ -27,6 +55,8 @@ else
     echo "⚠️  requirements.txt not found. Assuming dependencies are already installed."
 fi
 
+build_three_bundle
+
 # Run tests
 echo "🧪 Running tests..."
 python -m pytest test_main.py -v
@@ -3,8 +3,10 @@ class App {
         this.form = document.getElementById('config-form');
         this.quoteResult = document.getElementById('quote-result');
         this.quoteContent = document.getElementById('quote-content');
+        this.livePrice = document.getElementById('live-price');
         
         this.setupEventHandlers();
+        this.connectLiveQuotes();
     }
     
     setupEventHandlers() {
@@ -17,6 +19,68 @@ class App {
         document.getElementById('material').addEventListener('change', (e) => {
             this.updateMaterialVisualization(e.target.value);
         });
+        
+        // Mesh downloads
+        ['download-stl', 'download-glb'].forEach(buttonId => {
+            document.getElementById(buttonId)?.addEventListener('click', (e) => {
+                this.downloadMesh(e.target.dataset.format);
+            });
+        });
+    }
+    
+    connectLiveQuotes() {
+        // Prices stream over a WebSocket as fields change; submitting still
+        // gives the full quote, so without a socket the page works as before
+        if (!this.livePrice || !('WebSocket' in window)) return;
+        
+        const scheme = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        this.liveSocket = new WebSocket(`${scheme}//${window.location.host}/ws/quotes`);
+        this.liveSeq = 0;
+        this.liveFields = {};
+        
+        this.liveSocket.addEventListener('open', () => this.sendLiveChanges());
+        this.liveSocket.addEventListener('message', (e) => this.displayLivePrice(JSON.parse(e.data)));
+        this.liveSocket.addEventListener('close', () => {
+            this.liveSocket = null;
+            this.livePrice.classList.add('hidden');
+        });
+        this.form.addEventListener('input', () => this.sendLiveChanges());
+    }
+    
+    sendLiveChanges() {
+        if (!this.liveSocket || this.liveSocket.readyState !== WebSocket.OPEN) return;
+        
+        // Only fields that differ from what the server already has
+        const changes = {};
+        new FormData(this.form).forEach((value, name) => {
+            const field = this.form.elements[name];
+            const parsed = field.type === 'number' ? (value === '' ? null : Number(value)) : value;
+            if (this.liveFields[name] !== parsed) {
+                changes[name] = parsed;
+                this.liveFields[name] = parsed;
+            }
+        });
+        if (Object.keys(changes).length === 0) return;
+        this.liveSocket.send(JSON.stringify({ seq: ++this.liveSeq, set: changes }));
+    }
+    
+    displayLivePrice(update) {
+        this.livePrice.classList.remove('hidden');
+        if (update.detail) {
+            this.livePrice.classList.add('invalid');
+            this.livePrice.textContent = 'Complete the configuration to see a price';
+            return;
+        }
+        this.livePrice.classList.remove('invalid');
+        this.livePrice.textContent = `$${update.price.toFixed(2)} · ${update.delivery}`;
+    }
+    
+    downloadMesh(format) {
+        const params = new URLSearchParams();
+        ['length', 'width', 'thickness', 'hole_diameter'].forEach(field => {
+            params.set(field, document.getElementById(field).value);
+        });
+        window.location.href = `/mesh/plate.${format}?${params}`;
     }
     
     async submitConfiguration() {
@@ -84,7 +148,7 @@ class App {
             </div>
             <div class="quote-item">
                 <span>Estimated Delivery:</span>
-                <span>${result.estimated_delivery}</span>
+                <span>${result.estimated_delivery} (${result.delivery_date})</span>
             </div>
             <div class="quote-item">
                 <span><strong>Total Price:</strong></span>
@@ -94,7 +158,7 @@ class App {
     }
     
     updateMaterialVisualization(material) {
-        if (!threeRenderer || !threeRenderer.plate) return;
+        if (!threeRenderer) return;
         
         const materialColors = {
             'aluminum': 0xc0c0c0,
@@ -104,7 +168,7 @@ class App {
         };
         
         const color = materialColors[material] || 0x888888;
-        threeRenderer.plate.material.color.setHex(color);
+        threeRenderer.setPlateColor(color);
     }
     
     capitalizeFirst(str) {
@@ -0,0 +1,161 @@
+// Builds the plate-with-hole mesh off the main thread.
+//
+// A port of mesh.build_plate / mesh.to_buffers on the server: float32
+// positions, normalized int8 normals and uint16 indices (uint32 past 65535
+// vertices). The arrays are posted back as transferables, so nothing is
+// copied. Requests that arrive while one is queued replace it; only the
+// latest dimensions are ever built.
+
+const FULL_TURN = Math.PI * 2;
+
+function rectangleRing(halfLength, halfWidth, angles) {
+    // Rays from the center at each angle, cut by the rectangle, plus its corners
+    const corners = [
+        [halfLength, -halfWidth], [-halfLength, -halfWidth],
+        [-halfLength, halfWidth], [halfLength, halfWidth]
+    ].map(([x, y]) => ((Math.atan2(y, x) % FULL_TURN) + FULL_TURN) % FULL_TURN);
+    const rounded = [...angles, ...corners]
+        .map(angle => Math.round(angle * 1e12) / 1e12)
+        .sort((a, b) => a - b);
+    const ringAngles = rounded.filter((angle, i) => i === 0 || angle !== rounded[i - 1]);
+
+    const points = ringAngles.map(angle => {
+        const cos = Math.cos(angle);
+        const sin = Math.sin(angle);
+        const scale = Math.min(halfLength / Math.abs(cos), halfWidth / Math.abs(sin));
+        return [cos * scale, sin * scale];
+    });
+    return { angles: ringAngles, points };
+}
+
+function zipper(innerAngles, outerAngles, skipInner) {
+    // Triangulate the annulus between two angle-sorted rings starting at 0,
+    // advancing whichever ring comes next by angle; indices are into
+    // [inner ring, outer ring], counter-clockwise seen from +Z
+    const n = innerAngles.length;
+    const m = outerAngles.length;
+    const events = [];
+    for (let k = 0; k < n; k++) events.push({ angle: k + 1 < n ? innerAngles[k + 1] : FULL_TURN, inner: true });
+    for (let k = 0; k < m; k++) events.push({ angle: k + 1 < m ? outerAngles[k + 1] : FULL_TURN, inner: false });
+    events.sort((a, b) => a.angle - b.angle || a.inner - b.inner);
+
+    const triangles = [];
+    let i = 0;
+    let j = 0;
+    for (const event of events) {
+        if (event.inner) {
+            if (!skipInner) triangles.push(i, n + j % m, (i + 1) % n);
+            i++;
+        } else {
+            triangles.push(i, n + j % m, n + (j + 1) % m);
+            j++;
+        }
+    }
+    return triangles;
+}
+
+function buildPlate(length, width, thickness, holeDiameter, segments) {
+    const halfLength = length / 2;
+    const halfWidth = width / 2;
+    const halfThickness = thickness / 2;
+    const radius = Math.max(0, Math.min(holeDiameter, length, width)) / 2;
+    const hasHole = radius > 0;
+
+    const innerAngles = Array.from({ length: segments }, (_, k) => k * (FULL_TURN / segments));
+    const inner = innerAngles.map(angle => [Math.cos(angle) * radius, Math.sin(angle) * radius]);
+    const outer = rectangleRing(halfLength, halfWidth, innerAngles);
+    const n = inner.length;
+    const m = outer.points.length;
+    const ring = [...inner, ...outer.points];
+    const cap = zipper(innerAngles, outer.angles, !hasHole);
+
+    const vertexCount = 2 * ring.length + 4 * m + (hasHole ? 2 * n : 0);
+    const indexCount = 2 * cap.length + 6 * m + (hasHole ? 6 * n : 0);
+    const positions = new Float32Array(vertexCount * 3);
+    const normals = new Int8Array(vertexCount * 3);
+    const IndexArray = vertexCount <= 0xFFFF ? Uint16Array : Uint32Array;
+    const indices = new IndexArray(indexCount);
+    let vertex = 0;
+    let index = 0;
+
+    const addVertex = (x, y, z, nx, ny, nz) => {
+        positions.set([x, y, z], vertex * 3);
+        normals.set([Math.round(nx * 127), Math.round(ny * 127), Math.round(nz * 127)], vertex * 3);
+        return vertex++;
+    };
+
+    // Top and bottom caps
+    let offset = vertex;
+    ring.forEach(([x, y]) => addVertex(x, y, halfThickness, 0, 0, 1));
+    cap.forEach(corner => { indices[index++] = offset + corner; });
+    offset = vertex;
+    ring.forEach(([x, y]) => addVertex(x, y, -halfThickness, 0, 0, -1));
+    for (let t = 0; t < cap.length; t += 3) {
+        indices[index++] = offset + cap[t + 2];
+        indices[index++] = offset + cap[t + 1];
+        indices[index++] = offset + cap[t];
+    }
+
+    // Outer walls, one flat-shaded quad per outline edge
+    offset = vertex;
+    for (let k = 0; k < m; k++) {
+        const [x0, y0] = outer.points[k];
+        const [x1, y1] = outer.points[(k + 1) % m];
+        const edgeLength = Math.hypot(x1 - x0, y1 - y0);
+        const nx = (y1 - y0) / edgeLength;
+        const ny = -(x1 - x0) / edgeLength;
+        addVertex(x0, y0, -halfThickness, nx, ny, 0);
+        addVertex(x1, y1, -halfThickness, nx, ny, 0);
+        addVertex(x1, y1, halfThickness, nx, ny, 0);
+        addVertex(x0, y0, halfThickness, nx, ny, 0);
+    }
+    for (const corners of [[0, 1, 2], [0, 2, 3]]) {
+        for (let k = 0; k < m; k++) {
+            corners.forEach(corner => { indices[index++] = offset + k * 4 + corner; });
+        }
+    }
+
+    // Hole wall, smooth-shaded and facing the hole axis
+    if (hasHole) {
+        const bottom = vertex;
+        const top = vertex + n;
+        for (const z of [-halfThickness, halfThickness]) {
+            inner.forEach(([x, y], k) => addVertex(x, y, z, -Math.cos(innerAngles[k]), -Math.sin(innerAngles[k]), 0));
+        }
+        for (let k = 0; k < n; k++) {
+            const next = (k + 1) % n;
+            indices.set([bottom + k, top + next, bottom + next], index);
+            index += 3;
+        }
+        for (let k = 0; k < n; k++) {
+            indices.set([bottom + k, top + k, top + (k + 1) % n], index);
+            index += 3;
+        }
+    }
+
+    return { positions, normals, indices };
+}
+
+let pending = null;
+
+function buildLatest() {
+    const { request, level, dimensions, segments } = pending;
+    pending = null;
+    try {
+        const mesh = buildPlate(
+            dimensions.length, dimensions.width, dimensions.thickness, dimensions.hole_diameter, segments
+        );
+        self.postMessage(
+            { request, level, dimensions, ...mesh },
+            [mesh.positions.buffer, mesh.normals.buffer, mesh.indices.buffer]
+        );
+    } catch (error) {
+        self.postMessage({ request, level, dimensions, error: String(error) });
+    }
+}
+
+self.onmessage = event => {
+    // Messages queued behind this one overwrite it before the build runs
+    if (pending === null) setTimeout(buildLatest, 0);
+    pending = event.data;
+};
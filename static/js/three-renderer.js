@@ -1,16 +1,55 @@
+// Level-of-detail tiers, picked by how many device pixels the plate spans
+const LOD_LEVELS = [
+    { name: 'coarse', maxPixels: 300 },
+    { name: 'medium', maxPixels: 900 },
+    { name: 'fine', maxPixels: Infinity }
+];
+
+// Hole tessellation per level; the page passes the server's MESH_LOD_SEGMENTS
+const DEFAULT_LOD_SEGMENTS = { coarse: 16, medium: 48, fine: 128 };
+
+// Shadow quality tiers: shadow map resolution and filtering
+const SHADOW_QUALITY = {
+    off: null,
+    low: { mapSize: 512, type: 'BasicShadowMap' },
+    medium: { mapSize: 1024, type: 'PCFShadowMap' },
+    high: { mapSize: 2048, type: 'PCFSoftShadowMap' }
+};
+
 class ThreeRenderer {
-    constructor(containerId) {
+    constructor(containerId, options = {}) {
         this.container = document.getElementById(containerId);
+        this.options = {
+            renderMode: this.container.dataset.renderMode || 'on-demand',
+            shadowQuality: this.container.dataset.shadowQuality || 'high',
+            geometryWorker: this.container.dataset.geometryWorker || null,
+            lodSegments: JSON.parse(this.container.dataset.lodSegments || 'null') || DEFAULT_LOD_SEGMENTS,
+            ...options
+        };
         this.scene = null;
         this.camera = null;
         this.renderer = null;
         this.controls = null;
         this.plate = null;
+        this.plateMaterial = null;
         this.wireframeMode = false;
+        this.dimensions = { length: 100, width: 50, thickness: 5, hole_diameter: 10 };
+        this.meshDimensions = null;
+        this.lodLevel = null;
+        this.pendingLodLevel = null;
+        this.meshRequest = 0;
+        this.updateFrame = null;
+        this.geometryWorker = null;
+        this.stats = { geometryBuilds: 0, geometryUpdates: 0, scaleUpdates: 0, workerMeshes: 0, staleMeshes: 0 };
+        this.directionalLight = null;
+        this.renderRequested = false;
+        this.framesRendered = 0;
         
         this.init();
-        this.createPlate();
-        this.animate();
+        this.addCoordinateSystem();
+        this.startGeometryWorker();
+        this.loadLodMesh();
+        this.requestRender();
         
         // Bind event handlers
         this.setupEventHandlers();
@@ -33,17 +72,27 @@ class ThreeRenderer {
         // Renderer
         this.renderer = new THREE.WebGLRenderer({ antialias: true });
         this.renderer.setSize(this.container.clientWidth, this.container.clientHeight);
-        this.renderer.shadowMap.enabled = true;
-        this.renderer.shadowMap.type = THREE.PCFSoftShadowMap;
         this.container.appendChild(this.renderer.domElement);
         
         // Controls
         this.controls = new THREE.OrbitControls(this.camera, this.renderer.domElement);
         this.controls.enableDamping = true;
         this.controls.dampingFactor = 0.05;
+        this.controls.addEventListener('change', () => {
+            this.onViewChange();
+            this.requestRender();
+        });
+        
+        // One material for the lifetime of the viewer
+        this.plateMaterial = new THREE.MeshLambertMaterial({
+            color: 0x888888,
+            transparent: true,
+            opacity: 0.9
+        });
         
         // Lighting
         this.setupLighting();
+        this.setShadowQuality(this.options.shadowQuality);
         
         // Handle window resize
         window.addEventListener('resize', () => this.onWindowResize());
@@ -57,10 +106,8 @@ class ThreeRenderer {
         // Directional light
         const directionalLight = new THREE.DirectionalLight(0xffffff, 0.8);
         directionalLight.position.set(100, 100, 50);
-        directionalLight.castShadow = true;
-        directionalLight.shadow.mapSize.width = 2048;
-        directionalLight.shadow.mapSize.height = 2048;
         this.scene.add(directionalLight);
+        this.directionalLight = directionalLight;
         
         // Point light for better illumination
         const pointLight = new THREE.PointLight(0xffffff, 0.5);
@@ -68,12 +115,33 @@ class ThreeRenderer {
         this.scene.add(pointLight);
     }
     
-    createPlate(length = 100, width = 50, thickness = 5, holeDiameter = 10) {
-        // Remove existing plate
-        if (this.plate) {
-            this.scene.remove(this.plate);
+    setShadowQuality(quality) {
+        const tier = SHADOW_QUALITY[quality];
+        if (tier === undefined) {
+            throw new Error(`Unknown shadow quality: ${quality}`);
+        }
+        this.options.shadowQuality = quality;
+        
+        const light = this.directionalLight;
+        this.renderer.shadowMap.enabled = tier !== null;
+        light.castShadow = tier !== null;
+        if (tier) {
+            this.renderer.shadowMap.type = THREE[tier.type];
+            light.shadow.mapSize.set(tier.mapSize, tier.mapSize);
         }
         
+        // Reallocate the shadow map at the new size and recompile shaders
+        if (light.shadow.map) {
+            light.shadow.map.dispose();
+            light.shadow.map = null;
+        }
+        if (this.plateMaterial) {
+            this.plateMaterial.needsUpdate = true;
+        }
+        this.requestRender();
+    }
+    
+    createPlate(length = 100, width = 50, thickness = 5, holeDiameter = 10) {
         // Create plate geometry with hole
         const plateShape = new THREE.Shape();
         plateShape.moveTo(-length/2, -width/2);
@@ -102,22 +170,176 @@ class ThreeRenderer {
         // Center the geometry
         geometry.translate(0, 0, -thickness/2);
         
-        // Material
-        const material = new THREE.MeshLambertMaterial({
-            color: 0x888888,
-            transparent: true,
-            opacity: 0.9
-        });
+        this.setPlateGeometry(geometry);
+    }
+    
+    chooseLodLevel() {
+        const size = Math.max(this.dimensions.length, this.dimensions.width);
+        const distance = this.camera.position.distanceTo(this.controls.target);
+        const viewHeight = 2 * distance * Math.tan(THREE.MathUtils.degToRad(this.camera.fov / 2));
+        const pixels = size / viewHeight * this.container.clientHeight * (window.devicePixelRatio || 1);
+        return LOD_LEVELS.find(level => pixels <= level.maxPixels).name;
+    }
+    
+    startGeometryWorker() {
+        // Without workers the mesh comes from /mesh/plate/lod instead
+        if (!this.options.geometryWorker || typeof Worker === 'undefined') return;
+        try {
+            this.geometryWorker = new Worker(this.options.geometryWorker);
+        } catch (error) {
+            console.error('Geometry worker unavailable:', error);
+            return;
+        }
+        this.geometryWorker.onmessage = event => this.onWorkerMesh(event.data);
+        this.geometryWorker.onerror = event => {
+            console.error('Geometry worker failed:', event.message);
+            this.geometryWorker.terminate();
+            this.geometryWorker = null;
+            this.loadLodMesh();
+        };
+    }
+    
+    loadLodMesh() {
+        const level = this.chooseLodLevel();
+        const request = ++this.meshRequest;
+        this.pendingLodLevel = level;
+        
+        const dimensions = { ...this.dimensions };
         
-        // Create mesh
-        this.plate = new THREE.Mesh(geometry, material);
+        if (this.geometryWorker) {
+            const segments = this.options.lodSegments[level];
+            this.geometryWorker.postMessage({ request, level, dimensions, segments });
+            return;
+        }
+        this.fetchLodMesh(request, level, dimensions);
+    }
+    
+    onWorkerMesh({ request, level, dimensions, error, ...buffers }) {
+        // Drop results superseded by a newer request; their buffers are simply released
+        if (request !== this.meshRequest) {
+            this.stats.staleMeshes++;
+            return;
+        }
+        if (error) {
+            console.error('Geometry worker error, fetching the mesh instead:', error);
+            this.fetchLodMesh(request, level, dimensions);
+            return;
+        }
+        this.pendingLodLevel = null;
+        this.lodLevel = level;
+        this.meshDimensions = dimensions;
+        this.stats.workerMeshes++;
+        this.applyMeshBuffers(buffers);
+    }
+    
+    async fetchLodMesh(request, level, dimensions) {
+        try {
+            const params = new URLSearchParams({ level, ...dimensions });
+            const response = await fetch(`/mesh/plate/lod?${params}`);
+            if (!response.ok) {
+                throw new Error(`Mesh request failed with status ${response.status}`);
+            }
+            const buffer = await response.arrayBuffer();
+            
+            // Drop responses superseded by a newer request
+            if (request !== this.meshRequest) return;
+            this.lodLevel = level;
+            this.meshDimensions = dimensions;
+            this.applyMeshBuffers(ThreeRenderer.parseMeshBuffers(buffer));
+        } catch (error) {
+            if (request !== this.meshRequest) return;
+            console.error('Falling back to local geometry:', error);
+            this.meshDimensions = dimensions;
+            this.createPlate(dimensions.length, dimensions.width, dimensions.thickness, dimensions.hole_diameter);
+        } finally {
+            if (request === this.meshRequest) {
+                this.pendingLodLevel = null;
+            }
+        }
+    }
+    
+    static parseMeshBuffers(buffer) {
+        // Layout written by mesh.to_buffers on the server
+        const [vertexCount, indexCount, indexSize] = new Uint32Array(buffer, 0, 4);
+        let offset = 16;
+        const positions = new Float32Array(buffer, offset, vertexCount * 3);
+        offset += vertexCount * 12;
+        const normals = new Int8Array(buffer, offset, vertexCount * 3);
+        offset += Math.ceil(vertexCount * 3 / 4) * 4;
+        const IndexArray = indexSize === 2 ? Uint16Array : Uint32Array;
+        const indices = new IndexArray(buffer, offset, indexCount);
+        return { positions, normals, indices };
+    }
+    
+    applyMeshBuffers({ positions, normals, indices }) {
+        const geometry = this.plate?.geometry;
+        const position = geometry?.getAttribute('position');
+        const normal = geometry?.getAttribute('normal');
+        const index = geometry?.index;
+        
+        // Same topology: swap the arrays in place so the GPU buffers are reused
+        // (re-uploaded with bufferSubData) and nothing is copied on this thread
+        if (position && normal && index &&
+            position.array.length === positions.length &&
+            normal.array.constructor === normals.constructor &&
+            index.array.constructor === indices.constructor &&
+            index.array.length === indices.length) {
+            position.array = positions;
+            normal.array = normals;
+            index.array = indices;
+            position.needsUpdate = true;
+            normal.needsUpdate = true;
+            index.needsUpdate = true;
+            geometry.computeBoundingSphere();
+            this.plate.scale.set(1, 1, 1);
+            this.stats.geometryUpdates++;
+            this.requestRender();
+            return;
+        }
+        
+        const replacement = new THREE.BufferGeometry();
+        replacement.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+        replacement.setAttribute('normal', new THREE.BufferAttribute(normals, 3, true));
+        replacement.setIndex(new THREE.BufferAttribute(indices, 1));
+        replacement.computeBoundingSphere();
+        this.setPlateGeometry(replacement);
+    }
+    
+    setPlateGeometry(geometry) {
+        this.stats.geometryBuilds++;
+        this.requestRender();
+        
+        if (this.plate) {
+            const previous = this.plate.geometry;
+            this.plate.geometry = geometry;
+            this.plate.scale.set(1, 1, 1);
+            previous.dispose();
+            return;
+        }
+        
+        this.plate = new THREE.Mesh(geometry, this.plateMaterial);
         this.plate.castShadow = true;
         this.plate.receiveShadow = true;
-        
         this.scene.add(this.plate);
-        
-        // Add coordinate system helper
-        this.addCoordinateSystem();
+    }
+    
+    static scaleBetween(from, to) {
+        // Scale factors that turn geometry built for `from` into `to`, or null
+        // when the change alters the plate's proportions in the XY plane
+        const xy = to.length / from.length;
+        const close = (a, b) => Math.abs(a - b) <= 1e-9 * Math.max(1, Math.abs(b));
+        if (!close(to.width, from.width * xy) || !close(to.hole_diameter, from.hole_diameter * xy)) {
+            return null;
+        }
+        return { xy, z: to.thickness / from.thickness };
+    }
+    
+    onViewChange() {
+        const level = this.chooseLodLevel();
+        const current = this.pendingLodLevel || this.lodLevel;
+        if (current && level !== current) {
+            this.loadLodMesh();
+        }
     }
     
     addCoordinateSystem() {
@@ -133,15 +355,45 @@ class ThreeRenderer {
     }
     
     updatePlate(dimensions) {
-        const { length, width, thickness, hole_diameter } = dimensions;
-        this.createPlate(length, width, thickness, hole_diameter);
+        this.dimensions = dimensions;
+        
+        // A newer request must supersede the one in flight
+        if (!this.plate || !this.meshDimensions || this.pendingLodLevel) {
+            this.loadLodMesh();
+            return;
+        }
+        
+        // Thickness changes and uniform resizes are exact as a transform
+        const scale = ThreeRenderer.scaleBetween(this.meshDimensions, dimensions);
+        if (scale) {
+            this.plate.scale.set(scale.xy, scale.xy, scale.z);
+            this.stats.scaleUpdates++;
+            this.requestRender();
+            this.onViewChange();
+            return;
+        }
+        
+        this.loadLodMesh();
+    }
+    
+    scheduleUpdate() {
+        // Coalesce bursts of input events into one update per frame
+        if (this.updateFrame !== null) return;
+        this.updateFrame = requestAnimationFrame(() => {
+            this.updateFrame = null;
+            this.updateFromForm();
+        });
     }
     
     toggleWireframe() {
         this.wireframeMode = !this.wireframeMode;
-        if (this.plate) {
-            this.plate.material.wireframe = this.wireframeMode;
-        }
+        this.plateMaterial.wireframe = this.wireframeMode;
+        this.requestRender();
+    }
+    
+    setPlateColor(color) {
+        this.plateMaterial.color.setHex(color);
+        this.requestRender();
     }
     
     resetView() {
@@ -166,7 +418,7 @@ class ThreeRenderer {
             const input = document.getElementById(inputId);
             if (input) {
                 input.addEventListener('input', () => {
-                    this.updateFromForm();
+                    this.scheduleUpdate();
                 });
             }
         });
@@ -187,18 +439,46 @@ class ThreeRenderer {
         this.camera.aspect = this.container.clientWidth / this.container.clientHeight;
         this.camera.updateProjectionMatrix();
         this.renderer.setSize(this.container.clientWidth, this.container.clientHeight);
+        this.requestRender();
     }
     
-    animate() {
-        requestAnimationFrame(() => this.animate());
+    requestRender() {
+        // Schedule at most one frame; nothing is drawn while the scene is idle
+        if (this.renderRequested) return;
+        this.renderRequested = true;
+        requestAnimationFrame(() => this.renderFrame());
+    }
+    
+    renderFrame() {
+        this.renderRequested = false;
         
+        // While damping settles, update() moves the camera and emits 'change',
+        // which schedules the next frame; once it settles the loop stops
         this.controls.update();
         this.renderer.render(this.scene, this.camera);
+        this.framesRendered++;
+        
+        if (this.options.renderMode === 'continuous') {
+            this.requestRender();
+        }
     }
 }
 
 // Initialize the renderer when the page loads
 let threeRenderer;
-document.addEventListener('DOMContentLoaded', () => {
+
+function initViewer() {
+    const container = document.getElementById('three-container');
+    if (typeof THREE === 'undefined' || !THREE.OrbitControls) {
+        // Three.js failed to load; the form keeps working without a preview
+        container.classList.add('viewer-unavailable');
+        container.textContent = '3D preview unavailable';
+        return;
+    }
     threeRenderer = new ThreeRenderer('three-container');
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    // Let the form paint first, then create the WebGL context and first mesh
+    requestAnimationFrame(() => setTimeout(initViewer, 0));
 });
\ No newline at end of file
@@ -1,9 +1,55 @@
+import asyncio
+import datetime
+import json
+import re
+import math
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+import msgpack
+import numpy as np
 import pytest
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
 from main import app
+from benchmarks import loadtest
+import admission
+import assets
+import config
+import geometry
+import mesh
+import nesting
+import metrics
+import pricing
+import pricing_tables
+import profiler
+import quote_api
+import quote_cache
+import quote_cli
+import quote_store
+import quote_stream
+import scheduler
+import serve
+import single_flight
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def isolated_quote_store(tmp_path, monkeypatch):
+    """Keep quotes, bookings, meshes and built assets written during tests out of the working directory"""
+    monkeypatch.setattr(mesh, "cache", mesh.MeshCache(str(tmp_path / "meshes")))
+    monkeypatch.setattr(assets, "bundle", assets.AssetBundle(out_dir=str(tmp_path / "assets")))
+    store = quote_store.QuoteStore(str(tmp_path / "quotes.db"))
+    monkeypatch.setattr(quote_store, "store", store)
+    monkeypatch.setattr(scheduler, "schedule", scheduler.Schedule(path=str(tmp_path / "schedule.db")))
+    return store
+
 def test_home_page():
     """Test that the home page loads correctly"""
     response = client.get("/")
@@ -197,6 +243,10 @@ def test_static_files_accessible():
     
     response = client.get("/static/js/three-renderer.js")
     assert response.status_code == 200
+    
+    # Viewer performance page
+    response = client.get("/static/perf/viewer.html")
+    assert response.status_code == 200
 
 def test_price_precision():
     """Test that prices are properly rounded to 2 decimal places"""
@@ -219,5 +269,1284 @@ def test_price_precision():
     # Check that price has at most 2 decimal places
     assert len(str(price).split('.')[-1]) <= 2
 
+def test_configure_batch_matches_single_quotes():
+    """Test that batch quotes price exactly like /configure"""
+    parts = [
+        {
+            "material": material,
+            "surface_treatment": treatment,
+            "length": 33.33,
+            "width": 25.0,
+            "thickness": 2.5,
+            "hole_diameter": 5.0,
+            "quantity": 3
+        }
+        for material in ["aluminum", "Titanium", "unobtainium"]
+        for treatment in ["none", "machining"]
+    ]
+
+    response = client.post("/configure/batch", json=parts)
+    assert response.status_code == 200
+
+    result = response.json()
+    assert result["status"] == "success"
+    assert result["count"] == len(parts)
+
+    for part, price in zip(parts, result["estimated_prices"]):
+        single = client.post("/configure", data=part).json()
+        assert price == single["estimated_price"]
+
+def test_configure_batch_ndjson():
+    """Test batch quoting with an NDJSON body"""
+    lines = [
+        '{"material": "steel", "surface_treatment": "none", "length": 10, "width": 10, "thickness": 1, "hole_diameter": 2, "quantity": 1}',
+        "",
+        '{"material": "steel", "surface_treatment": "none", "length": 10, "width": 10, "thickness": 1, "hole_diameter": 2, "quantity": 2}'
+    ]
+
+    response = client.post(
+        "/configure/batch",
+        content="\n".join(lines),
+        headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+
+    prices = response.json()["estimated_prices"]
+    assert len(prices) == 2
+    assert prices[1] == pytest.approx(2 * prices[0], abs=0.01)
+
+def test_configure_batch_invalid_rows():
+    """Test that malformed batch rows are rejected with their index"""
+    response = client.post("/configure/batch", json=[{"material": "steel"}])
+    assert response.status_code == 422
+    assert "row 0" in response.json()["detail"]
+
+    response = client.post("/configure/batch", content="not json")
+    assert response.status_code == 422
+
+def test_configure_stream_csv():
+    """Test streaming quotes for a CSV upload, including a bad row"""
+    csv_body = (
+        "material,surface_treatment,length,width,thickness,hole_diameter,quantity\n"
+        "aluminum,anodizing,100,50,5,10,1\n"
+        "steel,none,abc,50,5,10,1\n"
+        "plastic,none,10,10,1,2,4\n"
+    )
+
+    response = client.post(
+        "/configure/stream?chunk_size=2",
+        content=csv_body,
+        headers={"content-type": "text/csv"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["row"] for record in records] == [0, 1, 2]
+    assert [record["status"] for record in records] == ["success", "error", "success"]
+
+    single = client.post("/configure", data={
+        "material": "aluminum",
+        "surface_treatment": "anodizing",
+        "length": 100.0,
+        "width": 50.0,
+        "thickness": 5.0,
+        "hole_diameter": 10.0,
+        "quantity": 1
+    }).json()
+    assert records[0]["estimated_price"] == single["estimated_price"]
+    assert records[0]["configuration"] == single["configuration"]
+
+def test_configure_stream_csv_quoted_fields(monkeypatch):
+    """Test that quoted CSV fields may hold commas and newlines, and big chunks leave the event loop"""
+    csv_body = (
+        "material,surface_treatment,length,width,thickness,hole_diameter,quantity,notes\r\n"
+        'steel,none,10,10,1,2,1,"deburr, then\r\nbag ""each"" part"\r\n'
+        "\r\n"
+        'aluminum,anodizing,100,50,5,10,2,"one line"\r\n'
+    )
+    on_event_loop = []
+    quote_chunk = quote_stream.quote_chunk
+
+    def recording_quote_chunk(rows, first_row=0):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return quote_chunk(rows, first_row)
+
+    monkeypatch.setattr(quote_stream, "quote_chunk", recording_quote_chunk)
+    monkeypatch.setattr(config, "STREAM_THREADPOOL_ROWS", 2)
+    response = client.post("/configure/stream?chunk_size=2", content=csv_body, headers={"content-type": "text/csv"})
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [(record["row"], record["status"]) for record in records] == [(0, "success"), (1, "success")]
+    assert records[1]["configuration"]["quantity"] == 2
+    assert on_event_loop == [False]
+
+    rows = []
+
+    async def collect():
+        async def body():
+            for piece in ('material,notes\nsteel,"a\n', 'b"\nplastic,"open'):
+                yield piece.encode()
+        async for row in quote_stream.aiter_rows(body(), "csv"):
+            rows.append(row)
+
+    asyncio.run(collect())
+    assert rows == [{"material": "steel", "notes": "a\nb"}, {"material": "plastic", "notes": "open\n"}]
+
+    # Only a quote at the start of a field opens a quoted field, as in csv
+    feed = quote_stream.LineFeed()
+    assert feed.push('steel,5" bar,1')
+    assert feed.push('steel,"say ""hi""",1')
+    assert not feed.push('x",1,"open')
+    assert feed.push('end"')
+
+def test_quote_cli_ndjson(tmp_path):
+    """Test the streaming CLI on an NDJSON file"""
+    source = tmp_path / "rfq.ndjson"
+    source.write_text(
+        '{"material": "steel", "surface_treatment": "none", "length": 10, "width": 10, "thickness": 1, "hole_diameter": 2, "quantity": 1}\n'
+        'not json\n'
+    )
+    target = tmp_path / "quotes.ndjson"
+
+    assert quote_cli.main([str(source), "-o", str(target), "--chunk-size", "1"]) == 0
+
+    records = [json.loads(line) for line in target.read_text().splitlines()]
+    assert records[0]["status"] == "success"
+    assert records[1] == {"row": 1, "status": "error", "detail": records[1]["detail"]}
+    assert "malformed JSON" in records[1]["detail"]
+
+def test_quote_cache_lru_and_ttl():
+    """Test LRU and TTL eviction in the quote cache"""
+    now = [0.0]
+    cache = quote_cache.QuoteCache(maxsize=2, ttl=10, clock=lambda: now[0])
+
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert cache.get_or_compute("b", lambda: 2) == 2
+    assert cache.get_or_compute("a", lambda: 99) == 1
+    assert cache.get_or_compute("c", lambda: 3) == 3  # evicts "b"
+    assert cache.get_or_compute("b", lambda: 20) == 20
+
+    now[0] = 11.0
+    assert cache.get_or_compute("b", lambda: 200) == 200
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 5
+    assert stats["evictions"] == 2
+
+def test_quote_cache_canonical_key():
+    """Test that equivalent configurations share a cache key"""
+    part = {
+        "material": "Steel",
+        "surface_treatment": "NONE",
+        "length": 100.0,
+        "width": 50.00000001,
+        "thickness": 5,
+        "hole_diameter": 10.0,
+        "quantity": 2
+    }
+    other = dict(part, material="steel", surface_treatment="none", width=50.0, thickness=5.0)
+    assert quote_cache.canonical_key(part) == quote_cache.canonical_key(other)
+    # Off the step grid, parts keep their exact dimensions
+    assert quote_cache.part_key(other) == quote_cache.canonical_key(other)
+    assert quote_cache.part_key(part) != quote_cache.part_key(other)
+    assert quote_cache.production_key(other) == quote_cache.production_key(dict(other, surface_treatment="anodizing"))
+
+def test_configure_uses_quote_cache():
+    """Test that /configure caches geometry and nesting but prices against the live tables"""
+    form_data = {
+        "material": "steel",
+        "surface_treatment": "anodizing",
+        "length": 71.3,
+        "width": 22.1,
+        "thickness": 3.0,
+        "hole_diameter": 4.0,
+        "quantity": 7
+    }
+    first = client.post("/configure", data=form_data).json()
+    hits = client.get("/cache/stats").json()["hits"]
+
+    second = client.post("/configure", data=dict(form_data, material="STEEL")).json()
+    assert second["estimated_price"] == first["estimated_price"]
+    assert client.get("/cache/stats").json()["hits"] == hits + 1
+
+    pricing_tables.publish({"material_multipliers": dict(config.MATERIAL_MULTIPLIERS, steel=2.4)})
+    try:
+        repriced = client.post("/configure", data=form_data).json()
+    finally:
+        pricing_tables.reload()
+    assert repriced["estimated_price"] == pytest.approx(2 * first["estimated_price"], abs=0.01)
+    assert repriced["pricing_version"] != first["pricing_version"]
+    # Geometry and nesting do not depend on the tables, so they stay cached
+    assert client.get("/cache/stats").json()["hits"] == hits + 2
+    assert repriced["nesting"] == first["nesting"]
+
+    # Nor on the surface treatment, so other finishes of the same part share the entry
+    client.post("/configure", data=dict(form_data, surface_treatment="powder_coating"))
+    assert client.get("/cache/stats").json()["hits"] == hits + 3
+
+def test_quote_cache_price_with_scrap_charge():
+    """Test that pricing from the cached scrap volume matches pricing from scratch"""
+    part = {
+        "material": "titanium",
+        "surface_treatment": "machining",
+        "length": 120.0,
+        "width": 80.0,
+        "thickness": 6.0,
+        "hole_diameter": 12.0,
+        "quantity": 9
+    }
+    tables = pricing_tables.publish({"scrap_charge": 0.5})
+    try:
+        expected = pricing.calculate_price(*(part[field] for field in pricing.PART_FIELDS), tables)
+        assert quote_cache.price(part, tables) == pytest.approx(expected)
+        assert quote_cache.price(part, tables) == pytest.approx(expected)  # from the cached nesting
+        exact = dict(part, length=120.04)
+        expected = pricing.calculate_price(*(exact[field] for field in pricing.PART_FIELDS), tables)
+        assert quote_cache.price(exact, tables) == pytest.approx(expected)
+    finally:
+        pricing_tables.reload()
+
+def test_pricing_tables_watcher(tmp_path):
+    """Test hot reload of the pricing tables file into versioned snapshots"""
+    path = tmp_path / "pricing_tables.json"
+    path.write_text(json.dumps({"base_price": 0.002}))
+    watcher = pricing_tables.TableWatcher(str(path))
+
+    try:
+        assert watcher.check()
+        tables = pricing_tables.current()
+        assert tables.base_price == 0.002
+        assert tables.material_multipliers == config.MATERIAL_MULTIPLIERS
+
+        # An invalid file keeps the last good snapshot
+        path.write_text(json.dumps({"base_price": -1, "padding": "changes the size"}))
+        assert not watcher.check()
+        assert pricing_tables.current() is tables
+
+        result = client.post("/configure", data={
+            "material": "aluminum",
+            "surface_treatment": "none",
+            "length": 10.0,
+            "width": 10.0,
+            "thickness": 1.0,
+            "hole_diameter": 2.0,
+            "quantity": 1
+        }).json()
+        assert result["pricing_version"] == tables.version
+        assert result["estimated_price"] == round(0.002 * (100 - math.pi), 2)
+    finally:
+        pricing_tables.reload()
+
+def test_pricing_tables_version_is_content_hash():
+    """Test that the tables version depends only on their validated contents"""
+    default = pricing_tables.current().version
+    try:
+        assert pricing_tables.publish({}, source="other.json").version == default
+        assert pricing_tables.publish({"base_price": config.BASE_PRICE}).version == default
+        changed = pricing_tables.publish({"material_multipliers": dict(config.MATERIAL_MULTIPLIERS, steel=2.4)})
+        assert changed.version != default
+        assert re.fullmatch(r"[0-9a-f]{12}", changed.version)
+    finally:
+        assert pricing_tables.reload().version == default
+
+def test_configure_part_geometry():
+    """Test that quotes price the net volume and report mass and machining time"""
+    form_data = {
+        "material": "steel",
+        "surface_treatment": "none",
+        "length": 100.0,
+        "width": 50.0,
+        "thickness": 5.0,
+        "hole_diameter": 20.0,
+        "quantity": 2
+    }
+    result = client.post("/configure", data=form_data).json()
+
+    net_volume = (100 * 50 - math.pi * 10 ** 2) * 5
+    figures = result["geometry"]
+    assert figures["net_volume"] == pytest.approx(net_volume, abs=1e-3)
+    assert figures["mass"] == pytest.approx(net_volume * 7.85 / 1000, abs=1e-3)
+    assert figures["cut_length"] == pytest.approx(300 + math.pi * 20, abs=1e-3)
+    assert figures["machining_time"] > 0
+    assert result["estimated_price"] == round(
+        config.BASE_PRICE * config.MATERIAL_MULTIPLIERS["steel"] * net_volume * 2, 2
+    )
+
+    # A bigger hole removes more material and lowers the price
+    bigger_hole = client.post("/configure", data=dict(form_data, hole_diameter=40.0)).json()
+    assert bigger_hole["estimated_price"] < result["estimated_price"]
+
+def test_batch_geometry_matches_scalar():
+    """Test the vectorized geometry against the scalar functions"""
+    rows = [
+        ("titanium", 25.0, 15.0, 12.0, 2.0),
+        ("plastic", 10.0, 10.0, 1.0, 50.0),
+        ("unknown", 0.1, 0.1, 0.1, 0.05)
+    ]
+    batch = geometry.batch_geometry(*zip(*rows))
+
+    for index, row in enumerate(rows):
+        single = geometry.part_geometry(*row)
+        for field, value in single.items():
+            assert round(batch[field][index], 3) == value
+
+def test_plate_mesh_is_closed_with_net_volume():
+    """Test that the generated mesh encloses exactly the plate minus the hole polygon"""
+    segments = 32
+    plate = mesh.build_plate(100.0, 50.0, 5.0, 10.0, segments=segments)
+    triangles = plate.positions[plate.indices].astype(float)
+
+    volume = np.einsum("ij,ij->i", triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])).sum() / 6
+    hole_area = 0.5 * segments * 5.0 ** 2 * math.sin(2 * math.pi / segments)
+    assert volume == pytest.approx((100 * 50 - hole_area) * 5, rel=1e-5)
+
+def test_download_plate_mesh():
+    """Test STL/glTF export and the content-addressed mesh cache"""
+    query = "length=80&width=40&thickness=4&hole_diameter=6&segments=16"
+
+    response = client.get(f"/mesh/plate.stl?{query}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "model/stl"
+    assert "attachment" in response.headers["content-disposition"]
+    triangle_count = int.from_bytes(response.content[80:84], "little")
+    assert len(response.content) == 84 + 50 * triangle_count
+
+    again = client.get(f"/mesh/plate.stl?{query}")
+    assert again.content == response.content
+    assert mesh.cache.misses == 1 and mesh.cache.hits == 1
+
+    not_modified = client.get(f"/mesh/plate.stl?{query}", headers={"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    weak_list = f'"stale", W/{response.headers["etag"]}'
+    assert client.get(f"/mesh/plate.stl?{query}", headers={"If-None-Match": weak_list}).status_code == 304
+
+    glb = client.get(f"/mesh/plate.glb?{query}")
+    assert glb.status_code == 200
+    assert glb.content[:4] == b"glTF"
+    assert int.from_bytes(glb.content[8:12], "little") == len(glb.content)
+
+    assert client.get("/mesh/plate.obj").status_code == 404
+    assert client.get("/mesh/plate.stl?segments=2").status_code == 422
+
+def test_mesh_cache_quantizes_and_evicts(tmp_path):
+    """Test that nearby dimensions share a cached mesh and the cache directory stays under its cap"""
+    cache = mesh.MeshCache(str(tmp_path / "meshes"), max_bytes=1)
+    params = {"length": 80.0, "width": 40.0, "thickness": 4.0, "hole_diameter": 6.0, "segments": 16}
+    key, path = cache.get(params, "stl")
+    assert cache.get(dict(params, length=80.03), "stl") == (key, path)
+    assert cache.misses == 1 and cache.hits == 1
+
+    size = os.path.getsize(path)
+    cache.max_bytes = 2 * size
+    for length in (90.0, 100.0, 110.0):
+        _, newest = cache.get(dict(params, length=length), "stl")
+    assert os.path.exists(newest) and not os.path.exists(path)
+    assert cache.evictions >= 2
+    on_disk = sum(entry.stat().st_size for shard in os.scandir(cache.directory) for entry in os.scandir(shard.path))
+    assert on_disk <= cache.max_bytes
+
+def test_plate_mesh_lod_buffers():
+    """Test the level-of-detail typed-array mesh layout"""
+
+    sizes = {}
+    for level in config.MESH_LOD_SEGMENTS:
+        response = client.get(f"/mesh/plate/lod?level={level}")
+        assert response.status_code == 200
+        assert response.headers["x-mesh-level"] == level
+
+        body = response.content
+        vertex_count, index_count, index_size, _ = (int(value) for value in np.frombuffer(body[:16], dtype="<u4"))
+        normals_offset = 16 + 12 * vertex_count
+        indices_offset = normals_offset + math.ceil(3 * vertex_count / 4) * 4
+        assert len(body) == indices_offset + index_count * index_size
+
+        positions = np.frombuffer(body, dtype="<f4", count=3 * vertex_count, offset=16)
+        assert positions.max() == pytest.approx(50.0)
+        indices = np.frombuffer(body, dtype=f"<u{index_size}", count=index_count, offset=indices_offset)
+        assert indices.max() < vertex_count
+        sizes[level] = len(body)
+
+    assert sizes["coarse"] < sizes["medium"] < sizes["fine"]
+    assert client.get("/mesh/plate/lod?level=ultra").status_code == 422
+
+def test_quote_persistence(isolated_quote_store):
+    """Test that quotes get an ID, are committed in batches and can be fetched"""
+    form_data = {
+        "material": "titanium",
+        "surface_treatment": "machining",
+        "length": 75.0,
+        "width": 75.0,
+        "thickness": 3.0,
+        "hole_diameter": 8.0,
+        "quantity": 2
+    }
+
+    with TestClient(app) as lifespan_client:
+        quotes = [lifespan_client.post("/configure", data=form_data).json() for _ in range(5)]
+        fetched = lifespan_client.get(f"/quotes/{quotes[0]['quote_id']}")
+        assert fetched.status_code == 200
+        assert fetched.json() == quotes[0]
+
+    # Shutdown flushes the write-behind queue
+    assert isolated_quote_store.written == 5
+    assert len({quote["quote_id"] for quote in quotes}) == 5
+
+    stored = client.get(f"/quotes/{quotes[-1]['quote_id']}")
+    assert stored.status_code == 200
+    assert stored.json() == quotes[-1]
+
+    assert client.get("/quotes/does-not-exist").status_code == 404
+
+def test_quote_store_retries_failed_writes(isolated_quote_store, monkeypatch):
+    """Test that a failed commit is retried by the writer instead of dropping the batch"""
+    monkeypatch.setattr(config, "QUOTE_STORE_RETRY_DELAY", 0.01)
+    store = isolated_quote_store
+    commit = store._commit
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_commit(batch):
+        if failures:
+            raise failures.pop()
+        commit(batch)
+
+    monkeypatch.setattr(store, "_commit", flaky_commit)
+
+    async def scenario():
+        store.start()
+        await store.save("q1", {"price": 1})
+        await asyncio.sleep(0)
+        # Still readable while the write is being retried
+        assert await store.get("q1") == {"price": 1}
+        await asyncio.wait_for(store._queue.join(), 5)
+        assert store._running()
+        await store.save("q2", {"price": 2})
+        await store.close()
+
+    asyncio.run(scenario())
+    assert store.stats() == {"queued": 0, "batches": 2, "written": 2, "failures": 1}
+    assert asyncio.run(store.get("q1")) == {"price": 1}
+
+def test_metrics_endpoint():
+    """Test per-route latency histograms, quote counters and /configure phase timings"""
+    form_data = {
+        "material": "Steel",
+        "surface_treatment": "powder_coating",
+        "length": 40.0,
+        "width": 40.0,
+        "thickness": 2.0,
+        "hole_diameter": 4.0,
+        "quantity": 3
+    }
+    before = metrics.quotes.values.get(("steel", "powder_coating"), 0)
+    client.post("/configure", data=form_data)
+    client.post("/configure", data=dict(form_data, material="unobtainium"))
+    client.get(f"/quotes/{'0' * 32}")
+    client.get("/static/css/style.css")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+
+    assert metrics.quotes.values[("steel", "powder_coating")] == before + 1
+    assert 'threednavi_quotes_total{material="other",surface_treatment="powder_coating"}' in body
+    # Routes are labelled by template, not by raw path
+    assert 'route="/quotes/{quote_id}",status="404"' in body
+    assert 'route="/static",status="200"' in body
+    assert 'threednavi_request_duration_seconds_bucket{method="POST",route="/configure",status="200",le="+Inf"}' in body
+    for phase in ("queue", "parse", "pricing", "serialization", "persist"):
+        assert f'threednavi_configure_phase_seconds_count{{phase="{phase}"}}' in body
+    assert 'threednavi_admission_wait_seconds_count{class="quotes"}' in body
+    assert 'threednavi_requests_in_flight{method="POST"} 0' in body
+
+def test_quote_metrics_follow_pricing_tables():
+    """Test that quote labels accept materials the live pricing tables add"""
+    materials = dict(config.MATERIAL_MULTIPLIERS, brass=2.0)
+    materials.pop("plastic")
+    pricing_tables.publish({"material_multipliers": materials})
+    try:
+        before = metrics.quotes.values.get(("brass", "none"), 0)
+        metrics.count_quote("Brass", "none")
+        assert metrics.quotes.values[("brass", "none")] == before + 1
+
+        before = metrics.quotes.values.get(("other", "none"), 0)
+        metrics.count_quote("plastic", "none")
+        assert metrics.quotes.values[("other", "none")] == before + 1
+    finally:
+        pricing_tables.reload()
+
+def test_metrics_histogram_buckets():
+    """Test that histogram buckets are cumulative with inclusive upper bounds"""
+    histogram = metrics.Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "/x")
+    samples = list(histogram.samples())
+    assert samples == [
+        'test_seconds_bucket{route="/x",le="0.1"} 2',
+        'test_seconds_bucket{route="/x",le="1.0"} 3',
+        'test_seconds_bucket{route="/x",le="+Inf"} 4',
+        'test_seconds_sum{route="/x"} 2.65',
+        'test_seconds_count{route="/x"} 4'
+    ]
+
+def _busy_pricing_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pricing.calculate_price("steel", "anodizing", 100.0, 50.0, 5.0, 10.0, 1)
+
+def test_sampling_profiler(tmp_path):
+    """Test that sampled requests produce an aggregated folded-stack profile"""
+    sampler = profiler.SamplingProfiler(interval=0.001, sample_rate=1.0, output_dir=str(tmp_path))
+    assert not sampler.enter()  # nothing is sampled outside a capture
+
+    sampler.start(duration=30)
+    assert sampler.enter()
+    _busy_pricing_loop(0.1)
+    sampler.exit()
+    path = sampler.stop()
+
+    assert not sampler.running
+    assert path is not None and path.endswith(".folded")
+    with open(path) as profile:
+        lines = profile.read().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("test_main.py:_busy_pricing_loop" in line for line in lines)
+
+def test_open_ended_profile_is_flushed_periodically(tmp_path):
+    """Test that a capture without a duration writes a new file every flush interval"""
+    sampler = profiler.SamplingProfiler(
+        interval=0.001, sample_rate=1.0, output_dir=str(tmp_path), flush_interval=0.05
+    )
+    sampler.start()
+    assert sampler.enter()
+    _busy_pricing_loop(0.3)
+    flushed = sorted(tmp_path.glob("profile-*.folded"))
+    assert sampler.running and len(flushed) >= 2
+    assert all(re.search(r"-\d{4}\.folded$", path.name) for path in flushed)
+    assert any("test_main.py:_busy_pricing_loop" in path.read_text() for path in flushed)
+
+    sampler.exit()
+    last = sampler.stop()
+    assert len(list(tmp_path.glob("profile-*.folded"))) >= len(flushed)
+    assert last is not None and last.endswith(".folded")
+
+def test_profile_admin_endpoints(tmp_path, monkeypatch):
+    """Test admin token gating and a capture started and stopped over HTTP"""
+    sampler = profiler.SamplingProfiler(interval=0.001, sample_rate=1.0, output_dir=str(tmp_path))
+    monkeypatch.setattr(profiler, "profiler", sampler)
+
+    monkeypatch.setattr(config, "ADMIN_TOKEN", None)
+    assert client.post("/admin/profile/start").status_code == 404
+
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/profile/start", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    assert client.post("/admin/profile/start?duration=0", headers=headers).status_code == 422
+    started = client.post("/admin/profile/start?duration=60", headers=headers)
+    assert started.status_code == 200
+    assert started.json()["running"] is True
+    assert client.post("/admin/profile/start", headers=headers).status_code == 409
+
+    client.get("/health")
+    stopped = client.post("/admin/profile/stop", headers=headers).json()
+    assert stopped["running"] is False
+    assert stopped["requests_sampled"] >= 1
+    assert client.get("/admin/profile", headers=headers).json()["running"] is False
+
+def test_startup_check(capsys):
+    """Test that the production launcher reports import and startup time against a budget"""
+    assert serve.default_workers() >= 1
+    assert serve.check_startup(budget=60.0) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["total_seconds"] == pytest.approx(report["import_seconds"] + report["startup_seconds"], abs=0.002)
+    assert serve.check_startup(budget=0.0) == 1
+
+def test_main_imports_without_numpy():
+    """Test that importing the app leaves numpy and the pricing stack to the routes"""
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print(sorted(set(sys.modules) & {'numpy', 'pricing', 'mesh', 'nesting', 'scheduler', 'live_quotes'}))"],
+        capture_output=True, text=True, check=True
+    )
+    assert loaded.stdout.strip() == "[]"
+
+def test_prerendered_page_and_fingerprinted_assets():
+    """Test precompressed, cache-busted assets and ETag revalidation of the page"""
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert page.status_code == 200
+    assert page.headers["content-encoding"] == "gzip"
+    assert page.headers["cache-control"] == "no-cache"
+    assert "/static/js/app.js" not in page.text
+
+    revalidated = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": page.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    weakened = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": f'W/{page.headers["etag"]}'})
+    assert weakened.status_code == 304
+
+    assert assets.etag_matches('"a", W/"b" ,"c"', '"b"')
+    assert assets.etag_matches("*", '"b"')
+    assert not assets.etag_matches('"a", W/"bb"', '"b"')
+    assert not assets.etag_matches(None, '"b"')
+
+    url = assets.bundle.url("js/app.js")
+    assert url.startswith("/assets/js/app.") and url.endswith(".js")
+    assert url in page.text
+
+    identity = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert identity.status_code == 200
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["cache-control"] == assets.IMMUTABLE
+    assert identity.headers["vary"] == "Accept-Encoding"
+    with open("static/js/app.js", "rb") as source:
+        assert identity.content == source.read()
+
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == identity.content  # decoded by the client
+    assert compressed.headers["etag"] != identity.headers["etag"]
+
+    assert client.get("/assets/js/app.0000.js").status_code == 404
+
+def test_viewer_scripts_deferred():
+    """Test that no script blocks first paint and the Three.js bundle covers the renderer"""
+    page = client.get("/").text
+    scripts = re.findall(r"<script[^>]*>", page)
+    assert scripts and all(" defer " in tag for tag in scripts)
+
+    with open("static/js/three-renderer.js") as source:
+        renderer = source.read()
+    used = set(re.findall(r"THREE\.(\w+)", renderer))
+    used.update(re.findall(r"type: '(\w+)'", renderer))  # shadow map types looked up as THREE[type]
+    with open("vendor/three/index.js") as source:
+        exported = set(re.findall(r"^\s+(\w+),?$", source.read(), re.MULTILINE)) | {"OrbitControls"}
+    assert used <= exported
+
+def test_page_uses_three_bundle(tmp_path):
+    """Test that a built Three.js bundle replaces the CDN scripts on the page"""
+    static = tmp_path / "static"
+    shutil.copytree("static", static)
+    (static / "vendor").mkdir(exist_ok=True)
+    (static / assets.THREE_BUNDLE).write_text("var THREE = {};")
+    bundle = assets.AssetBundle(str(static), "templates", str(tmp_path / "build"))
+    page = bundle.page("index.html").variants["identity"].decode()
+
+    url = re.search(r'<script defer src="(/assets/vendor/three\.bundle\.min\.[0-9a-f]{12}\.js)">', page).group(1)
+    assert bundle.asset(url[len(assets.ASSET_PREFIX):]) is not None
+    assert "cdnjs" not in page and "jsdelivr" not in page
+
+def test_asset_rebuild_on_change(tmp_path):
+    """Test that the build is redone when a source no longer matches the manifest"""
+    static = tmp_path / "static"
+    (static / "js").mkdir(parents=True)
+    (static / "js" / "app.js").write_text("console.log(1);")
+    bundle = assets.AssetBundle(str(static), "templates", str(tmp_path / "build"))
+    bundle.load()
+    first = bundle.url("js/app.js")
+
+    (static / "js" / "app.js").write_text("console.log(2);")
+    rebuilt = assets.AssetBundle(str(static), "templates", str(tmp_path / "build"))
+    rebuilt.load()
+    assert rebuilt.url("js/app.js") != first
+    assert rebuilt.asset(rebuilt.manifest["js/app.js"]).variants["identity"] == b"console.log(2);"
+
+def test_api_quote_json_and_msgpack():
+    """Test the typed quote API in both encodings, and that it agrees with /configure"""
+    part = {
+        "material": "Titanium",
+        "surface_treatment": "anodizing",
+        "length": 120.0,
+        "width": 60.0,
+        "thickness": 4.0,
+        "hole_diameter": 12.0,
+        "quantity": 3
+    }
+    response = client.post("/api/v1/quotes", json=part)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    quote = response.json()
+    assert set(quote) == {"quote_id", "price", "delivery", "delivery_date", "pricing_version"}
+    assert quote["price"] == client.post("/configure", data=part).json()["estimated_price"]
+
+    stored = client.get(f"/quotes/{quote['quote_id']}").json()
+    assert stored["configuration"]["material"] == "titanium"
+
+    packed = client.post(
+        "/api/v1/quotes",
+        content=msgpack.packb(part),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+    )
+    assert packed.status_code == 200
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content)["price"] == quote["price"]
+
+def test_api_quote_validation():
+    """Test that the API enforces dimension, quantity and catalogue limits"""
+    part = {
+        "material": "steel",
+        "surface_treatment": "none",
+        "length": 10.0,
+        "width": 10.0,
+        "thickness": 1.0
+    }
+    assert client.post("/api/v1/quotes", json=part).status_code == 200  # hole and quantity default
+
+    invalid = client.post("/api/v1/quotes", json=dict(
+        part, length=config.MAX_DIMENSION + 1, quantity=config.MAX_QUANTITY + 1, material="gold"
+    ))
+    assert invalid.status_code == 422
+    fields = {error["loc"][-1] for error in invalid.json()["detail"]}
+    assert fields == {"length", "quantity", "material"}
+
+    assert client.post("/api/v1/quotes", json=dict(part, thickness=0)).status_code == 422
+    assert client.post("/api/v1/quotes", json=dict(part, color="red")).status_code == 422
+    assert client.post("/api/v1/quotes", content=b"{", headers={"Content-Type": "application/json"}).status_code == 422
+    assert client.post("/api/v1/quotes", data={"material": "steel"}).status_code == 415
+
+def test_volume_discount_tiers():
+    """Test that discount tiers apply to whole orders in scalar and vectorized pricing"""
+    try:
+        tables = pricing_tables.publish({"volume_discounts": {"100": 0.15, "10": 0.05}})
+        assert tables.volume_discounts == ((10, 0.05), (100, 0.15))
+        assert [pricing.discount(quantity) for quantity in (1, 9, 10, 99, 100, 5000)] == [0.0, 0.0, 0.05, 0.05, 0.15, 0.15]
+
+        quantities = [1, 9, 10, 99, 100, 5000]
+        vectorized = pricing.calculate_prices(
+            ["steel"] * 6, ["none"] * 6, [10.0] * 6, [10.0] * 6, [1.0] * 6, [2.0] * 6, quantities
+        )
+        scalar = [pricing.calculate_price("steel", "none", 10.0, 10.0, 1.0, 2.0, quantity) for quantity in quantities]
+        assert vectorized.tolist() == pytest.approx(scalar)
+        assert scalar[2] == pytest.approx(scalar[0] * 10 * 0.95)
+
+        for bad in ({"0": 0.1}, {"ten": 0.1}, {"10": 1.0}, {"10": -0.1}):
+            with pytest.raises(ValueError):
+                pricing_tables.publish({"volume_discounts": bad})
+    finally:
+        pricing_tables.reload()
+    assert pricing_tables.current().volume_discounts == ()
+
+def test_price_curve_endpoint():
+    """Test a quantity-break curve in one response, consistent with single quotes"""
+    part = {
+        "material": "steel",
+        "surface_treatment": "powder_coating",
+        "length": 80.0,
+        "width": 40.0,
+        "thickness": 4.0,
+        "hole_diameter": 6.0
+    }
+    try:
+        pricing_tables.publish({"volume_discounts": {"10": 0.05, "50": 0.10}})
+        curve = client.post("/api/v1/quotes/curve", json=dict(part, quantities=[1, 10, 49, 50])).json()
+        assert curve["discounts"] == [0.0, 0.05, 0.05, 0.10]
+        single = client.post("/api/v1/quotes", json=dict(part, quantity=50)).json()
+        assert curve["total_prices"][3] == single["price"]
+        assert curve["unit_prices"][3] == pytest.approx(curve["unit_prices"][0] * 0.9, abs=1e-4)
+
+        ranged = client.post(
+            "/api/v1/quotes/curve", json=dict(part, quantity_range={"start": 5, "stop": 500, "step": 5})
+        ).json()
+        assert ranged["quantities"] == list(range(5, 501, 5))
+        assert len(ranged["total_prices"]) == 100
+    finally:
+        pricing_tables.reload()
+
+    assert client.post("/api/v1/quotes/curve", json=part).status_code == 422
+    assert client.post("/api/v1/quotes/curve", json=dict(part, quantities=[config.MAX_QUANTITY + 1])).status_code == 422
+    too_many = dict(part, quantities=[1] * (config.PRICE_CURVE_MAX_POINTS + 1))
+    assert client.post("/api/v1/quotes/curve", json=too_many).status_code == 422
+
+def test_price_matrix_endpoint():
+    """Test the material x treatment x sweep matrix against individual quotes"""
+    base = {"length": 75.0, "width": 75.0, "thickness": 3.0, "hole_diameter": 8.0, "quantity": 2}
+    matrix = client.post("/api/v1/quotes/matrix", json=base).json()
+    assert matrix["materials"] == list(config.MATERIAL_MULTIPLIERS)
+    assert matrix["surface_treatments"] == list(config.SURFACE_TREATMENT_MULTIPLIERS)
+    assert matrix["shape"] == [4, 4]
+    assert matrix["sweep"] is None
+
+    for i, material in enumerate(matrix["materials"]):
+        for j, treatment in enumerate(matrix["surface_treatments"]):
+            single = client.post("/api/v1/quotes", json=dict(base, material=material, surface_treatment=treatment))
+            assert matrix["prices"][i][j] == single.json()["price"]
+
+    swept = client.post("/api/v1/quotes/matrix", json=dict(
+        base, materials=["Steel", "plastic"], sweep={"dimension": "thickness", "start": 1, "stop": 100, "num": 100}
+    )).json()
+    assert swept["materials"] == ["steel", "plastic"]
+    assert swept["shape"] == [2, 4, 100]
+    assert swept["sweep"]["values"][:3] == [1.0, 2.0, 3.0]
+    single = client.post("/api/v1/quotes", json=dict(base, material="plastic", surface_treatment="machining", thickness=50.0))
+    assert swept["prices"][1][3][49] == single.json()["price"]
+
+    listed = dict(base, sweep={"dimension": "hole_diameter", "values": [0, 10, 20]})
+    assert client.post("/api/v1/quotes/matrix", json=listed).json()["shape"] == [4, 4, 3]
+
+    for bad in (
+        dict(base, materials=["gold"]),
+        dict(base, sweep={"dimension": "length", "values": [config.MAX_DIMENSION + 1]}),
+        dict(base, sweep={"dimension": "colour", "values": [1]}),
+        dict(base, sweep={"dimension": "length", "values": [1], "num": 3}),
+        dict(base, sweep={"dimension": "length", "start": 1, "stop": 2, "num": config.PRICE_MATRIX_MAX_CELLS}),
+        dict(base, sweep={"dimension": "length", "start": 1, "stop": 2, "num": 10 ** 9}),
+        dict(base, sweep={"dimension": "length", "values": [1.0] * (config.PRICE_MATRIX_MAX_CELLS + 1)})
+    ):
+        assert client.post("/api/v1/quotes/matrix", json=bad).status_code == 422
+
+    # Validation counts the sweep without building it; the values are built once, on use
+    parsed = quote_api.MatrixRequest(**dict(base, sweep={"dimension": "length", "start": 1, "stop": 2, "num": 5}))
+    assert parsed.sweep._points is None
+    assert parsed.sweep.points() == [1.0, 1.25, 1.5, 1.75, 2.0]
+    assert parsed.sweep.points() is parsed.sweep.points()
+
+def test_loadtest_baseline_comparison():
+    """Test load-test percentiles and regression detection against a baseline"""
+    summary = loadtest.summarize([0.004, 0.001, 0.003, 0.002], errors=1, elapsed=2.0)
+    assert summary["requests"] == 4
+    assert summary["errors"] == 1
+    assert summary["rps"] == 2.0
+    assert summary["p50_ms"] == 2.0
+    assert summary["p99_ms"] == 4.0
+
+    baseline = {"configure": {"rps": 1000.0, "p95_ms": 10.0}}
+    assert loadtest.compare({"configure": {"rps": 950.0, "p95_ms": 10.5}}, baseline, 0.1) == []
+    assert len(loadtest.compare({"configure": {"rps": 800.0, "p95_ms": 20.0}}, baseline, 0.1)) == 2
+    # Scenarios missing from the baseline are not regressions
+    assert loadtest.compare({"index": {"rps": 1.0, "p95_ms": 999.0}}, baseline, 0.1) == []
+
+def test_configure_single_flight():
+    """Test that identical concurrent /configure requests share one quote"""
+    form_data = {
+        "material": "titanium",
+        "surface_treatment": "powder_coating",
+        "length": 61.0,
+        "width": 33.0,
+        "thickness": 2.0,
+        "hole_diameter": 5.0,
+        "quantity": 4
+    }
+    variants = [form_data, dict(form_data, material=form_data["material"].upper()), dict(form_data, width=33)]
+    before = client.get("/configure/stats").json()
+
+    async def burst():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as async_client:
+            return await asyncio.gather(
+                # Differently written, but the same configuration
+                *(async_client.post("/configure", data=variants[index % 3]) for index in range(8)),
+                async_client.post("/configure", data=dict(form_data, quantity=5))
+            )
+
+    responses = asyncio.run(burst())
+    assert all(response.status_code == 200 for response in responses)
+    identical, different = [response.json() for response in responses[:-1]], responses[-1].json()
+    # Pricing is shared, but every request is its own stored, bookable quote
+    assert len({quote["estimated_price"] for quote in identical}) == 1
+    quote_ids = {quote["quote_id"] for quote in identical} | {different["quote_id"]}
+    assert len(quote_ids) == 9
+    assert identical[0]["configuration"]["quantity"] == 4
+    assert all(client.get(f"/quotes/{quote_id}").status_code == 200 for quote_id in quote_ids)
+    for quote in identical[:2]:
+        booked = client.post(f"/quotes/{quote['quote_id']}/book")
+        assert booked.status_code == 201
+        assert client.delete(f"/jobs/{booked.json()['job_id']}").status_code == 204
+
+    stats = client.get("/configure/stats").json()
+    assert stats["computed"] - before["computed"] == 2
+    assert stats["coalesced"] - before["coalesced"] == 7
+    assert stats["in_flight"] == 0
+    assert 0 < stats["coalescing_ratio"] < 1
+    assert 'threednavi_configure_requests_total{result="coalesced"}' in client.get("/metrics").text
+
+    # Sequential requests never coalesce
+    first = client.post("/configure", data=form_data).json()
+    second = client.post("/configure", data=form_data).json()
+    assert first["quote_id"] != second["quote_id"]
+
+def test_single_flight_leader_cancelled():
+    """Test that followers take over when the leader of a single-flight call is cancelled"""
+    flights = single_flight.SingleFlight()
+    started = []
+
+    async def compute():
+        started.append(len(started))
+        await asyncio.sleep(0.01)
+        return len(started)
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do("key", compute))
+        followers = [asyncio.ensure_future(flights.do("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results
+
+    results = asyncio.run(scenario())
+    # One follower recomputed; the other two shared its result
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert {value for value, _ in results} == {2}
+    assert len(flights) == 0
+
+def test_sheet_nesting():
+    """Test blank layouts on stock sheets and scrap-aware pricing"""
+    # 960 x 1960 usable: 20 x 20 blanks 4 mm apart
+    assert nesting.sheet_capacity(44.0, 94.0, 1000.0, 2000.0, kerf=4.0, margin=20.0) == 400
+    # Rotated blanks fill the strip a single orientation would waste (6 either way)
+    assert nesting.sheet_capacity(60.0, 40.0, 150.0, 120.0, kerf=0.0, margin=0.0) == 7
+    assert nesting.sheet_capacity(2000.0, 10.0, 1000.0, 1000.0) == 0
+
+    # The hole keeps its clearance to the blank edge
+    assert nesting.blank_size(10.0, 30.0, 0.0) == (10.0, 30.0)
+    assert nesting.blank_size(10.0, 30.0, 10.0, clearance=2.0) == (14.0, 30.0)
+
+    per_sheet = nesting.sheet_capacity(*nesting.blank_size(100.0, 50.0, 10.0), *config.STOCK_SHEETS[0])
+    one = nesting.plan(100.0, 50.0, 10.0, 1)
+    assert one.sheets_used == 1
+    assert one.utilization == pytest.approx(100.0 * 50.0 / one.stock_area)
+
+    full = nesting.plan(100.0, 50.0, 10.0, per_sheet)
+    assert full.sheets[0].count == 1 and full.sheets[0].parts_per_sheet == per_sheet
+    assert full.utilization > 0.8
+
+    large = nesting.plan(100.0, 50.0, 10.0, config.MAX_QUANTITY)
+    assert sum(use.count * use.parts_per_sheet for use in large.sheets) >= config.MAX_QUANTITY
+    assert large.stock_area == sum(use.count * use.length * use.width for use in large.sheets)
+    assert nesting.stock_areas(100.0, 50.0, 10.0, [1, config.MAX_QUANTITY]).tolist() == [one.stock_area, large.stock_area]
+    assert nesting.plan(5000.0, 50.0, 0.0, 3) is None
+
+    part = {
+        "material": "steel",
+        "surface_treatment": "anodizing",
+        "length": 100.0,
+        "width": 50.0,
+        "thickness": 5.0,
+        "hole_diameter": 10.0,
+        "quantity": 1
+    }
+    net = pricing.calculate_price(**part)
+    try:
+        tables = pricing_tables.publish({"scrap_charge": 0.5})
+        # One part pays for its share of a whole sheet; a full sheet spreads the offcuts
+        single = pricing.calculate_price(**part)
+        full_sheet = pricing.calculate_price(**dict(part, quantity=per_sheet))
+        assert single > net
+        assert net < full_sheet / per_sheet < single
+
+        quantities = [1, per_sheet, per_sheet + 1, config.MAX_QUANTITY]
+        scalar = [pricing.calculate_price(**dict(part, quantity=quantity)) for quantity in quantities]
+        vectorized = pricing.calculate_prices(
+            *([part[field]] * 4 for field in pricing.PART_FIELDS[:-1]), quantities
+        )
+        assert vectorized.tolist() == pytest.approx(scalar)
+        curve = pricing.price_curve(part, quantities, tables)
+        assert curve["total_prices"].tolist() == pytest.approx(scalar)
+
+        response = client.post("/configure", data=dict(part, quantity=per_sheet + 1))
+        result = response.json()
+        assert result["estimated_price"] == round(scalar[2], 2)
+        assert result["nesting"] == nesting.describe(nesting.plan(100.0, 50.0, 10.0, per_sheet + 1))
+        assert 0 < result["nesting"]["utilization"] < 1
+
+        with pytest.raises(ValueError):
+            pricing_tables.publish({"scrap_charge": -1})
+    finally:
+        pricing_tables.reload()
+    assert pricing.calculate_price(**part) == net
+
+def test_lead_time_scheduler(monkeypatch):
+    """Test capacity-aware lead times, booking and cancelling jobs"""
+    friday = datetime.datetime(2026, 10, 16, 9, 0)
+    schedule = scheduler.Schedule(clock=lambda: friday)
+    monkeypatch.setattr(scheduler, "schedule", schedule)
+
+    # Business-day calendar: weekends roll over to Monday
+    assert scheduler.calendar_day(scheduler.business_day(datetime.date(2026, 10, 17))) == datetime.date(2026, 10, 19)
+    assert scheduler.working_minute(datetime.datetime(2026, 10, 17, 12)) == scheduler.working_minute(
+        datetime.datetime(2026, 10, 19, 0)
+    )
+
+    part = {
+        "material": "titanium",
+        "surface_treatment": "anodizing",
+        "length": 100.0,
+        "width": 50.0,
+        "thickness": 5.0,
+        "hole_diameter": 10.0,
+        "quantity": 1
+    }
+    configuration = pricing.configuration(part)
+    idle = schedule.estimate(configuration)
+    assert idle.completion_date == datetime.date(2026, 10, 16)
+    assert idle.business_days == config.SHIPPING_DAYS
+    assert idle.describe() == f"{config.SHIPPING_DAYS} business days"
+
+    # Booked work on the single titanium machine pushes the next quote out
+    job, booked = schedule.book(pricing.configuration(dict(part, quantity=5000)))
+    assert booked.business_days > idle.business_days
+    assert schedule.estimate(configuration).delivery_date >= booked.delivery_date > idle.delivery_date
+    # Jobs that share no machine with it are unaffected
+    assert schedule.estimate(dict(configuration, material="steel", surface_treatment="none")) == idle
+
+    response = client.post("/configure", data=part).json()
+    assert response["delivery_date"] == schedule.estimate(configuration).delivery_date.isoformat()
+    assert response["estimated_delivery"] == schedule.estimate(configuration).describe()
+
+    # Booking a stored quote reserves capacity once
+    booking = client.post(f"/quotes/{response['quote_id']}/book")
+    assert booking.status_code == 201
+    assert client.post(f"/quotes/{response['quote_id']}/book").status_code == 409
+    assert client.post("/quotes/does-not-exist/book").status_code == 404
+    assert client.get("/schedule/stats").json()["open_jobs"] == 2
+
+    # Cancelling moves the queue forward again
+    assert client.delete(f"/jobs/{job.job_id}").status_code == 204
+    assert client.delete(f"/jobs/{job.job_id}").status_code == 404
+    assert schedule.estimate(configuration).delivery_date < booked.delivery_date
+    assert client.delete(f"/jobs/{booking.json()['job_id']}").status_code == 204
+    assert schedule.estimate(configuration) == idle
+
+    # Finished jobs drop out as time passes
+    schedule.book(configuration)
+    schedule._clock = lambda: friday + datetime.timedelta(days=7)
+    assert schedule.stats()["open_jobs"] == 0
+
+def test_schedule_shared_between_workers(tmp_path, monkeypatch):
+    """Test that worker processes book against one shop through the shared database"""
+    friday = datetime.datetime(2026, 10, 16, 9, 0)
+    path = str(tmp_path / "schedule.db")
+    first, second = (scheduler.Schedule(clock=lambda: friday, path=path) for _ in range(2))
+    configuration = {
+        "material": "titanium",
+        "surface_treatment": "none",
+        "dimensions": {"length": 100.0, "width": 50.0, "thickness": 5.0, "hole_diameter": 10.0},
+        "quantity": 5000
+    }
+    idle = second.estimate(configuration)
+
+    loads = []
+
+    def counted(schedule):
+        load = schedule._load
+
+        def counted_load(db):
+            loads.append(schedule)
+            load(db)
+        return counted_load
+
+    for schedule in (first, second):
+        monkeypatch.setattr(schedule, "_load", counted(schedule))
+
+    job, booked = first.book(configuration, quote_id="q1")
+    assert second.estimate(configuration).delivery_date > idle.delivery_date
+    # Only the other process reloads, once; its own commits and repeat estimates don't
+    first.estimate(configuration)
+    second.estimate(configuration)
+    assert loads == [first, second]
+    with pytest.raises(ValueError):
+        second.book(configuration, quote_id="q1")
+    assert second.stats()["open_jobs"] == 1
+
+    assert second.release(job.job_id)
+    assert not first.release(job.job_id)
+    assert first.estimate(configuration) == idle
+
+    # A new process starts from what is stored
+    first.book(configuration, quote_id="q2")
+    restarted = scheduler.Schedule(clock=lambda: friday, path=path)
+    assert restarted.estimate(configuration) == first.estimate(configuration)
+    for schedule in (first, second, restarted):
+        schedule.close()
+
+# Loads the worker script with a stub `self` and prints buildPlate's arrays
+PLATE_WORKER_HARNESS = """
+const fs = require('fs');
+const vm = require('vm');
+const context = vm.createContext({ self: {}, setTimeout });
+vm.runInContext(fs.readFileSync('static/js/plate-worker.js', 'utf8'), context);
+const meshes = JSON.parse(process.argv[1]).map(args => context.buildPlate(...args));
+console.log(JSON.stringify(meshes.map(mesh => ({
+    positions: Array.from(mesh.positions),
+    normals: Array.from(mesh.normals),
+    indices: Array.from(mesh.indices),
+    indexSize: mesh.indices.BYTES_PER_ELEMENT
+}))));
+"""
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node to run the worker script")
+def test_plate_worker_matches_server_mesh():
+    """Test that the viewer's geometry worker builds the same buffers as /mesh/plate/lod"""
+    cases = [(100.0, 50.0, 5.0, 10.0, 16), (100.0, 50.0, 5.0, 0.0, 48), (30.0, 30.0, 2.0, 30.0, 128), (1000.0, 20.0, 3.0, 19.9, 7)]
+    output = subprocess.run(
+        ["node", "-e", PLATE_WORKER_HARNESS, json.dumps(cases)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    for args, built in zip(cases, json.loads(output)):
+        expected = mesh.build_plate(*args)
+        assert np.allclose(np.reshape(built["positions"], (-1, 3)), expected.positions, atol=1e-4)
+        assert built["normals"] == np.round(expected.normals * 127).astype(np.int8).reshape(-1).tolist()
+        assert built["indices"] == expected.indices.reshape(-1).tolist()
+        assert built["indexSize"] == 2
+
+    page = client.get("/").text
+    worker_url = re.search(r'data-geometry-worker="([^"]+)"', page).group(1)
+    assert re.fullmatch(r"/assets/js/plate-worker\.[0-9a-f]{12}\.js", worker_url)
+    assert client.get(worker_url).status_code == 200
+    segments = json.loads(re.search(r"data-lod-segments='([^']+)'", page).group(1))
+    assert segments == config.MESH_LOD_SEGMENTS
+
+def test_live_quote_websocket(monkeypatch):
+    """Test that the live-quote socket merges edits and prices the latest configuration"""
+    monkeypatch.setattr(config, "LIVE_QUOTE_INTERVAL", 0.2)
+    part = {
+        "material": "aluminum",
+        "surface_treatment": "anodizing",
+        "length": 100.0,
+        "width": 50.0,
+        "thickness": 5.0,
+        "hole_diameter": 10.0,
+        "quantity": 1
+    }
+    with client.websocket_connect("/ws/quotes") as websocket:
+        websocket.send_json({"seq": 1, "set": part})
+        first = websocket.receive_json()
+        assert first["seq"] == 1
+        assert first["price"] == round(quote_cache.price(part), 2)
+        assert set(first) == {"seq", "price", "delivery", "delivery_date", "pricing_version"}
+
+        # A burst of edits is priced once it settles, from the merged configuration
+        for seq, quantity in enumerate(range(2, 22), start=2):
+            websocket.send_json({"seq": seq, "set": {"quantity": quantity}})
+        websocket.send_json({"seq": 22, "set": {"material": "steel"}})
+        replies = [websocket.receive_json()]
+        while replies[-1]["seq"] != 22:
+            replies.append(websocket.receive_json())
+        assert len(replies) < 21
+        assert replies[-1]["price"] == round(quote_cache.price(dict(part, material="steel", quantity=21)), 2)
+
+        # Invalid values come back as validation errors on the same connection
+        websocket.send_json({"seq": 23, "set": {"material": "unobtainium"}})
+        invalid = websocket.receive_json()
+        assert invalid["seq"] == 23
+        assert invalid["detail"][0]["loc"] == ["body", "material"]
+
+        # Unknown fields close the connection
+        websocket.send_json({"seq": 24, "set": {"colour": "red"}})
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 1007
+
+    with client.websocket_connect("/ws/quotes") as websocket:
+        websocket.send_text(json.dumps({"seq": 1, "set": {"material": "x" * config.LIVE_QUOTE_MAX_MESSAGE_BYTES}}))
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 1009
+
+    exposition = client.get("/metrics").text
+    assert "threednavi_live_quote_connections 0" in exposition
+    assert 'threednavi_live_quote_messages_total{direction="received"}' in exposition
+
+def test_admission_control(monkeypatch):
+    """Test per-class slots and queues, fast 503s, bulk deferral and saturation in /health"""
+    assert admission.route_class("/configure") == "quotes"
+    assert admission.route_class("/configure/batch") == "batch"
+    assert admission.route_class("/assets/js/app.0123456789ab.js") == "static"
+    assert admission.route_class("/") == "pages"
+    assert admission.route_class("/health") is None
+    assert admission.route_class("/configure/stats") is None
+
+    controller = admission.Controller({
+        "quotes": {"concurrency": 1, "queue": 1, "max_wait": 1.0, "bulk": False},
+        "batch": {"concurrency": 1, "queue": 4, "max_wait": 1.0, "bulk": True}
+    })
+
+    async def interactive_first():
+        quote = await controller.acquire("quotes")
+        waiting_quote = asyncio.ensure_future(controller.acquire("quotes"))
+        await asyncio.sleep(0)
+        # The batch class has a free slot, but a quote is waiting
+        waiting_batch = asyncio.ensure_future(controller.acquire("batch"))
+        await asyncio.sleep(0)
+        assert not waiting_batch.done()
+        # Quote queue is full: turned away at once
+        with pytest.raises(admission.Overloaded):
+            await controller.acquire("quotes")
+        assert controller.saturated() == ["quotes"]
+
+        controller.release("quotes", quote)
+        second = await waiting_quote
+        batch = await waiting_batch
+        controller.release("quotes", second)
+        controller.release("batch", batch)
+        return controller.stats()
+
+    stats = asyncio.run(interactive_first())
+    assert stats["quotes"]["active"] == stats["quotes"]["waiting"] == 0
+    assert stats["batch"]["active"] == 0
+    assert controller.saturated() == []
+
+    # Through the middleware: slow quotes are shed with 503 and Retry-After
+    gate = []
+    controller = admission.Controller({
+        "quotes": {"concurrency": 1, "queue": 4, "max_wait": 0.05, "bulk": False},
+        "pages": {"concurrency": 1, "queue": 4, "max_wait": 1.0, "bulk": False}
+    })
+
+    async def slow_app(scope, receive, send):
+        await gate[0].wait()
+        await JSONResponse({"ok": True})(scope, receive, send)
+
+    async def spike():
+        gate.append(asyncio.Event())
+        transport = httpx.ASGITransport(app=admission.AdmissionMiddleware(slow_app, controller))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            first = asyncio.ensure_future(async_client.post("/configure"))
+            await asyncio.sleep(0.01)
+            shed = await async_client.post("/configure")
+            gate[0].set()
+            return await first, shed
+
+    served, shed = asyncio.run(spike())
+    assert served.status_code == 200
+    assert shed.status_code == 503
+    assert int(shed.headers["retry-after"]) >= 1
+
+    # The grant time lands in the scope, so handlers can tell queueing from their own work
+    scopes = []
+    controller = admission.Controller({"quotes": {"concurrency": 1, "queue": 4, "max_wait": 1.0, "bulk": False}})
+
+    async def held_app(scope, receive, send):
+        scopes.append(scope)
+        await asyncio.sleep(0.05)
+        await JSONResponse({"ok": True})(scope, receive, send)
+
+    async def queued():
+        app = metrics.MetricsMiddleware(admission.AdmissionMiddleware(held_app, controller))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            await asyncio.gather(async_client.post("/configure"), async_client.post("/configure"))
+
+    asyncio.run(queued())
+    waits = sorted(scope["admission.granted"] - scope["metrics.start"] for scope in scopes)
+    assert waits[0] < 0.04 <= waits[1]
+
+    monkeypatch.setattr(admission, "controller", admission.Controller({
+        "quotes": {"concurrency": 1, "queue": 0, "max_wait": 1.0, "bulk": False}
+    }))
+    admission.controller.limiters["quotes"].active = 1
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json() == {"status": "saturated", "saturated": ["quotes"]}
+    assert client.get("/admission/stats").json()["quotes"]["saturated"] is True
+    assert 'threednavi_admission_total{class="quotes",result="shed"}' in client.get("/metrics").text
+
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])